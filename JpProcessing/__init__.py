@@ -1,3 +1,6 @@
 from JpProcessing.tokenization import *
 from JpProcessing.characters import *
-from JpProcessing.conjugation import *
\ No newline at end of file
+from JpProcessing.conjugation import *
+from JpProcessing.analysis import *
+from JpProcessing.kanjilevel import *
+from JpProcessing.romanization import *
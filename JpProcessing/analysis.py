@@ -0,0 +1,57 @@
+from functools import cached_property
+from JpProcessing.tokenization import clean, tokenize, phones_from_tokens
+from JpProcessing.characters import kata2hira, is_only_kana, is_kanji
+import re
+
+
+class Analysis:
+	"""
+	linguistic analysis of one query, computed once per request and shared by
+	get_word, conjugate, get_accent, get_rank and get_kanjis
+	every attribute is computed on first access, e.g. Thai words are never tokenized
+
+	>>> analysis = Analysis('食べた ')
+	>>> analysis.text
+	'食べた'
+	>>> analysis.yomi_hiragana
+	'たべた'
+	>>> analysis.lemma
+	'食べる'
+	"""
+	def __init__(self, text:str):
+		self.raw = text
+		self.text = clean(text)
+
+	@cached_property
+	def tokens(self) -> list:
+		# 0.surface form  1.phonemic  2.lemma-kana  3.lemma-kanji  4.pos  5.conj type  6.conj form
+		return tokenize(self.text)
+
+	@cached_property
+	def yomi_katakana(self) -> str:
+		return ''.join(phones_from_tokens(self.tokens))
+
+	@cached_property
+	def yomi_hiragana(self) -> str:
+		return kata2hira(self.yomi_katakana)
+
+	@cached_property
+	def lemma(self) -> str:
+		return self.tokens[0][3] if len(self.tokens) > 0 else self.text
+
+	@cached_property
+	def is_thai(self) -> bool:
+		return bool(re.search(r'[ก-๙]+', self.raw))
+
+	@cached_property
+	def is_only_kana(self) -> bool:
+		return is_only_kana(self.raw)
+
+	@cached_property
+	def kanjis(self) -> list:
+		# unique kanji characters in order of appearance
+		return list(dict.fromkeys([char for char in self.raw if is_kanji(char)]))
+
+	@property
+	def has_kanji(self) -> bool:
+		return len(self.kanjis) > 0
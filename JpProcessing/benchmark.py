@@ -0,0 +1,174 @@
+"""
+microbenchmark of JpProcessing.characters and JpProcessing.romanization against the former implementations
+
+    python -m JpProcessing.benchmark
+    python -m JpProcessing.benchmark romanize [data/nhkparallel.json]     (NHK articles, run from the repository root)
+"""
+import re, sys, time, timeit
+from JpProcessing.characters import *
+from JpProcessing.romanization import romanize_kana, ROMAJI_DICT
+
+
+################################################################################
+###  FORMER IMPLEMENTATIONS (reference)
+################################################################################
+
+def legacy_get_char_type(char: str) -> CharType:
+    p = re.compile('[\u2E80-\u2FDF\u3005-\u3007\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF\U00020000-\U0002EBEF]')
+    if 'ァ' <= char <= 'ヶ' or char in 'ヽヾ':
+        return CharType.KATAKANA
+    elif 'ぁ' <= char <= 'ゖ' or char in 'ゝゞ':
+        return CharType.HIRAGANA
+    elif char not in '\n\t ' and char in JOYO_ALL:
+        return CharType.JOYOKANJI
+    elif re.match(p, char):
+        return CharType.KANJI
+    elif 'A' <= char <= 'z':
+        return CharType.ROMAN
+    elif 'ก' <= char <= '๙':
+        return CharType.THAI
+    else:
+        return CharType.OTHERS
+
+def legacy_hira2kata(text:str) -> str:
+    return ''.join([chr(ord(c)+96) if legacy_get_char_type(c) == CharType.HIRAGANA else c for c in text])
+
+def legacy_kata2hira(text:str) -> str:
+    return ''.join([chr(ord(c)-96) if legacy_get_char_type(c) == CharType.KATAKANA else c for c in text])
+
+def legacy_is_hiragana(text:str) -> bool:
+    return all(legacy_get_char_type(c) == CharType.HIRAGANA for c in text)
+
+def legacy_is_katakana(text:str) -> bool:
+    return all(legacy_get_char_type(c) == CharType.KATAKANA for c in text)
+
+def legacy_is_only_kana(text:str) -> bool:
+    return all('ぁ' <= c <= 'ヾ' for c in text)
+
+def legacy_is_roman(text:str) -> bool:
+    return all(legacy_get_char_type(c) == CharType.ROMAN for c in text)
+
+def legacy_is_thai(text:str) -> bool:
+    return all(legacy_get_char_type(c) == CharType.THAI for c in text)
+
+def legacy_is_kanji(text:str) -> bool:
+    return all(legacy_get_char_type(c) in [CharType.KANJI, CharType.JOYOKANJI] for c in text)
+
+def legacy_romanize_kana(text:str) -> str:
+    """
+    former romanize() after yomikata() : slices the text one or two characters at a time, then 5 regex passes
+    """
+    result = ''
+    while len(text) > 0:
+        if text[0] == ' ':
+            result += ' '
+            text = text[1:]
+        elif len(text) >= 2 and text[1] in 'ァィゥェォヵヶャュョヮ': # 小書き文字
+            try:
+                result += ROMAJI_DICT[text[:2]]
+            except:
+                result += ROMAJI_DICT.get(text[0], text[0])
+                result += ROMAJI_DICT[text[1]]
+            text = text[2:]
+        elif text[0] == 'ッ':
+            result += 'Q'
+            text = text[1:]
+        elif text[0] == 'ー':
+            result += result[-1] if result else ''
+            text = text[1:]
+        else:
+            result += ROMAJI_DICT.get(text[0], text[0])
+            text = text[1:]
+    result = re.sub(r'Q+ ?(\w)', r'\1\1', result)
+    result = re.sub(r'Q+$', r'ʔ', result)
+    result = re.sub(r'n([mbp])', r'm\1', result)
+    result = re.sub(r'o ?u$', 'oo', result)
+    result = result.replace('cch', 'tch')
+    return result
+
+
+################################################################################
+###  CHECK & BENCHMARK
+################################################################################
+
+PAIRS = [
+    ('get_char_type', legacy_get_char_type, get_char_type),
+    ('hira2kata', legacy_hira2kata, hira2kata),
+    ('kata2hira', legacy_kata2hira, kata2hira),
+    ('is_hiragana', legacy_is_hiragana, is_hiragana),
+    ('is_katakana', legacy_is_katakana, is_katakana),
+    ('is_only_kana', legacy_is_only_kana, is_only_kana),
+    ('is_roman', legacy_is_roman, is_roman),
+    ('is_thai', legacy_is_thai, is_thai),
+    ('is_kanji', legacy_is_kanji, is_kanji),
+]
+
+TEXTS = ['たべる', 'タベル', '食べる', '東京都庁', 'nozomibot', 'กินข้าว', 'あした５じにマルキュー', '𠮟る', 'ヽヾゝゞヵヶ']
+
+def check() -> list:
+    """
+    names of functions whose result differs from the former one
+    (every code point for get_char_type, TEXTS and every BMP character for the others)
+    """
+    chars = [chr(code) for code in list(range(1, 0xD800)) + list(range(0xE000, 0x10000)) + list(range(0x20000, 0x20100))]
+    diffs = []
+    for name, legacy, current in PAIRS:
+        samples = TEXTS + chars
+        if any(legacy(text) != current(text) for text in (chars if name == 'get_char_type' else samples)):
+            diffs.append(name)
+    return diffs
+
+def benchmark(number=2000) -> list:
+    """
+    [(name, legacy µs per call, current µs per call), ...] over TEXTS
+    """
+    result = []
+    for name, legacy, current in PAIRS:
+        texts = [text[0] for text in TEXTS] if name == 'get_char_type' else TEXTS
+        times = []
+        for func in (legacy, current):
+            seconds = timeit.timeit(lambda: [func(text) for text in texts], number=number)
+            times.append(seconds / number / len(texts) * 1e6)
+        result.append((name, *times))
+    return result
+
+def load_articles(path='data/nhkparallel.json') -> list:
+    """
+    katakana readings (yomikata) of the NHK articles, computed before timing
+    """
+    import pandas as pd
+    from JpProcessing.tokenization import yomikata
+    df = pd.read_json(path)
+    return [yomikata(text, sep=' ') for text in df.article.astype(str)]
+
+def benchmark_romanize(texts:list, repeat=3) -> list:
+    """
+    [(label, characters, legacy ms, current ms, number of different results), ...]
+    for each article, and for all articles joined into one long text (the former one is quadratic)
+    """
+    result = []
+    long_text = ' '.join(texts)
+    for label, samples in [('articles', texts), ('one long text', [long_text])]:
+        times = []
+        for func in (legacy_romanize_kana, romanize_kana):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                outputs = [func(text) for text in samples]
+            times.append((time.perf_counter() - start) / repeat * 1e3)
+        diffs = sum(legacy_romanize_kana(text) != romanize_kana(text) for text in samples)
+        result.append((label, sum(map(len, samples)), *times, diffs))
+    return result
+
+
+if __name__ == '__main__' and sys.argv[1:2] == ['romanize']:
+    texts = load_articles(*sys.argv[2:3])
+    print(f"{'input':<15}{'chars':>10}{'former ms':>12}{'table ms':>12}{'speedup':>10}{'diffs':>8}")
+    for label, chars, legacy, current, diffs in benchmark_romanize(texts):
+        print(f'{label:<15}{chars:>10}{legacy:>12.1f}{current:>12.1f}{legacy/current:>9.1f}x{diffs:>8}')
+
+elif __name__ == '__main__':
+    diffs = check()
+    print('different results:', diffs or 'none')
+    print(f"{'function':<15}{'former µs':>12}{'table µs':>12}{'speedup':>10}")
+    for name, legacy, current in benchmark():
+        print(f'{name:<15}{legacy:>12.3f}{current:>12.3f}{legacy/current:>9.1f}x')
@@ -10,19 +10,16 @@ class CharType(enum.Enum):
     THAI = 5
 
 def get_char_type(char: str) -> CharType:
-    p = re.compile('[\u2E80-\u2FDF\u3005-\u3007\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF\U00020000-\U0002EBEF]')
-    if 'ァ' <= char <= 'ヶ' or char in 'ヽヾ':
-        return CharType.KATAKANA
-    elif 'ぁ' <= char <= 'ゖ' or char in 'ゝゞ':
-        return CharType.HIRAGANA
-    elif char not in '\n\t ' and char in JOYO_ALL:
+    """
+    type of one character, looked up in CHAR_TABLE (BMP) instead of regex & string scan
+    """
+    code = ord(char)
+    if code < 0x10000:
+        return CHAR_TYPES[CHAR_TABLE[code]]
+    elif char in JOYO_SET:
         return CharType.JOYOKANJI
-    elif re.match(p, char):
+    elif 0x20000 <= code <= 0x2EBEF:
         return CharType.KANJI
-    elif 'A' <= char <= 'z':
-        return CharType.ROMAN
-    elif 'ก' <= char <= '๙':
-        return CharType.THAI
     else:
         return CharType.OTHERS
 
@@ -34,43 +31,43 @@ def hira2kata(text:str) -> str:
     >>> hira2kata('あした５じにマルキュー')
     'アシタ５ジニマルキュー'
     """
-    return ''.join([chr(ord(c)+96) if get_char_type(c) == CharType.HIRAGANA else c for c in text])
+    return text.translate(HIRA2KATA)
 
 
 def kata2hira(text:str) -> str:
     """
     convert katakana text into hiragana
     """
-    return ''.join([chr(ord(c)-96) if get_char_type(c) == CharType.KATAKANA else c for c in text])
+    return text.translate(KATA2HIRA)
 
 
 def is_hiragana(text:str) -> bool:
     """
     check whether the all chars are hiragana
     """
-    return all(get_char_type(c) == CharType.HIRAGANA for c in text)
+    return HIRAGANA_PATTERN.fullmatch(text) != None
 
 
 def is_katakana(text:str) -> bool:
     """
     check whether the all chars are katakana
     """
-    return all(get_char_type(c) == CharType.KATAKANA for c in text)
+    return KATAKANA_PATTERN.fullmatch(text) != None
 
 def is_only_kana(text:str) -> bool:
     """
     check whether the all chars are kana
     """
-    return all('ぁ' <= c <= 'ヾ' for c in text)
+    return KANA_PATTERN.fullmatch(text) != None
 
 def is_roman(text:str) -> bool:
-    return all(get_char_type(c) == CharType.ROMAN for c in text)
+    return ROMAN_PATTERN.fullmatch(text) != None
 
 def is_thai(text:str) -> bool:
-    return all(get_char_type(c) == CharType.THAI for c in text)
+    return THAI_PATTERN.fullmatch(text) != None
 
 def is_kanji(text:str) -> bool:
-    return all(get_char_type(c) in [CharType.KANJI, CharType.JOYOKANJI] for c in text)
+    return KANJI_PATTERN.fullmatch(text) != None
 
 
 # 常用漢字 2136
@@ -224,4 +221,55 @@ JLPT_N2 = """腕湾和論録老労路連練恋列歴齢零礼冷例令類涙輪
 公候交誤御互雇湖枯故戸庫固呼個限現減原険軒賢肩権検券健件血結決欠劇迎芸警経景敬恵形型傾係軍群訓君靴掘隅偶具苦
 禁均勤玉極曲局胸狭況橋挟恐境叫協共競供漁許巨居旧給級球泣求救吸久逆客詰喫議疑技記規季祈機期机希寄基器喜危願岩
 岸含丸関観簡管看甘環汗換慣感干官完巻刊乾活割額革較角覚確格拡各害貝階絵皆灰械改快解介過貨課菓荷河果科可加価仮
-化温億黄王欧横押応奥央汚塩煙演延園越液鋭泳永栄営雲羽宇因印育域違衣胃移異易委囲偉依位案圧愛"""
\ No newline at end of file
+化温億黄王欧横押応奥央汚塩煙演延園越液鋭泳永栄営雲羽宇因印育域違衣胃移異易委囲偉依位案圧愛"""
+
+
+################################################################################
+###  LOOKUP TABLES (built once at import)
+################################################################################
+
+HIRAGANA_CHARS = '[ぁ-ゖゝゞ]'
+KATAKANA_CHARS = '[ァ-ヶヽヾ]'
+KANJI_CHARS = '[\u2E80-\u2FDF\u3005-\u3007\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF\U00020000-\U0002EBEF]'
+
+# whole-string classifiers, '' is True as all([])
+HIRAGANA_PATTERN = re.compile(HIRAGANA_CHARS + '*')
+KATAKANA_PATTERN = re.compile(KATAKANA_CHARS + '*')
+KANA_PATTERN = re.compile('[ぁ-ヾ]*')
+KANJI_PATTERN = re.compile(KANJI_CHARS + '*') # 常用漢字 are all in these ranges
+ROMAN_PATTERN = re.compile('[A-z]*')
+THAI_PATTERN = re.compile('[ก-๙]*')
+
+# str.translate tables
+HIRA2KATA = {code:code+96 for code in list(range(ord('ぁ'), ord('ゖ')+1)) + [ord('ゝ'), ord('ゞ')]}
+KATA2HIRA = {code:code-96 for code in list(range(ord('ァ'), ord('ヶ')+1)) + [ord('ヽ'), ord('ヾ')]}
+
+# kanji lists as sets
+JOYO_SET = frozenset(JOYO_ALL) - frozenset('\n\t ')
+JUNICHI_SET = frozenset(JUNICHI_ALL) - frozenset('\n\t ')
+IKKYUU_SET = frozenset(IKKYUU_ALL) - frozenset('\n\t ')
+JLPT_SETS = {level:frozenset(chars) - frozenset('\n\t ') for level, chars in [('N5', JLPT_N5), ('N4', JLPT_N4), ('N3', JLPT_N3), ('N2', JLPT_N2)]}
+
+# CharType of each BMP code point : CHAR_TYPES[CHAR_TABLE[ord(char)]]
+CHAR_TYPES = [CharType.OTHERS, CharType.HIRAGANA, CharType.KATAKANA, CharType.JOYOKANJI, CharType.KANJI, CharType.ROMAN, CharType.THAI]
+
+def build_char_table() -> bytearray:
+    table = bytearray(0x10000)
+    def fill(start, end, char_type):
+        index = CHAR_TYPES.index(char_type)
+        table[ord(start):ord(end)+1] = bytes([index]) * (ord(end) - ord(start) + 1)
+    # lower priority first, same order as the conditions of the former get_char_type
+    fill('ก', '๙', CharType.THAI)
+    fill('A', 'z', CharType.ROMAN)
+    for start, end in ['\u2E80\u2FDF', '\u3005\u3007', '\u3400\u4DBF', '\u4E00\u9FFF', '\uF900\uFAFF']:
+        fill(start, end, CharType.KANJI)
+    for char in JOYO_SET:
+        if ord(char) < 0x10000:
+            table[ord(char)] = CHAR_TYPES.index(CharType.JOYOKANJI)
+    fill('ぁ', 'ゖ', CharType.HIRAGANA)
+    fill('ゝ', 'ゞ', CharType.HIRAGANA)
+    fill('ァ', 'ヶ', CharType.KATAKANA)
+    fill('ヽ', 'ヾ', CharType.KATAKANA)
+    return table
+
+CHAR_TABLE = build_char_table()
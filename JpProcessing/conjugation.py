@@ -1,9 +1,11 @@
 from JpProcessing.tokenization import tokenize
 from JpProcessing.characters import kata2hira
-import os
-import pandas as pd
+import os, csv
+from functools import lru_cache
 ABS_DIR = os.path.dirname(__file__)
-VERBS = pd.read_csv(ABS_DIR + '/verbs.csv', index_col='word') # dictionary based 
+
+FORMS = ['base', 'nai', 'nakatta', 'masu', 'te', 'ta', 'con', 'imp', 'vol', 'pot'] # columns of verbs.csv
+ADJ_FORMS = ['base', 'nai', 'nakatta', 'desu', 'te', 'ta', 'con', 'adv'] # adj_conj_from_lemma()
 
 def shift_dan(gyou:str, n:int) -> str:
 	"""
@@ -23,39 +25,116 @@ def shift_dan(gyou:str, n:int) -> str:
 		return {1:'ぢ', 2:'づ', 3:'で', 4:'ど'}[n]
 
 
-def get_teform(lemma:str) -> str:
+##### COMPILED SUFFIX RULES #####
+# (number of characters removed from the lemma, suffixes of FORMS[1:]), base form = lemma itself
+TE_SUFFIX = {'う':'って', 'つ':'って', 'る':'って', 'ぬ':'んで', 'む':'んで', 'ぶ':'んで', 'く':'いて', 'ぐ':'いで', 'す':'して'}
+ICHIDAN_RULE = (1, ('ない','なかった','ます','て','た','れば','ろ','よう','られる')) # 食べる
+ZURU_RULE = (2, ('じない','じなかった','じます','じて','じた','ずれば','じよ','じよう','じられる')) # 念ずる, same as -じる except con
+SAHEN_RULE = (2, ('しない','しなかった','します','して','した','すれば','しろ','しよう','せる')) # 座する
+
+def compile_godan_rule(gyou:str, te:str):
+	"""
+	gyou : 行 of the conjtype in hiragana (か for 五段-カ行), te : て-form suffix (いて for 書く)
+	"""
+	if te is None:
+		return None
+	a_gyou = 'あ' if gyou == 'わ' else gyou # wa gyou -> a gyou
+	ta = te[:-1] + ('た' if te[-1] == 'て' else 'だ')
+	return (1, (gyou + 'ない', gyou + 'なかった', shift_dan(a_gyou, 1) + 'ます', te, ta,
+		shift_dan(a_gyou, 3) + 'ば', shift_dan(a_gyou, 3), shift_dan(a_gyou, 4) + 'う', shift_dan(a_gyou, 3) + 'る'))
+
+# (行, last kana of the lemma) -> rule, e.g. ('か', 'く') : 書く -> 書かない, 書いて ...
+GODAN_ENDINGS = {'か':'く', 'が':'ぐ', 'さ':'す', 'た':'つ', 'な':'ぬ', 'ば':'ぶ', 'ま':'む', 'ら':'る', 'わ':'う'}
+GODAN_RULES = {(gyou, last):compile_godan_rule(gyou, TE_SUFFIX[last]) for gyou, last in GODAN_ENDINGS.items()}
+IKU_RULE = compile_godan_rule('か', 'って') # 行く -> 行って (not 行いて)
+
+def get_rule(lemma:str, conjtype:str):
+	"""
+	suffix rule of the lemma and conjtype (5th element of tokenize()), None if it cannot be conjugated
+	"""
+	group = conjtype[:2] # conjtype = 五段-ワア行, 上一段, 下一段, サ行変格
+	### exception -ずる動詞
+	### e.g. 任ずる => サ変, 任じる => 上一段
+	if lemma.endswith('ずる') and conjtype.startswith('サ行変格'):
+		return ZURU_RULE
+	elif group in ['上一', '下一']: # e.g. 食べる
+		return ICHIDAN_RULE
+	elif group == '五段':
+		if lemma in ['行く', 'いく']:
+			return IKU_RULE
+		gyou = kata2hira(conjtype[3]) # e.g. 五段-カ行　-> か
+		rule = GODAN_RULES.get((gyou, lemma[-1]))
+		if rule is None: # the last kana is not of the 行
+			rule = compile_godan_rule(gyou, TE_SUFFIX.get(lemma[-1]))
+		return rule
+	elif conjtype.startswith('サ行変格') and len(lemma) >= 3: # 座する
+		return SAHEN_RULE
+	return None
+
+
+def fits_conjtype(word:str, kana:str, conjtype:str) -> bool:
+	"""
+	whether the ending of the verb is possible for the conjtype
+	e.g. 書く (かく) & 五段-カ行, 食べる (たべる) & 下一段, not 言い切る (いいきる) & 下一段
+	"""
+	if word[-1:] != kana[-1:]:
+		return False
+	if conjtype.startswith('五段'):
+		return kana[-1:] == GODAN_ENDINGS.get(kata2hira(conjtype[3:4]))
+	elif conjtype.startswith('上一'):
+		return kana.endswith('る') and kana[-2:-1] in 'いきぎしじちぢにひびぴみりゐ'
+	elif conjtype.startswith('下一'):
+		return kana.endswith('る') and kana[-2:-1] in 'えけげせぜてでねへべぺめれゑ'
+	elif conjtype.startswith('カ行変格'):
+		return kana.endswith('くる')
+	elif conjtype.startswith('サ行変格'):
+		return kana.endswith('する') or kana.endswith('ずる')
+	return False
+
+
+##### PRECOMPUTED PARADIGMS #####
+def kana_paradigm(word:str, kana:str, paradigm:tuple) -> tuple:
 	"""
-	convert group1 verb base form into te form\n
-	>>> get_teform('書く')
-	書いて
+	paradigm written in kana, the part before the common ending is replaced
+	>>> kana_paradigm('愛する', 'あいする', ('愛する', '愛しない', ...))
+	('あいする', 'あいしない', ...)
 	"""
-	if lemma == '行く':
-		return '行って'
-	elif lemma == 'いく':
-		return 'いって'
-	elif lemma[-1] in ['う','つ','る']:
-		return lemma[:-1] + 'って'
-	elif lemma[-1] in ['ぬ','む','ぶ']:
-		return lemma[:-1] + 'んで'
-	elif lemma[-1] == 'く':
-		return lemma[:-1] + 'いて'
-	elif lemma[-1] == 'ぐ':
-		return lemma[:-1] + 'いで'
-	elif lemma[-1] == 'す':
-		return lemma[:-1] + 'して'
+	n = 0 # length of the common ending
+	while n < min(len(word), len(kana)) and word[-1-n] == kana[-1-n]:
+		n += 1
+	prefix, kana_prefix = word[:len(word)-n], kana[:len(kana)-n]
+	return tuple(kana_prefix + form[len(prefix):] if form.startswith(prefix) else form for form in paradigm)
 
+@lru_cache(maxsize=1)
+def get_paradigms() -> tuple:
+	"""
+	precomputed paradigms of verbs.csv, loaded at the first conjugation
+	({word: 10 forms}, {kana: 10 forms in kana}), e.g. 食べる -> 食べない, たべる -> たべない
+	a kana is a key only if its verbs conjugate in the same way (あう : 会う & 合う, not かえる : 帰る & 変える)
+	カ変 is not keyed by kana, rows whose ending does not fit the conj (e.g. 貫き通す, 下一段) are not used,
+	nor readings with "/" (だく/いだく)
+	"""
+	by_word, by_kana = {}, {}
+	with open(ABS_DIR + '/verbs.csv', 'r', encoding='utf8') as f:
+		for row in csv.DictReader(f):
+			if '/' in row['word'] or not fits_conjtype(row['word'], row['kana'], row['conj']):
+				continue
+			# missing forms ("-", e.g. pot of 分かる) are filled by the rule
+			computed = rule_conj(row['word'], row['conj']) or [None] * len(FORMS)
+			paradigm = tuple(row[form] if row[form] not in ['', '-'] else (computed[i] or row[form]) for i, form in enumerate(FORMS))
+			by_word.setdefault(row['word'], paradigm)
+			if row['conj'] != 'カ行変格' and '/' not in row['kana']: # not e.g. だく/いだく
+				by_kana.setdefault(row['kana'], set()).add(kana_paradigm(row['word'], row['kana'], paradigm))
+	by_kana = {kana:paradigms.pop() for kana, paradigms in by_kana.items() if len(paradigms) == 1}
+	return by_word, by_kana
 
-def get_taform(lemma:str) -> str:
+def get_paradigm(word:str):
 	"""
-	convert group1 verb base form into ta form\n
-	>>> get_teform('書く')
-	書いた
+	10 forms of a verb in verbs.csv by the word or its kana, None if not found (no tokenization)
 	"""
-	teform = get_teform(lemma)
-	if teform[-1] == 'て':
-		return teform[:-1] + 'た'
-	elif teform[-1] == 'で':
-		return teform[:-1] + 'だ'
+	by_word, by_kana = get_paradigms()
+	paradigm = by_word.get(word) or by_kana.get(word)
+	return list(paradigm) if paradigm != None else None
 
 
 ##### DICTINARY & RULE-BASED CONJUGATION ##### 
@@ -71,65 +150,22 @@ def verb_conj_from_lemma(lemma:str, conjtype:str) -> list:
 	verb_conj_from_lemma('食べる', '一段')
 	>>> ['食べる', '食べない', '食べなかった', '食べます', '食べて', '食べた', '食べれば', '食べろ', '食べよう', '食べられる']
 	"""
-	group = conjtype[:2] # conjtype = 五段-ワア行, 上一段, 下一段, サ行変格
-	pot = None # potential form
-	
-	### if the verb is in dictionary "VERBS", return it
-	if lemma in VERBS.index:
-		return list(VERBS.loc[lemma][['base', 'nai', 'nakatta', 'masu', 'te', 'ta','con', 'imp', 'vol', 'pot']])
-	
-	### exception -ずる動詞
-	### e.g. 任ずる => サ変, 任じる => 上一段
-	elif lemma.endswith('ずる') and conjtype.startswith('サ行変格'):
-		stem = lemma[:-2] # 念
-		base = lemma  # 念ずる
-		con = stem + 'ずれば'  # 念ずれば
-		# other forms = same as -じる動詞
-		nai = stem + 'じない'
-		nakatta = stem + 'じなかった'
-		masu = stem + 'じます'
-		te = stem + 'じて'
-		ta = stem + 'じた'
-		imp = stem + 'じよ'
-		vol = stem + 'じよう'
-		pot = stem + 'じられる'
-	
-	elif group in ['上一', '下一']: # e.g. 食べる
-		stem = lemma[:-1] # 食べ
-		base = lemma
-		nai = stem +  'ない' # 食べない
-		nakatta = stem + 'なかった' # 食べなかった
-		masu = stem + 'ます' # 食べます
-		te = stem + 'て' # 食べて
-		ta = stem + 'た' # 食べた
-		imp = stem + 'ろ' # 食べろ
-		con = stem + 'れば' # 食べれば
-		vol = stem + 'よう' # 食べよう
-		pot = stem + 'られる' # 食べられる
-	
-	elif group == '五段':
-		gyou = kata2hira(conjtype[3])  # e.g. 五段-カ行　-> か (convert into ア if ワ)
-		stem = lemma[:-1]  # e.g. 会う -> 会
-		nai = stem + gyou + 'ない' # 会わない
-		nakatta = stem + gyou + 'なかった' # 会わなかった
-		# wa gyou -> a gyou
-		if gyou == 'わ': 
-			gyou = 'あ'
-		base = lemma
-		masu = stem + shift_dan(gyou, 1) + 'ます' # 会います
-		te = get_teform(lemma) # 会って
-		ta = get_taform(lemma) # 会った
-		imp = stem + shift_dan(gyou, 3) # 買え
-		con = stem + shift_dan(gyou, 3) + 'ば' # 買えば
-		vol = stem + shift_dan(gyou, 4) + 'う' # 買おう
-		pot = stem + shift_dan(gyou, 3) + 'る' # 買える
+	### if the verb is in dictionary verbs.csv, return it
+	by_word, _ = get_paradigms()
+	if lemma in by_word:
+		return list(by_word[lemma])
+	return rule_conj(lemma, conjtype)
 
-	elif conjtype.startswith('サ行変格') and len(lemma) >= 3: # 座する
-		stem = lemma[:-2]
-		return [stem+x for x in ['する','しない','しなかった','します','して','した','すれば','しろ','しよう','せる']]
-	else:
+def rule_conj(lemma:str, conjtype:str):
+	"""
+	10 forms by the suffix rule only (verbs.csv is not looked up), None if there is no rule
+	"""
+	rule = get_rule(lemma, conjtype)
+	if rule is None:
 		return None
-	return [base, nai, nakatta, masu, te, ta, con, imp, vol, pot]
+	n, suffixes = rule
+	stem = lemma[:-n]
+	return [lemma] + [stem + suffix for suffix in suffixes]
 
 
 def adj_conj_from_lemma(lemma:str):
@@ -161,7 +197,17 @@ def adj_conj_from_lemma(lemma:str):
 	return [lemma, nai, nakatta, desu, te, ta, con, adv]
 
 
-def conjugate(word:str) -> list:
+def conjugate_lemma(lemma:str, conjtype:str) -> list:
+	"""
+	forms of a lemma whose conjtype is already known (e.g. by deinflection), without tokenization
+	conjtype : 5th element of tokenize(), '形容詞' for i-adj
+	"""
+	if conjtype.startswith('形容詞'):
+		return adj_conj_from_lemma(lemma)
+	return verb_conj_from_lemma(lemma, conjtype)
+
+
+def conjugate(word:str, analysis=None) -> list:
 	"""
 	conjugate verb or i-adj regardless of whether it is lemma or not
 	
@@ -182,9 +228,15 @@ def conjugate(word:str) -> list:
 	['する', 'スル', 'スル', 'する', '動詞-非自立可能', 'サ行変格', '終止形-一般', '0']]
 
 	if cannot conjugate, return None
+	verbs in verbs.csv (e.g. 食べる, たべる) are returned from the precomputed paradigms, only other inputs are tokenized
+	analysis (JpProcessing.Analysis of the word) can be passed in order to reuse its tokens
 	"""
+	### verbs in verbs.csv (dictionary form or unambiguous kana) without tokenization
+	paradigm = get_paradigm(analysis.text if analysis != None else word.strip())
+	if paradigm != None:
+		return paradigm
 	try:
-		tokens = tokenize(word)
+		tokens = analysis.tokens if analysis != None else tokenize(word)
 		# 0.surface form  1.phonemic  2.lemma-kana  3.lemma-kanji  4.pos  5.conj type  6.conj form
 		if len(tokens) == 0:
 			return None
@@ -0,0 +1,155 @@
+"""
+kanji difficulty profile of text, by the kanji lists of JpProcessing.characters
+
+level of each kanji : JOYO (常用漢字) < JUNICHI (漢検準一級) < IKKYUU (漢検一級) < OTHER (kanji in none of the lists)
+the level of every code point is looked up in one array, characters are counted with collections.Counter
+
+>>> kanji_profile('日本の首都は東京です')['counts']
+{'JOYO': 6, 'JUNICHI': 0, 'IKKYUU': 0, 'OTHER': 0}
+
+batch (one JSON line per file, or per line with --lines):
+	python -m JpProcessing.kanjilevel article1.txt article2.txt
+	python -m JpProcessing.kanjilevel --lines articles.txt
+"""
+from collections import Counter
+from JpProcessing.characters import JOYO_SET, JUNICHI_SET, IKKYUU_SET, KANJI_CHARS
+import re, sys, json
+
+__all__ = ['kanji_profile', 'kanji_profile_stream', 'kanji_profile_files', 'KanjiProfileAccumulator', 'max_kanji_level']
+
+LEVELS = ['JOYO', 'JUNICHI', 'IKKYUU', 'OTHER'] # LEVEL_TABLE value - 1
+NOT_KANJI, JOYO, JUNICHI, IKKYUU, OTHER = range(5)
+
+def build_level_table() -> bytearray:
+	"""
+	level of each code point up to the end of CJK Ext. (0x2EBEF), 0 if not kanji
+	"""
+	table = bytearray(0x2EC00)
+	pattern = re.compile(KANJI_CHARS)
+	for start, end in [(0x2E80, 0x2FDF), (0x3005, 0x3007), (0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF), (0x20000, 0x2EBEF)]:
+		table[start:end+1] = bytes([OTHER]) * (end - start + 1)
+	# lower level overwrites : a kanji in several lists gets the easiest one
+	for level, chars in [(IKKYUU, IKKYUU_SET), (JUNICHI, JUNICHI_SET), (JOYO, JOYO_SET)]:
+		for char in chars:
+			if ord(char) < len(table) and pattern.match(char):
+				table[ord(char)] = level
+	return table
+
+LEVEL_TABLE = build_level_table()
+
+def kanji_level(char:str) -> int:
+	"""
+	0 : not kanji, 1 : JOYO, 2 : JUNICHI, 3 : IKKYUU, 4 : OTHER
+	"""
+	code = ord(char)
+	return LEVEL_TABLE[code] if code < len(LEVEL_TABLE) else NOT_KANJI
+
+def max_kanji_level(text:str) -> int:
+	"""
+	highest (most difficult) kanji level in the text, 0 if no kanji
+	"""
+	return max([kanji_level(char) for char in set(text)], default=NOT_KANJI)
+
+def count_levels(counter:Counter) -> tuple:
+	"""
+	(counts of each level, Counter of OTHER kanji) from Counter of characters
+	"""
+	counts = [0] * 5
+	unknown = Counter()
+	for char, n in counter.items():
+		level = kanji_level(char)
+		counts[level] += n
+		if level == OTHER:
+			unknown[char] += n
+	return counts, unknown
+
+def make_profile(counts:list, unknown:Counter, chars:int) -> dict:
+	"""
+	counts     : number of kanji (tokens) of each level
+	coverage   : ratio of kanji of the level or easier, e.g. coverage['JUNICHI'] = (JOYO + JUNICHI) / kanji
+	unknown    : kanji in none of the lists, most frequent first
+	"""
+	kanji = sum(counts[1:])
+	cumulative, coverage = 0, {}
+	for level, name in enumerate(LEVELS, 1):
+		cumulative += counts[level]
+		coverage[name] = round(cumulative / kanji, 4) if kanji > 0 else 1.0
+	return {
+		'chars': chars,
+		'kanji': kanji,
+		'kanji_ratio': round(kanji / chars, 4) if chars > 0 else 0.0,
+		'counts': {name:counts[level] for level, name in enumerate(LEVELS, 1)},
+		'coverage': coverage,
+		'max_level': LEVELS[max([level for level in range(1, 5) if counts[level] > 0]) - 1] if kanji > 0 else None,
+		'unknown': [char for char, _ in unknown.most_common()],
+	}
+
+def kanji_profile(text:str) -> dict:
+	counts, unknown = count_levels(Counter(text))
+	return make_profile(counts, unknown, len(text))
+
+class KanjiProfileAccumulator:
+	"""
+	profile of many texts without keeping them
+
+	>>> total = KanjiProfileAccumulator()
+	>>> for line in open('articles.txt'): total.add(line)
+	>>> total.profile()
+	"""
+	def __init__(self):
+		self.counts = [0] * 5
+		self.unknown = Counter()
+		self.chars = 0
+		self.texts = 0
+
+	def add(self, text:str):
+		counts, unknown = count_levels(Counter(text))
+		self.counts = [a + b for a, b in zip(self.counts, counts)]
+		self.unknown.update(unknown)
+		self.chars += len(text)
+		self.texts += 1
+
+	def profile(self) -> dict:
+		return dict(make_profile(self.counts, self.unknown, self.chars), texts=self.texts)
+
+def kanji_profile_stream(texts):
+	"""
+	yield profile of each text of an iterable (e.g. file object)
+	"""
+	for text in texts:
+		yield kanji_profile(text)
+
+def kanji_profile_files(paths:list, per_line=False, encoding='utf8'):
+	"""
+	read files line by line (never the whole file at once)
+	yield (path, profile of the file), or (path, line number, profile) if per_line
+	"""
+	for path in paths:
+		with open(path, 'r', encoding=encoding) as f:
+			if per_line:
+				for n, line in enumerate(f, 1):
+					line = line.rstrip('\n')
+					if line != '':
+						yield path, n, kanji_profile(line)
+			else:
+				total = KanjiProfileAccumulator()
+				for line in f:
+					total.add(line.rstrip('\n'))
+				yield path, total.profile()
+
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	per_line = '--lines' in args
+	paths = [arg for arg in args if arg != '--lines']
+	if paths == []:
+		print(__doc__)
+		sys.exit(1)
+	for item in kanji_profile_files(paths, per_line=per_line):
+		if per_line:
+			path, n, result = item
+			result = dict(result, path=path, line=n)
+		else:
+			path, result = item
+			result = dict(result, path=path)
+		print(json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,84 @@
+"""
+katakana -> romaji by the table of roman.csv (katakana, hepburn, kunrei)
+
+every step is one scan of the whole text by a precompiled pattern or translation table (linear time):
+	1. digraphs (キャ, ティ, ...) : one pattern of [first kana][small kana], longest match before single kana
+	2. single kana : str.translate
+	3. ー -> repeat the previous letter
+	4. ッ + letter -> double letter (ッチ -> tch), ッ otherwise -> ʔ
+	5. ン -> m before m, b, p (only hepburn), otherwise n
+	6. final ou -> oo
+
+>>> romanize_kana('イトウ')
+'itoo'
+>>> romanize_kana('シンブン', system='kunrei')
+'sinbun'
+"""
+import os, re, csv
+
+__all__ = ['romanize_kana', 'Romanizer', 'ROMANIZERS', 'ROMAJI_DICT']
+
+ABS_DIR = os.path.dirname(__file__)
+SYSTEMS = ['hepburn', 'kunrei']
+SMALL_KANA = 'ァィゥェォヵヶャュョヮ'
+
+LONG_VOWEL_PATTERN = re.compile(r'(.)ー+')
+SOKUON_PATTERN = re.compile(r'ッ+ ?(\w)') # one space is allowed, e.g. "アッ タ" -> "atta"
+GLOTTAL_PATTERN = re.compile(r'ッ+')
+BILABIAL_PATTERN = re.compile(r'ン(?=[mbp])')
+
+def load_tables(path=ABS_DIR + '/roman.csv') -> dict:
+	"""
+	{'hepburn': {'キャ': 'kya', ...}, 'kunrei': {'キャ': 'kya', ...}}
+	"""
+	tables = {system:{} for system in SYSTEMS}
+	with open(path, 'r', encoding='utf8') as f:
+		for row in csv.DictReader(f):
+			for system in SYSTEMS:
+				tables[system][row['katakana']] = row[system]
+	return tables
+
+
+class Romanizer:
+	def __init__(self, table:dict, assimilation=True):
+		self.table = table
+		self.assimilation = assimilation # ン -> m before m, b, p
+		self.digraphs = {kana:roman for kana, roman in table.items() if len(kana) == 2}
+		first = ''.join(sorted({kana[0] for kana in self.digraphs}))
+		self.digraph_pattern = re.compile(f'[{first}][{SMALL_KANA}]')
+		# ッ, ー and ン are left for the rules, characters not in the table are kept (non-JP char)
+		self.translation = str.maketrans({kana:roman for kana, roman in table.items() if len(kana) == 1 and kana not in 'ッーン'})
+
+	def digraph(self, match) -> str:
+		kana = match.group()
+		return self.digraphs.get(kana) or kana # e.g. キェ is not in the table -> each kana by translate
+
+	def __call__(self, text:str) -> str:
+		text = self.digraph_pattern.sub(self.digraph, text).translate(self.translation)
+		if 'ー' in text: # long vowel
+			text = LONG_VOWEL_PATTERN.sub(lambda m: m.group(1) * len(m.group()), text)
+		if 'ッ' in text:
+			text = SOKUON_PATTERN.sub(r'\1\1', text).replace('cch', 'tch') # イッチョウ -> itchoo
+			text = GLOTTAL_PATTERN.sub('ʔ', text) # not before a letter => glottal stop
+		if self.assimilation:
+			text = BILABIAL_PATTERN.sub('m', text)
+		text = text.replace('ン', 'n')
+		if text.endswith('ou'): # final ou -> oo
+			text = text[:-1] + 'o'
+		elif text.endswith('o u'):
+			text = text[:-3] + 'oo'
+		return text
+
+
+TABLES = load_tables()
+ROMANIZERS = {
+	'hepburn': Romanizer(TABLES['hepburn']),
+	'kunrei': Romanizer(TABLES['kunrei'], assimilation=False),
+}
+ROMAJI_DICT = TABLES['hepburn']
+
+def romanize_kana(text:str, system='hepburn') -> str:
+	"""
+	katakana text (e.g. yomikata() with sep=' ') -> romaji
+	"""
+	return ROMANIZERS[system](text)
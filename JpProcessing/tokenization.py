@@ -1,15 +1,84 @@
-import MeCab, re
+import MeCab, re, threading
+from collections import OrderedDict
 from JpProcessing.characters import kata2hira, is_only_kana, is_hiragana
+from JpProcessing.romanization import romanize_kana
 tagger = MeCab.Tagger() # instantiate tokenizer
 
+# compiled once, shared by every call of clean() and tokenize()
+DOUBLE_QUOTE_PATTERN = re.compile(r'[“”„]')
+SINGLE_QUOTE_PATTERN = re.compile(r'[‘’`]')
+SPACE_PATTERN = re.compile(r'[ \u00a0\xa0\u3000\u2002-\u200a\t]+')
+INVISIBLE_PATTERN = re.compile(r'[\r\u200b\ufeff]+')
+DIGIT_PATTERN = re.compile(r'[+-]?\d[\d,]*(?:\.\d+)?') # e.g. -273.15  +1,234.56
+
 def clean(text:str):
-	text = re.sub(r'[“”„]', '"', text) # convert double quotations into "
-	text = re.sub(r'[‘’`]', "'", text) # convert single quotations into '
-	text = re.sub(r'[ \u00a0\xa0\u3000\u2002-\u200a\t]+', ' ', text) # shrink spaces e.g. good  boy -> good boy
-	text = re.sub(r'[\r\u200b\ufeff]+', '', text) # remove non-breaking space
+	text = DOUBLE_QUOTE_PATTERN.sub('"', text) # convert double quotations into "
+	text = SINGLE_QUOTE_PATTERN.sub("'", text) # convert single quotations into '
+	text = SPACE_PATTERN.sub(' ', text) # shrink spaces e.g. good  boy -> good boy
+	text = INVISIBLE_PATTERN.sub('', text) # remove non-breaking space
 	return text.strip()
 
 
+class TokenCache:
+	"""
+	thread-safe LRU cache of parsed tokens, keyed on the cleaned text
+	tokens are stored as tuples and handed out as new lists, 
+	because tokenize() and its callers modify the lists in place
+
+	>>> cache = TokenCache(maxsize=2)
+	>>> cache.put('家', [['家', 'イエ', 'イエ', '家', '名詞-普通名詞-一般', '', '', '2']])
+	>>> cache.get('家')
+	[['家', 'イエ', 'イエ', '家', '名詞-普通名詞-一般', '', '', '2']]
+	>>> cache.info()
+	{'hits': 1, 'misses': 0, 'evictions': 0, 'size': 1, 'maxsize': 2, 'hit_rate': 1.0}
+	"""
+	def __init__(self, maxsize=4096):
+		self.maxsize = maxsize
+		self.data = OrderedDict()
+		self.lock = threading.Lock()
+		self.hits = self.misses = self.evictions = 0
+
+	def get(self, text:str):
+		with self.lock:
+			tokens = self.data.get(text)
+			if tokens is None:
+				self.misses += 1
+				return None
+			self.data.move_to_end(text)
+			self.hits += 1
+		return [list(token) for token in tokens]
+
+	def put(self, text:str, tokens:list):
+		if self.maxsize <= 0:
+			return
+		frozen = tuple(tuple(token) for token in tokens)
+		with self.lock:
+			self.data[text] = frozen
+			self.data.move_to_end(text)
+			while len(self.data) > self.maxsize:
+				self.data.popitem(last=False)
+				self.evictions += 1
+
+	def clear(self):
+		with self.lock:
+			self.data.clear()
+			self.hits = self.misses = self.evictions = 0
+
+	def info(self) -> dict:
+		with self.lock:
+			total = self.hits + self.misses
+			return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions, 'size':len(self.data),
+				'maxsize':self.maxsize, 'hit_rate':self.hits / total if total else 0.0}
+
+TOKEN_CACHE = TokenCache(maxsize=4096) # shared by all callers of tokenize()
+
+def token_cache_info() -> dict:
+	"""
+	hit / miss / eviction counters of the tokenize() cache
+	"""
+	return TOKEN_CACHE.info()
+
+
 POS_MAPPING = {
 	'動詞':'กริยา',
 	'名詞':'คำนาม',
@@ -30,55 +99,14 @@ POS_MAPPING = {
 	'その他':'อื่นๆ'
 }
 
-def tokenize(text:str, pos_thai=False) -> list:
+def parse_tokens(text:str, tagger=tagger) -> list:
 	"""
-	tokenize sentence into list of tokens with linguistic features (nothing : *)
-		0: surface form
-		1: phonemic
-		2: lemma-kana
-		3: lemma-kanji
-		4: pos - subcategory - subsubcategory
-		5: conjugation type
-		6: conjugation form
-		7: ???
-
-	>>> tokenize('大きい家は, 走りたくなるな')
-	[['大きい', 'オーキー', 'オオキイ', '大きい', '形容詞-一般', '形容詞', '連体形-一般', '3'],
-	['家', 'イエ', 'イエ', '家', '名詞-普通名詞-一般', '', '', '2'],
-	['は', 'ワ', 'ハ', 'は', '助詞-係助詞', '', '', ''],
-	['走り', 'ハシリ', 'ハシル', '走る', '動詞-一般', '五段-ラ行', '連用形-一般', '2'],
-	['たく', 'タク', 'タイ', 'たい', '助動詞', '助動詞-タイ', '連用形-一般', ''],
-	['なる', 'ナル', 'ナル', '成る', '動詞-非自立可能', '五段-ラ行', '終止形-一般', '1'],
-	['な', 'ナ', 'ナ', 'な', '助詞-終助詞', '', '', '']]
-
-	original method of MeCab returns 7-8 elements
-	if less than 10, filled with surface form instead
-
-	>>> tokenize('アニーが念じた')
-	[['アニー', 'アニー', 'アニー', 'アニー-外国', '名詞-固有名詞-人名-一般', '', '', '1'],
-	['が', 'ガ', 'ガ', 'が', '助詞-格助詞', '', '', ''],
-	['怒っ', 'オコッ', 'オコル', '怒る', '動詞-一般', '五段-ラ行', '連用形-促音便', '2'],
-	['た', 'タ', 'タ', 'た', '助動詞', '助動詞-タ', '終止形-一般', '']]
-
-	>>> tokenize('大きい家は, 走って見たくなるな', pos_thai=True)
-	[['大きい', 'オーキー', '大きい', 'i-adj'],
-	['家', 'イエ', '家', 'คำนาม'],
-	['は', 'ワ', 'は', 'คำช่วย'],
-	[',', ',', ',', 'คำนาม'],
-	['走っ', 'ハシッ', '走る', 'กริยากลุ่ม1'],
-	['て', 'テ', 'て', 'คำช่วย'],
-	['見', 'ミ', '見る', 'กริยากลุ่ม2'],
-	['たく', 'タク', 'たい', 'คำช่วยที่ผันรูป'],
-	['なる', 'ナル', '成る', 'กริยากลุ่ม1'],
-	['な', 'ナ', 'な', 'คำช่วย']]
-
+	run MeCab on cleaned text and fix digits and lemmas (uncached, use tokenize() instead)
+	tagger : another MeCab.Tagger for a background thread (one Tagger must not parse in two threads at once)
 	"""
-	### clean text
-	text = clean(text) 
 	### first, capture any digits and replace with index 1,2,3 ... in order to treat as 1 token
 	### '-273.15度から5,000度まで' => '1度から2度まで', [-273.15, 5,000]
-	digit_pattern = re.compile(r'[+-]?\d[\d,]*(?:\.\d+)?') # e.g. -273.15  +1,234.56
-	original_nums = re.findall(digit_pattern, text) # caputure digits as list
+	original_nums = DIGIT_PATTERN.findall(text) # caputure digits as list
 	for i, digit in enumerate(original_nums): # replace digit with index 0,1,2,...
 		text = text.replace(digit, str(i), 1)
 	### tokenize
@@ -119,8 +147,60 @@ def tokenize(text:str, pos_thai=False) -> list:
 		### compare the first character of surface and lemma
 		elif '-' in token[3] or token[0][0] != token[3][0]:
 			tokens[i][3] = token[0][0] + token[3][1:].split('-')[0] # replace first character and remove also -他動詞
+	return tokens
 
 
+def tokenize(text:str, pos_thai=False) -> list:
+	"""
+	tokenize sentence into list of tokens with linguistic features (nothing : *)
+		0: surface form
+		1: phonemic
+		2: lemma-kana
+		3: lemma-kanji
+		4: pos - subcategory - subsubcategory
+		5: conjugation type
+		6: conjugation form
+		7: ???
+
+	>>> tokenize('大きい家は, 走りたくなるな')
+	[['大きい', 'オーキー', 'オオキイ', '大きい', '形容詞-一般', '形容詞', '連体形-一般', '3'],
+	['家', 'イエ', 'イエ', '家', '名詞-普通名詞-一般', '', '', '2'],
+	['は', 'ワ', 'ハ', 'は', '助詞-係助詞', '', '', ''],
+	['走り', 'ハシリ', 'ハシル', '走る', '動詞-一般', '五段-ラ行', '連用形-一般', '2'],
+	['たく', 'タク', 'タイ', 'たい', '助動詞', '助動詞-タイ', '連用形-一般', ''],
+	['なる', 'ナル', 'ナル', '成る', '動詞-非自立可能', '五段-ラ行', '終止形-一般', '1'],
+	['な', 'ナ', 'ナ', 'な', '助詞-終助詞', '', '', '']]
+
+	original method of MeCab returns 7-8 elements
+	if less than 10, filled with surface form instead
+
+	>>> tokenize('アニーが念じた')
+	[['アニー', 'アニー', 'アニー', 'アニー-外国', '名詞-固有名詞-人名-一般', '', '', '1'],
+	['が', 'ガ', 'ガ', 'が', '助詞-格助詞', '', '', ''],
+	['怒っ', 'オコッ', 'オコル', '怒る', '動詞-一般', '五段-ラ行', '連用形-促音便', '2'],
+	['た', 'タ', 'タ', 'た', '助動詞', '助動詞-タ', '終止形-一般', '']]
+
+	>>> tokenize('大きい家は, 走って見たくなるな', pos_thai=True)
+	[['大きい', 'オーキー', '大きい', 'i-adj'],
+	['家', 'イエ', '家', 'คำนาม'],
+	['は', 'ワ', 'は', 'คำช่วย'],
+	[',', ',', ',', 'คำนาม'],
+	['走っ', 'ハシッ', '走る', 'กริยากลุ่ม1'],
+	['て', 'テ', 'て', 'คำช่วย'],
+	['見', 'ミ', '見る', 'กริยากลุ่ม2'],
+	['たく', 'タク', 'たい', 'คำช่วยที่ผันรูป'],
+	['なる', 'ナル', '成る', 'กริยากลุ่ม1'],
+	['な', 'ナ', 'な', 'คำช่วย']]
+
+	"""
+	### clean text
+	text = clean(text) 
+	### parse with MeCab only if the same text has not been parsed yet
+	tokens = TOKEN_CACHE.get(text)
+	if tokens is None:
+		tokens = parse_tokens(text)
+		TOKEN_CACHE.put(text, tokens)
+
 	### convert PoS tag into Thai
 	if pos_thai == False: 
 		return tokens # return original list
@@ -162,219 +242,64 @@ def yomikata(text:str, katakana=True, sep='', return_list=False) -> str:
 	# 5. if they exist in the ROMAJI_DICT, replace with ROMAJI
 	# 6. delete the characters 
 	# っ must duplicate following letter, so use the temporary char Q instead
-	tokens = tokenize(text)
+	phones = phones_from_tokens(tokenize(text))
+	if katakana == False:
+		phones = [kata2hira(w) for w in phones]
+	return phones if return_list else sep.join(phones) 
+
+
+def phones_from_tokens(tokens:list) -> list:
+	"""
+	make list of phonemics (katakana) from the result of tokenize()
+	助動詞, 助詞-接続助詞 and 接尾辞-名詞的-一般 are joined to the previous word
+	"""
 	phones = [] # katakana
 	for token in tokens:
 		pos = token[4]
 		if not pos.startswith('助動詞') and not pos.startswith('助詞-接続助詞') and pos != '接尾辞-名詞的-一般':
 			phones.append(token[1]) # append phonemic as new word
-		else:
+		elif phones:
 			phones[-1] += token[1]
-	if katakana == False:
-		phones = [kata2hira(w) for w in phones]
-	return phones if return_list else sep.join(phones) 
+		else: # the first token can not be joined
+			phones.append(token[1])
+	return phones
+
+
+##### BATCH API : iterable of sentences -> generator of results #####
+def tokenize_batch(texts, pos_thai=False):
+	"""
+	tokenize many sentences with the same tagger, yield results one by one in the input order
+
+	>>> list(tokenize_batch(['家', '本'], pos_thai=True))
+	[[['家', 'イエ', '家', 'คำนาม']], [['本', 'ホン', '本', 'คำนาม']]]
+	"""
+	for text in texts:
+		yield tokenize(text, pos_thai=pos_thai)
 
 
-def romanize(text:str) -> str:
+def yomikata_batch(texts, katakana=True, sep=''):
 	"""
+	yomikata() for many sentences, yield one reading per sentence
+	"""
+	for text in texts:
+		yield yomikata(text, katakana=katakana, sep=sep)
+
+
+def romanize_batch(texts, system='hepburn'):
+	"""
+	romanize() for many sentences, yield one romanization per sentence
+	"""
+	for text in texts:
+		yield romanize(text, system=system)
+
+
+def romanize(text:str, system='hepburn') -> str:
+	"""
+	system : 'hepburn' or 'kunrei' (columns of roman.csv)
+
 	>>> romanize('伊藤')
 	itoo
+	>>> romanize('新聞', system='kunrei')
+	sinbun
 	"""
-	text = yomikata(text, sep=' ')
-	result = ''
-	while len(text) > 0:
-		if text[0] == ' ':
-			result += ' '
-			text = text[1:]
-		elif len(text) >= 2 and text[1] in 'ァィゥェォヵヶャュョヮ': # 小書き文字
-			try:
-				result += ROMAJI_DICT[text[:2]]
-			except:
-				result += ROMAJI_DICT[text[0]] 
-				result += ROMAJI_DICT[text[1]]
-			text = text[2:] # delete first two characters
-		elif text[0] == 'ッ':
-			result += 'Q' # temp char for っ
-			text = text[1:]
-		elif text[0] == 'ー': # long vowel
-			result += result[-1] # repeat previous character
-			text = text[1:]
-		else:
-			try:
-				result += ROMAJI_DICT[text[0]]
-			except:
-				result += text[:1] # not exist = non-JP char
-			text = text[1:]
-	result = re.sub(r'Q+ ?(\w)', r'\1\1', result) # 'っ' substituted by following consonant
-	result = re.sub(r'Q+$', r'ʔ', result) # 'っ' in the final position => glottal stop
-	result = re.sub(r'n([mbp])', r'm\1', result) # bilabial assimilation
-	result = re.sub(r'o ?u$', 'oo', result) # final ou -> oo
-	result = result.replace('cch', 'tch') # イッチョウ -> itcho
-	return result
-
-ROMAJI_DICT ={
-	'ァ': 'a',
-	'ア': 'a',
-	'ィ': 'i',
-	'イ': 'i',
-	'イェ': 'ye',
-	'ゥ': 'u',
-	'ウ': 'u',
-	'ウィ': 'wi',
-	'ウェ': 'we',
-	'ウォ': 'wo',
-	'ヴ': 'vu',
-	'ヴァ': 'va',
-	'ヴィ': 'vi',
-	'ヴェ': 've',
-	'ヴォ': 'vo',
-	'ェ': 'e',
-	'エ': 'e',
-	'ォ': 'o',
-	'オ': 'o',
-	'カ': 'ka',
-	'ガ': 'ga',
-	'キ': 'ki',
-	'キャ': 'kya',
-	'キュ': 'kyu',
-	'キョ': 'kyo',
-	'ギ': 'gi',
-	'ギャ': 'gya',
-	'ギュ': 'gyu',
-	'ギョ': 'gyo',
-	'ク': 'ku',
-	'クヮ': 'kwa',
-	'クァ': 'kwa',
-	'クィ': 'kwi',
-	'クェ': 'kwe',
-	'クォ': 'kwo',
-	'グ': 'gu',
-	'グヮ': 'gwa',
-	'グァ': 'gwa',
-	'グィ': 'gwi',
-	'グェ': 'gwe',
-	'グォ': 'gwo',
-	'ケ': 'ke',
-	'ゲ': 'ge',
-	'コ': 'ko',
-	'ゴ': 'go',
-	'サ': 'sa',
-	'ザ': 'za',
-	'シ': 'shi',
-	'シャ': 'sha',
-	'シュ': 'shu',
-	'ショ': 'sho',
-	'シェ': 'she',
-	'ジ': 'ji',
-	'ジャ': 'ja',
-	'ジュ': 'ju',
-	'ジョ': 'jo',
-	'ジェ': 'je',
-	'ス': 'su',
-	'スィ': 'si',
-	'ズ': 'zu',
-	'ズィ': 'zi',
-	'セ': 'se',
-	'ゼ': 'ze',
-	'ソ': 'so',
-	'ゾ': 'zo',
-	'タ': 'ta',
-	'ダ': 'da',
-	'チ': 'chi',
-	'チャ': 'cha',
-	'チュ': 'chu',
-	'チョ': 'cho',
-	'チェ': 'che',
-	'ヂ': 'ji',
-	'ヂャ': 'ja',
-	'ヂュ': 'ju',
-	'ヂョ': 'jo',
-	'ヂェ': 'je',
-	'ツ': 'tsu',
-	'ツァ': 'tsa',
-	'ツィ': 'tsi',
-	'ツェ': 'tse',
-	'ツォ': 'tso',
-	'ヅ': 'zu',
-	'テ': 'te',
-	'ティ': 'ti',
-	'テュ': 'tyu',
-	'デ': 'de',
-	'ディ': 'di',
-	'デュ': 'dyu',
-	'ト': 'to',
-	'トゥ': 'tu',
-	'ド': 'do',
-	'ドゥ': 'du',
-	'ナ': 'na',
-	'ニ': 'ni',
-	'ニャ': 'nya',
-	'ニュ': 'nyu',
-	'ニョ': 'nyo',
-	'ニェ': 'nye',
-	'ヌ': 'nu',
-	'ネ': 'ne',
-	'ノ': 'no',
-	'ハ': 'ha',
-	'バ': 'ba',
-	'パ': 'pa',
-	'ヒ': 'hi',
-	'ヒャ': 'hya',
-	'ヒュ': 'hyu',
-	'ヒョ': 'hyo',
-	'ヒェ': 'hye',
-	'ビ': 'bi',
-	'ビャ': 'bya',
-	'ビュ': 'byu',
-	'ビョ': 'byo',
-	'ビェ': 'bye',
-	'ピ': 'pi',
-	'ピャ': 'pya',
-	'ピュ': 'pyu',
-	'ピョ': 'pyo',
-	'ピェ': 'pye',
-	'フ': 'fu',
-	'ファ': 'fa',
-	'フィ': 'fi',
-	'フェ': 'fe',
-	'フォ': 'fo',
-	'フュ': 'fyu',
-	'ブ': 'bu',
-	'プ': 'pu',
-	'ヘ': 'he',
-	'ベ': 'be',
-	'ペ': 'pe',
-	'ホ': 'ho',
-	'ボ': 'bo',
-	'ポ': 'po',
-	'マ': 'ma',
-	'ミ': 'mi',
-	'ミャ': 'mya',
-	'ミュ': 'myu',
-	'ミョ': 'myo',
-	'ム': 'mu',
-	'メ': 'me',
-	'モ': 'mo',
-	'ャ': 'ya',
-	'ヤ': 'ya',
-	'ュ': 'yu',
-	'ユ': 'yu',
-	'ョ': 'yo',
-	'ヨ': 'yo',
-	'ラ': 'ra',
-	'リ': 'ri',
-	'リャ': 'rya',
-	'リュ': 'ryu',
-	'リョ': 'ryo',
-	'リェ': 'rye',
-	'ル': 'ru',
-	'レ': 're',
-	'ロ': 'ro',
-	'ヮ': 'wa',
-	'ワ': 'wa',
-	'ヲ': 'o',
-	'ン': 'n',
-	'ヵ': 'ka',
-	'ヶ': 'ke',
-	'ッ': 'Q'
-}
\ No newline at end of file
+	return romanize_kana(yomikata(text, sep=' '), system=system)
@@ -1,10 +1,11 @@
-from flask import Flask, request, abort, render_template, jsonify
+from flask import Flask, Response, request, abort, render_template, jsonify, stream_with_context
 from linebot import LineBotApi, WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import MessageEvent, PostbackEvent, TextMessage, TextSendMessage, QuickReply, QuickReplyButton, MessageAction, PostbackAction, URIAction
-import os, random, re, time
+import os, random, re, time, itertools
 from JpProcessing import *
 from nozomibot_funcs import *
+from dispatcher import EventDispatcher
 
 class CustomFlask(Flask):
 	jinja_options = Flask.jinja_options.copy()
@@ -14,6 +15,15 @@ class CustomFlask(Flask):
 	))
 
 app = CustomFlask(__name__)
+DISPATCHER = EventDispatcher(workers=WEBHOOK_WORKERS, maxsize=WEBHOOK_QUEUE_SIZE)
+
+def dispatch(key, func, *args):
+	"""
+	run func on the worker of the key (user id) in WEBHOOK_ASYNC mode,
+	or here if the mode is off or the worker is full
+	"""
+	if not (WEBHOOK_ASYNC and DISPATCHER.submit(key, func, *args)):
+		func(*args)
 
 
 ################################################################################
@@ -28,16 +38,17 @@ def top_page():
 	elif request.method == 'POST':
 		word = request.form['word']
 		log_web('dict', word) # LOG SEARCH HISTORY
+		analysis = Analysis(word) # tokens & yomi of the word, computed once and shared by all lookups
 		if re.search(r'[ก-๙][ก-๙\.\-]+', word): # Thai word
-			meaning = get_word(word, format_for_linebot=False)# [yomi,word,thai]
+			meaning = get_word(word, format_for_linebot=False, analysis=analysis)# [yomi,word,thai]
 			if meaning == None:
 				return jsonify({'none':'true'})
 			return jsonify({'meaning':meaning, 'none':'false'})
 		else:
 			### get meaning
-			meaning = get_word(word, format_for_linebot=False)
+			meaning = get_word(word, format_for_linebot=False, analysis=analysis)
 			### get conjugation & convert to list of list [['辞書形\nรูปดิก','行く'],[...],...]
-			conj = conjugate(word.strip())
+			conj = conjugate_word(word, analysis=analysis)
 			if conj != None and len(conj) == 10: # verb
 				conj = [x for x in zip(['辞書形\nรูปดิก','ない形\nรูป nai','なかった形\nรูป nakatta','ます形\nรูป masu',
 				'て形\nรูป te','た形\nรูป ta','ば形\nรูป ba','命令形\nรูปคำสั่ง','意向形\nรูปตั้งใจ','可能形\nรูปสามารถ'], conj)]
@@ -45,18 +56,11 @@ def top_page():
 				conj = [x for x in zip(['辞書形\nรูปดิก','ない形\nรูป nai','なかった形\nรูป nakatta','です形\nรูป desu',
 				'て形\nรูป te','た形\nรูป ta','ば形\nรูป ba','副詞化\nadverb'], conj)]
 			### get accent
-			accent = get_accent(word, format_for_linebot=False)
+			accent = get_accent(word, format_for_linebot=False, analysis=analysis)
 			### get frequency
-			freq = get_rank(word)
+			freq = get_rank(word, analysis=analysis)
 			### get kanji [[kanji, on, kun, imi],...]
-			kanjis = []
-			for char in word:
-				if char in KANJI_DICT:
-					kanji = get_kanji(char, format_for_linebot=False)
-					if kanji != None and kanji not in kanjis:
-						kanjis.append(kanji)
-			if kanjis == []:
-				kanjis = None
+			kanjis = get_kanjis(word, analysis=analysis)
 
 		### PRINT FOR DEBUGGING ###
 		#print('\nCONJUGATION:', conj, '\n')
@@ -94,6 +98,103 @@ def web_tokenize():
 		return jsonify({'tokens':new_tokens, 'tokens2':tokens_thai, 'roman':roman})
 
 
+##### BATCH TOKENIZE : MANY SENTENCES IN ONE REQUEST #####
+BATCH_MODES = {
+	'tokenize': lambda texts: tokenize_batch(texts),
+	'thai': lambda texts: tokenize_batch(texts, pos_thai=True),
+	'katakana': lambda texts: yomikata_batch(texts, katakana=True),
+	'hiragana': lambda texts: yomikata_batch(texts, katakana=False),
+	'roman': lambda texts: romanize_batch(texts),
+	'kunrei': lambda texts: romanize_batch(texts, system='kunrei'),
+	'kanjilevel': lambda texts: kanji_profile_stream(texts),
+}
+@app.route("/tokenize/batch", methods=['POST'])
+def web_tokenize_batch():
+	"""
+	body : one sentence per line (text/plain)
+	       or one JSON per line (application/x-ndjson), e.g. {"text": "..."} or "..."
+	       or one JSON list (application/json), e.g. ["...", {"text": "..."}]
+	?mode= tokenize (default), thai, katakana, hiragana, roman, kunrei, kanjilevel
+	response is streamed as JSON lines {"text": "...", "result": ...} in the input order,
+	a line which cannot be read gives {"error": "...", "line": n} and the others go on
+	"""
+	mode = request.args.get('mode', 'tokenize')
+	if mode not in BATCH_MODES:
+		return jsonify({'error':f'mode must be one of {list(BATCH_MODES)}'}), 400
+	if request.mimetype == 'application/json': # one list, checked before the response starts
+		body = request.get_json(silent=True)
+		if not isinstance(body, list):
+			return jsonify({'error':'JSON body must be a list, or use application/x-ndjson'}), 400
+		lines = None
+	else:
+		body, lines = None, request.stream # read body line by line, not at once
+	is_ndjson = request.mimetype in ['application/x-ndjson', 'application/jsonl']
+	log_web('batch', mode) # LOG SEARCH HISTORY
+
+	def parse_item(item) -> str:
+		if isinstance(item, dict):
+			if not isinstance(item.get('text'), str):
+				raise ValueError('object without "text"')
+			return item['text']
+		return str(item)
+
+	def read_items():
+		"""
+		yield (line number, text, None) or (line number, None, error message)
+		"""
+		if body != None:
+			for n, item in enumerate(body, 1):
+				try:
+					yield n, parse_item(item), None
+				except ValueError as e:
+					yield n, None, str(e)
+			return
+		for n, line in enumerate(lines, 1):
+			try:
+				line = line.decode('utf8').rstrip('\r\n')
+				if is_ndjson:
+					if line.strip() == '':
+						continue
+					line = parse_item(json.loads(line))
+			except ValueError as e: # also JSONDecodeError and UnicodeDecodeError
+				yield n, None, str(e)
+				continue
+			yield n, line, None
+
+	def generate():
+		items, items_for_batch = itertools.tee(read_items())
+		results = BATCH_MODES[mode](text for _, text, error in items_for_batch if error is None)
+		for n, text, error in items:
+			if error != None:
+				yield json.dumps({'error':error, 'line':n}, ensure_ascii=False) + '\n'
+			else:
+				yield json.dumps({'text':text, 'result':next(results)}, ensure_ascii=False) + '\n'
+
+	return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+##### KANJI LEVEL PROFILE #####
+@app.route("/kanjilevel", methods=['GET', 'POST'])
+def web_kanjilevel():
+	"""
+	GET ?text=... / POST form or JSON {"text": "..."}
+	-> counts of JOYO / JUNICHI / IKKYUU / OTHER kanji, coverage ratios and unknown kanji
+	"""
+	if request.method == 'GET':
+		text = request.args.get('text', '')
+	else:
+		payload = request.get_json(silent=True)
+		if payload is None:
+			payload = request.form
+		elif not isinstance(payload, dict):
+			return jsonify({'error':'JSON body must be an object {"text": "..."}'}), 400
+		text = payload.get('text', '')
+		if not isinstance(text, str):
+			return jsonify({'error':'"text" must be a string'}), 400
+	log_web('kanjilevel', text[:100]) # LOG SEARCH HISTORY
+	return jsonify(kanji_profile(text))
+
+
 ##### EXAMPLE PAGE #####
 @app.route("/example", methods=['GET','POST'])
 def web_example():
@@ -129,8 +230,13 @@ def web_nhkweb():
 		genre = request.form['genre'] # get POST parameters: genre
 		keyword = request.form['keyword'].strip() # get POST parameters: input keyword
 		log_web('nhk', f'{genre}_{keyword}') # LOG SEARCH HISTORY
-		articles = get_parallel(genre, keyword) # id, title_easy_ruby, article_easy_ruby, title, article, date, genre 
-		return jsonify({'article':articles, 'nums':len(articles)})
+		try:
+			offset = max(int(request.form.get('offset', 0)), 0)
+			limit = min(max(int(request.form.get('limit', PARALLEL_PAGE_SIZE)), 1), 200)
+		except ValueError:
+			offset, limit = 0, PARALLEL_PAGE_SIZE
+		articles, nums = get_parallel(genre, keyword, offset, limit) # id, date, genre, title_easy_ruby, article_easy_ruby, title, article
+		return jsonify({'article':articles, 'nums':nums, 'offset':offset, 'limit':limit})
 
 
 ##### REQUEST & COMMENT AJAX #####
@@ -139,33 +245,66 @@ def web_request():
 	text = request.form['comment'].strip() # get POST parameters: text
 	name = request.form['name'].strip() # get POST parameters: username
 	try:
-		con, cursor = connect_sql('nozomibot')
 		date_now = get_time_now()
-		cursor.execute(f"INSERT INTO feedback (date, feedback, name) VALUES (%s, %s, %s);", (date_now, text, name))
-		con.commit()
-		con.close()
+		with connect_sql('nozomibot') as (con, cursor):
+			cursor.execute(f"INSERT INTO feedback (date, feedback, name) VALUES (%s, %s, %s);", (date_now, text, name))
+			con.commit()
 	except Exception as e:
 		print(e)
 	return jsonify({'result':'success'})
 
 
 ##### THAI2000 WORDS #####
-THAI2000 = pd.read_csv('data/thai2000.csv')
+def load_thai2000():
+	# {page No.: [[日本語, タイ語読み, タイ語文字],...]}, split once at load
+	df = load_frame('thai2000')
+	pages = {}
+	for page, row in zip(df['No.'].tolist(), df[['日本語','タイ語読み','タイ語文字']].values.tolist()):
+		pages.setdefault(page, []).append(row)
+	return pages
+
+THAI2000 = lazy('thai2000', load_thai2000)
+def get_thai2000_page(page:int, shuffle=False, seed=None) -> list:
+	# the same seed gives the same order, e.g. for flashcards prefetched page by page
+	rows = THAI2000.get().get(page, [])
+	if not shuffle:
+		return rows
+	order = random.Random(f'{seed}-{page}').sample(range(len(rows)), len(rows))
+	return [rows[i] for i in order]
+
+def get_seed(form) -> int:
+	try:
+		return int(form['seed'])
+	except (KeyError, ValueError):
+		return random.randrange(2**31)
+
 @app.route('/thai2000', methods=['GET','POST'])
 def web_thai2000():
 	if request.method == 'GET':
 		return render_template('thai2000.html')
 	elif request.method == 'POST':
-		print(request.form)
 		page = int(request.form['page']) # "2" -> 2
-		df_temp = THAI2000[THAI2000['No.'] == page][['日本語','タイ語読み','タイ語文字']]
-		if request.form['shuffle'] == 'true':
-			df_temp = df_temp.sample(frac=1).reset_index(drop=True)
-		return jsonify({'result': df_temp.values.tolist()})
+		shuffle = request.form.get('shuffle') == 'true'
+		seed = get_seed(request.form)
+		return jsonify({'result': get_thai2000_page(page, shuffle, seed), 'seed':seed})
+
+@app.route('/thai2000/pages', methods=['GET','POST'])
+def web_thai2000_pages():
+	# several pages in one response : pages=3,4,5 (at most 20) & shuffle=true & seed=123
+	form = request.form if request.method == 'POST' else request.args
+	try:
+		pages = [int(page) for page in form.get('pages', '').split(',') if page.strip() != '']
+	except ValueError:
+		abort(400)
+	if len(pages) == 0 or len(pages) > 20:
+		abort(400)
+	shuffle = form.get('shuffle') == 'true'
+	seed = get_seed(form)
+	return jsonify({'result': {page:get_thai2000_page(page, shuffle, seed) for page in pages}, 'seed':seed})
 
 
 ##### ONOMATOPOEIA #####
-ONOMATO = pd.read_csv('data/onomato.csv')
+ONOMATO = lazy('onomato', lambda: OnomatoIndex(load_frame('onomato')))
 @app.route('/onomato', methods=['GET','POST'])
 def web_onomato():
 	if request.method == 'GET':
@@ -173,38 +312,30 @@ def web_onomato():
 	elif request.method == 'POST':
 		onomatotype = request.form['onomatotype'] # 'all', 'gion', 'gitai', 'gijou'
 		word = request.form['word'].strip()
-		df = ONOMATO.copy().fillna('-')[['タイプ','日本語','タイ語','sense']]
-		if onomatotype == 'gion':
-			df = df[df['タイプ']=='擬音']
-		elif onomatotype == 'gitai':
-			df = df[df['タイプ']=='擬態']
-		elif onomatotype == 'gijou':
-			df = df[df['タイプ']=='擬情']
-		if word != '':
-			df = df[(df['日本語'].str.contains(word)) | (df['タイ語'].str.contains(word)) | (df['sense'].str.contains(word))]
-		return jsonify({'result': df.values.tolist()})
+		return Response(ONOMATO.get().search_json(onomatotype, word), mimetype='application/json')
 
 
 ##### NHKTHAI #####
-NHKTHAI = pd.read_json('data/nhk.json')
-NHKTHAI['date'] = NHKTHAI.date.apply(lambda x: str(x).split(' ')[0])
+def load_nhkthai():
+	df = load_frame('nhk')
+	df['date'] = df.date.apply(lambda x: str(x).split(' ')[0])
+	return NhkThaiCorpus(df)
+
+NHKTHAI = lazy('nhk', load_nhkthai)
 @app.route('/nhkthai', methods=['GET','POST'])
 def web_nhkthai():
 	if request.method == 'GET':
 		return render_template('nhkthai.html')
 	elif request.method == 'POST':
-		print(request.form)
 		year = request.form['year']
 		keyword = request.form['keyword'].strip()
-		if year != 'ALL':
-			df_temp = NHKTHAI[NHKTHAI.date.str.contains(year)]
-		else:
-			df_temp = NHKTHAI.copy()
-		if keyword != '':
-			df_temp = df_temp[(df_temp.headline.str.contains(keyword)) | (df_temp.article.str.contains(keyword))]
-			df_temp['article'] = df_temp.article.apply(lambda x: highlight(x, keyword))
-		df_temp = df_temp[['date','headline','article']]
-		return jsonify({'result': df_temp.values.tolist()})
+		try:
+			offset = max(int(request.form.get('offset', 0)), 0)
+			limit = min(max(int(request.form.get('limit', PARALLEL_PAGE_SIZE)), 1), 200)
+		except ValueError:
+			offset, limit = 0, PARALLEL_PAGE_SIZE
+		result, nums = NHKTHAI.get().search(year, keyword, offset, limit) # [[date, headline, article],...]
+		return jsonify({'result':result, 'nums':nums, 'offset':offset, 'limit':limit})
 
 
 ##### KANA #####
@@ -215,10 +346,7 @@ def web_kana():
 	elif request.method == 'POST':
 		input_text = request.form['input'].split('\n')
 		kanatype = request.form['kanatype']
-		if kanatype == 'hiragana':
-			output = '\n'.join([yomikata(line, katakana=False) for line in input_text])
-		else:
-			output = '\n'.join([yomikata(line, katakana=True) for line in input_text])
+		output = '\n'.join(yomikata_batch(input_text, katakana=(kanatype != 'hiragana')))
 		return jsonify(output)
 
 
@@ -237,14 +365,7 @@ def web_word(word):
 
 ##### SQL LOG FUNCTION #####
 def log_web(mode, text):
-	try:
-		con, cursor = connect_sql('nozomibot')
-		date_now = get_time_now()
-		cursor.execute(f"INSERT INTO log_web (date, mode, text) VALUES (%s, %s, %s);", (date_now, mode, text))
-		con.commit()
-		con.close()
-	except:
-		pass
+	SQL_LOGGER.log('log_web', get_time_now(), mode, text)
 
 
 ################################################################################
@@ -253,6 +374,20 @@ def log_web(mode, text):
 
 line_bot_api = LineBotApi(CHANNEL_ACCESS_TOKEN)
 handler = WebhookHandler(CHANNEL_SECRET)
+PROFILE_CACHE = TTLCache(ttl=float(os.environ.get('PROFILE_CACHE_TTL', '3600'))) # user id -> display name
+
+def get_display_name(user_id):
+	"""
+	display name of LINE user, cached to avoid one API call per message
+	"""
+	name = PROFILE_CACHE.get(user_id)
+	if name is None:
+		try:
+			name = line_bot_api.get_profile(user_id).display_name
+		except Exception:
+			return ''
+		PROFILE_CACHE.put(user_id, name)
+	return name
 
 @app.route("/line/callback", methods=['POST'])
 def callback():
@@ -264,12 +399,34 @@ def callback():
 	#app.logger.info("Request body: " + body)
 
 	# HANDLE WEBHOOK BODY
+	if not WEBHOOK_ASYNC:
+		try:
+			handler.handle(body, signature)
+		except InvalidSignatureError:
+			abort(400)
+		return 'OK'
+
+	# VERIFY SIGNATURE, THEN HANDLE EVENTS ON WORKERS
 	try:
-		handler.handle(body, signature)
+		events = handler.parser.parse(body, signature)
 	except InvalidSignatureError:
 		abort(400)
+	for event in events:
+		if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
+			func = handle_message
+		elif isinstance(event, PostbackEvent):
+			func = handle_postback
+		else:
+			continue
+		source = event.source
+		key = getattr(source, 'user_id', None) or getattr(source, 'group_id', None) or getattr(source, 'room_id', None)
+		dispatch(key, func, event)
 	return 'OK'
 
+@app.route("/webhook/status", methods=['GET'])
+def webhook_status():
+	return jsonify({'async':WEBHOOK_ASYNC, 'dispatcher':DISPATCHER.info(), 'logger':SQL_LOGGER.info(), 'datasets':datasets_info()})
+
 """ EXAMPLE OF WEBHOOK
 {
 	"destination": "1654034294",
@@ -318,23 +475,20 @@ def handle_message(event):
 	mode, reply = get_reply(text)
 
 	### GET USER INFO & INSERT INTO SQL LOG
-	profile = line_bot_api.get_profile(event.source.user_id)
-	if profile.display_name != '':
-		date_now = get_time_now()
-		con, cursor = connect_sql('nozomibot')
-		cursor.execute(f"INSERT INTO log_line (date, mode, text, username, userid) VALUES (%s, %s, %s, %s, %s);", (date_now, mode, text, profile.display_name, profile.user_id))
-		con.commit()
-		con.close()
+	user_id = event.source.user_id
+	display_name = get_display_name(user_id)
+	if display_name != '':
+		SQL_LOGGER.log('log_line', get_time_now(), mode, text, display_name, user_id)
 	
 	### SEND REPLY
 	if reply != None:
 		line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply))
 	elif mode == 'JOSHI_START':
 		items = [
-			QuickReplyButton(action=PostbackAction(label="Kakujoshi 5 ข้อ", data="action=joshi&type=格助詞&num=5")),
-			QuickReplyButton(action=PostbackAction(label="10 ข้อ", data="action=joshi&type=格助詞&num=10")),
-			QuickReplyButton(action=PostbackAction(label="All joshi 5 ข้อ", data="action=joshi&type=all&num=5")),
-			QuickReplyButton(action=PostbackAction(label="10 ข้อ", data="action=joshi&type=all&num=10"))
+			QuickReplyButton(action=PostbackAction(label="Kakujoshi 5 ข้อ", data=POSTBACK_CODEC.encode(QuizState('joshi', '格助詞', 5)))),
+			QuickReplyButton(action=PostbackAction(label="10 ข้อ", data=POSTBACK_CODEC.encode(QuizState('joshi', '格助詞', 10)))),
+			QuickReplyButton(action=PostbackAction(label="All joshi 5 ข้อ", data=POSTBACK_CODEC.encode(QuizState('joshi', 'all', 5)))),
+			QuickReplyButton(action=PostbackAction(label="10 ข้อ", data=POSTBACK_CODEC.encode(QuizState('joshi', 'all', 10))))
 		]
 		message = TextSendMessage(text="เลือกจำนวนข้อ", quick_reply=QuickReply(items=items))
 		line_bot_api.reply_message(event.reply_token, message)
@@ -344,11 +498,24 @@ def handle_message(event):
 
 @handler.add(PostbackEvent)
 def handle_postback(event):
-	postback = dict([x.split('=') for x in event.postback.data.split('&')]) # action=joshi&type=格助詞&num=5&Q=0&score=0
-	if postback['action'] == 'richmenu_help':
-		line_bot_api.reply_message(event.reply_token, TextSendMessage(text=DESCRIPTION))
-	elif postback['action'] == 'joshi':
-		text, labels, datas = get_postback(postback)
+	data = event.postback.data
+	if data.startswith(POSTBACK_PREFIX): # signed quiz state (postback.py)
+		try:
+			state = POSTBACK_CODEC.decode(data)
+		except PostbackError as e:
+			app.logger.warning(f'postback rejected: {e}')
+			return
+	else: # rich menu / quick replies sent before the signed format : action=joshi&type=格助詞&num=5
+		postback = parse_legacy(data)
+		if postback.get('action') == 'richmenu_help':
+			line_bot_api.reply_message(event.reply_token, TextSendMessage(text=DESCRIPTION))
+			return
+		elif postback.get('action') == 'joshi' and postback.get('type') in TYPES['joshi'] and postback.get('num', '10') in ['5', '10']:
+			state = QuizState('joshi', postback['type'], int(postback.get('num', 10))) # always from the start, Q & score are not trusted
+		else:
+			return
+	if state.kind == 'joshi':
+		text, labels, datas = get_postback(state)
 		if labels != None:
 			items = [QuickReplyButton(action=PostbackAction(label=label, display_text=label, data=data)) for label, data in zip(labels, datas)]
 			message = TextSendMessage(text=text, quick_reply=QuickReply(items=items))
@@ -385,42 +552,42 @@ def receive_message():
 
 				####################  DON'T HAVE TO EDIT ABOVE  #################### 
 
-				##### ONLY POSTBACK (NO MESSAGE - GET STRATED OR SELECT BY PERSISTENT MENU) #####
-				if message.get('postback'):
-					postback_payload = message['postback']['payload']
-					if postback_payload == "GET_STARTED": # get started -> greeting
-						send_message(memberID, 'สวัสดีครับ นี่เป็น nozomibot เวอร์ชันเฟสบุคครับ\nกดปุ่ม ≡ ตรงด้านข้างแล้วเมนูจะขึ้นครับ')
-					elif postback_payload == 'menu_quickstart':
-						send_message(memberID, DESCRIPTION)
-
-				##### MESSAGE #####
-				elif message.get('message'):
-					received_text = message['message'].get('text')
-					quickreply_payload = message['message'].get('quick_reply',{}).get('payload')
-					attachment = message['message'].get('attachments')
-
-					#### IF USER SENT TEXT MESSAGE ###
-					if received_text:
-						mode, reply = get_reply(received_text)
-						### SEND REPLY
-						if reply != None:
-							send_message(memberID, reply)
-						else:
-							pass
-						date_now = get_time_now()
-						con, cursor = connect_sql('nozomibot')
-						cursor.execute(f"INSERT INTO log_fb (date, mode, text, userid) VALUES (%s, %s, %s, %s);", (date_now, mode, received_text, memberID))
-						con.commit()
-						con.close()
-						
-
-
-					### IF USER SENT NON-TEXT , e.g. picture ###
-					if attachment:
-						pass
+				dispatch(memberID, handle_fb_message, memberID, message)
 		return "processed"
 
 
+def handle_fb_message(memberID, message):
+	##### ONLY POSTBACK (NO MESSAGE - GET STRATED OR SELECT BY PERSISTENT MENU) #####
+	if message.get('postback'):
+		postback_payload = message['postback']['payload']
+		if postback_payload == "GET_STARTED": # get started -> greeting
+			send_message(memberID, 'สวัสดีครับ นี่เป็น nozomibot เวอร์ชันเฟสบุคครับ\nกดปุ่ม ≡ ตรงด้านข้างแล้วเมนูจะขึ้นครับ')
+		elif postback_payload == 'menu_quickstart':
+			send_message(memberID, DESCRIPTION)
+
+	##### MESSAGE #####
+	elif message.get('message'):
+		received_text = message['message'].get('text')
+		quickreply_payload = message['message'].get('quick_reply',{}).get('payload')
+		attachment = message['message'].get('attachments')
+
+		#### IF USER SENT TEXT MESSAGE ###
+		if received_text:
+			mode, reply = get_reply(received_text)
+			### SEND REPLY
+			if reply != None:
+				send_message(memberID, reply)
+			else:
+				pass
+			SQL_LOGGER.log('log_fb', get_time_now(), mode, received_text, memberID)
+			
+
+
+		### IF USER SENT NON-TEXT , e.g. picture ###
+		if attachment:
+			pass
+
+
 def send_message(memberID, message_text):
 	r = requests.post("https://graph.facebook.com/v9.0/me/messages",
 		params={"access_token": FB_ACCESS_TOKEN},
@@ -435,6 +602,8 @@ def send_message(memberID, message_text):
 
 ###########################################################
 
+warm_up() # datasets in DATA_WARMUP, e.g. DATA_WARMUP=nhkparallel,short_sentence_easy
+
 if __name__ == "__main__":
 	port = int(os.getenv("PORT", 8000))
 	app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,399 @@
+"""
+columnar, memory-mapped store of the datasets in data/
+
+each dataset is compiled once into a directory data/store/<name>/ :
+	meta.json            columns, kinds and number of rows
+	<column>.npy         int / float / bool / datetime columns
+	<column>.data.npy    UTF-8 bytes of all strings of a column, each followed by \\x00
+	<column>.offsets.npy byte offset of each string (n+1 values)
+	<column>.nulls.npy   (only if the column has NaN) bool mask
+
+the files are opened with np.load(mmap_mode='r'), so opening a dataset parses nothing.
+only what stays on the memory map is shared by the gunicorn workers through the page cache : Table / StringColumn
+read directly, JsonMapping (kanji), and the dictionary indexes of dictindex.py (data/store/<name>.index/).
+load_frame() and load_columns() decode the columns into a DataFrame or lists, so these are one copy per worker
+(faster to load than the CSV, not shared).
+if a dataset has not been compiled, the loaders read the original file instead
+
+build:
+	python datastore.py build            # all datasets
+	python datastore.py build jtdic ...  # some of them
+"""
+import os, sys, json, time, threading
+import numpy as np
+
+DATA_DIR = 'data'
+STORE_DIR = os.environ.get('DATA_STORE_DIR', 'data/store')
+
+# name -> source file in DATA_DIR
+DATASETS = {
+	'jtdic': 'jtdic.csv',
+	'accent': 'accent.csv',
+	'bccwj_rank': 'bccwj_rank.csv',
+	'nhkparallel': 'nhkparallel.json',
+	'nhkeasy': 'nhkeasy.csv',
+	'nhk': 'nhk.json',
+	'short_sentence_easy': 'short_sentence_easy.csv',
+	'short_sentence_normal': 'short_sentence_normal.csv',
+	'thai2000': 'thai2000.csv',
+	'onomato': 'onomato.csv',
+	'thaimenu': 'thaimenu.csv',
+	'kanji': 'kanji.json', # {kanji: {...}} -> JsonMapping
+}
+MAPPINGS = {'kanji'}
+
+
+def read_source(name:str):
+	"""
+	read the original file : DataFrame, or dict for MAPPINGS
+	"""
+	path = os.path.join(DATA_DIR, DATASETS[name])
+	if name in MAPPINGS:
+		with open(path, 'r', encoding='utf8') as f:
+			return json.load(f)
+	import pandas as pd
+	if path.endswith('.json'):
+		return pd.read_json(path)
+	return pd.read_csv(path, encoding='utf8')
+
+
+##### BUILD #####
+def write_strings(directory:str, column:str, values:list):
+	encoded = [value.encode('utf8') for value in values]
+	if any(b'\x00' in value for value in encoded):
+		raise ValueError(f'column {column} contains \\x00')
+	offsets = np.zeros(len(encoded)+1, dtype=np.int64)
+	np.cumsum([len(value)+1 for value in encoded], out=offsets[1:])
+	data = np.frombuffer(b''.join(value + b'\x00' for value in encoded), dtype=np.uint8)
+	np.save(os.path.join(directory, f'{column}.data.npy'), data)
+	np.save(os.path.join(directory, f'{column}.offsets.npy'), offsets)
+
+def build_table(name:str, df, directory:str):
+	import pandas as pd
+	columns = []
+	for i, column in enumerate(df.columns):
+		series = df[column]
+		filename = f'c{i}' # column names can be any text (e.g. 日本語, No.)
+		if pd.api.types.is_bool_dtype(series):
+			kind = 'bool'
+		elif pd.api.types.is_datetime64_any_dtype(series):
+			kind = 'datetime'
+		elif pd.api.types.is_integer_dtype(series):
+			kind = 'int'
+		elif pd.api.types.is_float_dtype(series):
+			kind = 'float'
+		else:
+			kind = 'str'
+		if kind == 'str':
+			nulls = series.isna().to_numpy()
+			write_strings(directory, filename, ['' if null else str(value) for value, null in zip(series.tolist(), nulls)])
+			if nulls.any():
+				np.save(os.path.join(directory, f'{filename}.nulls.npy'), nulls)
+		elif kind == 'datetime':
+			np.save(os.path.join(directory, f'{filename}.npy'), series.to_numpy().astype('datetime64[ns]').view(np.int64))
+		else:
+			np.save(os.path.join(directory, f'{filename}.npy'), series.to_numpy())
+		columns.append({'name':str(column), 'file':filename, 'kind':kind})
+	return {'name':name, 'type':'table', 'length':len(df), 'columns':columns}
+
+def build_mapping(name:str, dic:dict, directory:str):
+	keys = sorted(dic)
+	write_strings(directory, 'keys', keys)
+	write_strings(directory, 'values', [json.dumps(dic[key], ensure_ascii=False) for key in keys])
+	return {'name':name, 'type':'mapping', 'length':len(keys)}
+
+def build(name:str):
+	directory = os.path.join(STORE_DIR, name)
+	os.makedirs(directory, exist_ok=True)
+	source = read_source(name)
+	if name in MAPPINGS:
+		meta = build_mapping(name, source, directory)
+	else:
+		meta = build_table(name, source, directory)
+	meta['source_mtime'] = os.path.getmtime(os.path.join(DATA_DIR, DATASETS[name]))
+	with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf8') as f:
+		json.dump(meta, f, ensure_ascii=False, indent=1)
+
+
+##### LOAD #####
+class StringColumn:
+	"""
+	read-only sequence of str over the memory-mapped UTF-8 data, strings are decoded on access
+	"""
+	def __init__(self, data:np.ndarray, offsets:np.ndarray):
+		# plain ndarray views of the memory map : slicing an np.memmap is many times slower
+		self.data = np.asarray(data)
+		self.offsets = np.asarray(offsets)
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			return [self[j] for j in range(*i.indices(len(self)))]
+		if i < 0:
+			i += len(self)
+		start, end = self.offsets[i], self.offsets[i+1] - 1
+		return self.data[start:end].tobytes().decode('utf8')
+
+	def __iter__(self):
+		return iter(self.tolist())
+
+	def tolist(self) -> list:
+		"""
+		all strings, decoded at once
+		"""
+		if len(self) == 0:
+			return []
+		return self.data[:-1].tobytes().decode('utf8').split('\x00')
+
+
+class Table:
+	"""
+	>>> table = load_table('jtdic')
+	>>> table['word'][0], len(table)
+	('愛', 12586)
+	>>> table.strings('thai', na='-')   # list of str, NaN -> "-"
+	"""
+	def __init__(self, directory:str, meta:dict):
+		self.directory = directory
+		self.meta = meta
+		self.kinds = {column['name']:column['kind'] for column in meta['columns']}
+		self.files = {column['name']:column['file'] for column in meta['columns']}
+		self.cache = {}
+
+	@property
+	def columns(self) -> list:
+		return list(self.kinds)
+
+	def __len__(self):
+		return self.meta['length']
+
+	def load(self, filename:str):
+		return np.load(os.path.join(self.directory, filename), mmap_mode='r')
+
+	def __getitem__(self, column:str):
+		"""
+		StringColumn for str columns, read-only memory-mapped ndarray for the others
+		"""
+		if column not in self.cache:
+			filename, kind = self.files[column], self.kinds[column]
+			if kind == 'str':
+				self.cache[column] = StringColumn(self.load(f'{filename}.data.npy'), self.load(f'{filename}.offsets.npy'))
+			elif kind == 'datetime':
+				self.cache[column] = self.load(f'{filename}.npy').view('datetime64[ns]')
+			else:
+				self.cache[column] = self.load(f'{filename}.npy')
+		return self.cache[column]
+
+	def nulls(self, column:str):
+		path = os.path.join(self.directory, f'{self.files[column]}.nulls.npy')
+		return np.load(path, mmap_mode='r') if os.path.exists(path) else None
+
+	def strings(self, column:str, na=None) -> list:
+		"""
+		column as list of str, null values replaced by `na` (None : keep "")
+		"""
+		values = self[column].tolist() if self.kinds[column] == 'str' else [str(value) for value in self[column].tolist()]
+		nulls = self.nulls(column) if self.kinds[column] == 'str' else None
+		if na != None and nulls is not None:
+			values = [na if null else value for value, null in zip(values, nulls.tolist())]
+		return values
+
+	def to_frame(self, columns=None):
+		"""
+		pandas DataFrame with the same columns and dtypes as the original file
+		"""
+		import pandas as pd
+		data = {}
+		for column in columns or self.columns:
+			if self.kinds[column] == 'str':
+				values = self[column].tolist()
+				nulls = self.nulls(column)
+				if nulls is not None:
+					values = [np.nan if null else value for value, null in zip(values, nulls.tolist())]
+				data[column] = values
+			else:
+				data[column] = np.array(self[column])
+		return pd.DataFrame(data)
+
+
+class JsonMapping:
+	"""
+	read-only dict over a compiled mapping, values are JSON-decoded on access
+
+	>>> KANJI = load_mapping('kanji')
+	>>> KANJI['亜']['on']
+	'ア'
+	"""
+	def __init__(self, directory:str):
+		self.keys_column = StringColumn(np.load(os.path.join(directory, 'keys.data.npy'), mmap_mode='r'),
+			np.load(os.path.join(directory, 'keys.offsets.npy'), mmap_mode='r'))
+		self.values_column = StringColumn(np.load(os.path.join(directory, 'values.data.npy'), mmap_mode='r'),
+			np.load(os.path.join(directory, 'values.offsets.npy'), mmap_mode='r'))
+		self.positions = None # key -> position, made at first access
+
+	def position(self, key):
+		if self.positions is None:
+			self.positions = {k:i for i, k in enumerate(self.keys_column.tolist())}
+		return self.positions.get(key)
+
+	def __getitem__(self, key):
+		i = self.position(key)
+		if i is None:
+			raise KeyError(key)
+		return json.loads(self.values_column[i])
+
+	def get(self, key, default=None):
+		i = self.position(key)
+		return default if i is None else json.loads(self.values_column[i])
+
+	def __contains__(self, key):
+		return self.position(key) is not None
+
+	def __len__(self):
+		return len(self.keys_column)
+
+	def __iter__(self):
+		return iter(self.keys_column.tolist())
+
+	def keys(self):
+		return self.keys_column.tolist()
+
+	def items(self):
+		for key, value in zip(self.keys_column.tolist(), self.values_column.tolist()):
+			yield key, json.loads(value)
+
+
+def store_meta(name:str):
+	"""
+	meta of the compiled dataset, None if it is not built or older than its source
+	"""
+	path = os.path.join(STORE_DIR, name, 'meta.json')
+	if not os.path.exists(path):
+		return None
+	with open(path, 'r', encoding='utf8') as f:
+		meta = json.load(f)
+	source = os.path.join(DATA_DIR, DATASETS[name])
+	if os.path.exists(source) and os.path.getmtime(source) > meta.get('source_mtime', 0):
+		return None
+	return meta
+
+def load_table(name:str):
+	"""
+	Table of the compiled dataset, or None if it has not been built
+	"""
+	meta = store_meta(name)
+	return None if meta is None else Table(os.path.join(STORE_DIR, name), meta)
+
+def load_frame(name:str, columns=None):
+	"""
+	DataFrame of the dataset : from the store if built, otherwise from the original file
+	the DataFrame is a copy in the memory of this process, use load_table() to keep reading the memory map
+	"""
+	table = load_table(name)
+	if table is None:
+		df = read_source(name)
+		return df if columns is None else df[columns]
+	return table.to_frame(columns)
+
+def load_columns(name:str, columns:list, na='-') -> dict:
+	"""
+	{column: list of str} without making a DataFrame, null values replaced by `na` (decoded in this process)
+	"""
+	table = load_table(name)
+	if table is None:
+		df = read_source(name)[columns].fillna(na).astype(str)
+		return {column:df[column].tolist() for column in columns}
+	return {column:table.strings(column, na=na) for column in columns}
+
+def load_mapping(name:str):
+	"""
+	JsonMapping of the compiled dataset, otherwise the dict from the original file
+	"""
+	if store_meta(name) is None:
+		return read_source(name)
+	return JsonMapping(os.path.join(STORE_DIR, name))
+
+
+##### LAZY DATASETS #####
+def current_rss() -> int:
+	# resident memory in bytes (linux), 0 if unknown
+	try:
+		with open('/proc/self/statm') as f:
+			return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except (OSError, ValueError, IndexError):
+		return 0
+
+class LazyDataset:
+	"""
+	dataset loaded at the first get(), only once even if threads ask at the same time
+
+	>>> NHK_PARALLEL = lazy('nhkparallel', lambda: load_frame('nhkparallel'))
+	>>> NHK_PARALLEL.get()   # DataFrame
+
+	builder : loader used only by warm() (warm_up at startup) instead of `loader`, for a dataset which is built
+	when its prebuilt file is missing : a slow build then runs at boot, never inside a request
+	"""
+	def __init__(self, name:str, loader, builder=None):
+		self.name = name
+		self.loader = loader
+		self.builder = builder
+		self.value = None
+		self.loaded = False
+		self.lock = threading.Lock()
+		self.load_seconds = None
+		self.rss_bytes = None # growth of resident memory during the load (approximate)
+
+	def load(self, loader):
+		if not self.loaded:
+			with self.lock:
+				if not self.loaded:
+					rss, start = current_rss(), time.perf_counter()
+					self.value = loader()
+					self.load_seconds = time.perf_counter() - start
+					self.rss_bytes = max(0, current_rss() - rss)
+					self.loaded = True
+		return self.value
+
+	def get(self):
+		return self.load(self.loader)
+
+	def warm(self):
+		return self.load(self.builder or self.loader)
+
+	def info(self) -> dict:
+		return {'loaded':self.loaded, 'load_seconds':self.load_seconds, 'rss_bytes':self.rss_bytes}
+
+LAZY_DATASETS = {} # name -> LazyDataset
+
+def lazy(name:str, loader=None, builder=None) -> LazyDataset:
+	"""
+	register a lazy dataset, loader defaults to load_frame(name)
+	"""
+	LAZY_DATASETS[name] = LazyDataset(name, loader or (lambda: load_frame(name)), builder)
+	return LAZY_DATASETS[name]
+
+def warm_up(names=None):
+	"""
+	load datasets now, names : list or comma separated str, 'all' for every registered dataset
+	default : environment variable DATA_WARMUP
+	"""
+	if names is None:
+		names = os.environ.get('DATA_WARMUP', '')
+	if isinstance(names, str):
+		names = list(LAZY_DATASETS) if names.strip() == 'all' else [name.strip() for name in names.split(',') if name.strip() != '']
+	for name in names:
+		LAZY_DATASETS[name].warm()
+
+def datasets_info() -> dict:
+	return {name:dataset.info() for name, dataset in LAZY_DATASETS.items()}
+
+
+if __name__ == '__main__':
+	if len(sys.argv) < 2 or sys.argv[1] != 'build':
+		print(__doc__)
+		sys.exit(1)
+	for name in sys.argv[2:] or DATASETS:
+		build(name)
+		print('built', name)
@@ -0,0 +1,160 @@
+"""
+reverse conjugation index : inflected form -> (lemma, form name, conjtype), without MeCab at lookup
+
+every form that verb_conj_from_lemma / adj_conj_from_lemma produce is generated once for the verbs and
+i-adjectives of JpProcessing/verbs.csv, bccwj_rank.csv and the JTDic headwords, in kanji and in kana
+(食べなかった -> 食べる, たべなかった -> たべる). lemmas are ordered by BCCWJ rank, so the most frequent comes first
+
+>>> deinflect('行けば')
+[('行く', 'con', '五段-カ行')]
+
+build (or at startup with DATA_WARMUP=deinflection, which builds it in memory if the file does not exist;
+the build runs MeCab over every verb / adj of bccwj_rank and JTDic, so a request never builds it :
+without the file and the warm-up, deinflect() returns [] and the callers fall back to tokenization):
+	python deinflection.py build data/deinflection.json
+"""
+import os, re, sys, csv, json
+import MeCab
+from JpProcessing.characters import kata2hira, is_hiragana
+from JpProcessing.tokenization import clean, parse_tokens
+from JpProcessing.conjugation import ABS_DIR, FORMS, ADJ_FORMS, fits_conjtype, kana_paradigm, conjugate_lemma
+from datastore import load_frame, load_columns, lazy
+
+FORM_NAMES = FORMS + [name for name in ADJ_FORMS if name not in FORMS] # form id = index, < 16
+JTDIC_PATTERN = re.compile(r'.{1,10}[うくぐすつぬぶむるい]') # headwords which can be a verb or i-adj
+
+def lemma_conjtype(word:str, tagger):
+	"""
+	conjtype of a verb / i-adj by MeCab (only when the index is built), None if the word is not one verb or adj
+	"""
+	tokens = parse_tokens(clean(word), tagger) # not through TOKEN_CACHE, each lemma is parsed only once
+	if len(tokens) == 1 and tokens[0][3] == word and tokens[0][4].startswith(('動詞', '形容詞')):
+		return tokens[0][5]
+	return None
+
+def collect_lemmas() -> list:
+	"""
+	[[lemma, conjtype, [kana, ...]], ...] from verbs.csv, bccwj_rank and JTDic, most frequent first
+	"""
+	tagger = MeCab.Tagger() # own tagger, not the one shared with the requests
+	lemmas = {} # (lemma, conjtype) -> kana list
+	with open(ABS_DIR + '/verbs.csv', 'r', encoding='utf8') as f:
+		for row in csv.DictReader(f):
+			if fits_conjtype(row['word'], row['kana'], row['conj']):
+				lemmas.setdefault((row['word'], row['conj']), []).append(row['kana'])
+	bccwj = load_frame('bccwj_rank')
+	rank = {}
+	for lemma, lForm, pos in zip(bccwj.lemma, bccwj.lForm, bccwj.pos):
+		rank.setdefault(lemma, len(rank))
+		if pos in ['動詞', '形容詞']:
+			conjtype = lemma_conjtype(lemma, tagger)
+			if conjtype != None:
+				lemmas.setdefault((lemma, conjtype), []).append(kata2hira(lForm))
+	jtdic = load_columns('jtdic', ['yomi', 'word'], na='-')
+	for yomi, word in zip(jtdic['yomi'], jtdic['word']):
+		if JTDIC_PATTERN.fullmatch(word):
+			conjtype = lemma_conjtype(word, tagger)
+			if conjtype != None:
+				lemmas.setdefault((word, conjtype), []).append(kata2hira(yomi))
+	ordered = sorted(lemmas.items(), key=lambda item: rank.get(item[0][0], len(rank))) # stable, ties keep the source order
+	# readings such as だく/いだく (抱く) are not used
+	return [[lemma, conjtype, [kana for kana in dict.fromkeys(kanas) if is_hiragana(kana)]] for (lemma, conjtype), kanas in ordered]
+
+def build_index(lemmas=None) -> dict:
+	"""
+	{'lemmas': [[lemma, conjtype], ...], 'forms': {form: [entry, ...]}}, entry = lemma id * 16 + form id
+	a reading is a lemma of its own (たべる), so that forms in kana are deinflected to the lemma in kana
+	"""
+	if lemmas is None:
+		lemmas = collect_lemmas()
+	result, lemma_ids, forms = [], {}, {}
+	for lemma, conjtype, kanas in lemmas:
+		try:
+			paradigm = conjugate_lemma(lemma, conjtype)
+		except Exception: # conjtype without rule, e.g. 文語
+			paradigm = None
+		if paradigm is None:
+			continue
+		names = ADJ_FORMS if len(paradigm) == len(ADJ_FORMS) else FORMS
+		for written in [paradigm] + [kana_paradigm(lemma, kana, paradigm) for kana in kanas if kana != lemma]:
+			if (written[0], conjtype) not in lemma_ids:
+				lemma_ids[(written[0], conjtype)] = len(result)
+				result.append([written[0], conjtype])
+			lemma_id = lemma_ids[(written[0], conjtype)]
+			for name, form in zip(names, written):
+				if form in ['', '-']:
+					continue
+				entry = lemma_id * 16 + FORM_NAMES.index(name)
+				entries = forms.setdefault(form, [])
+				if entry not in entries:
+					entries.append(entry)
+	return {'lemmas':result, 'forms':forms}
+
+
+class DeinflectionIndex:
+	"""
+	>>> index = DeinflectionIndex.load('data/deinflection.json')
+	>>> index.deinflect('食べなかった')
+	[('食べる', 'nakatta', '下一段-バ行')]
+	"""
+	def __init__(self, index:dict):
+		self.lemmas = [tuple(lemma) for lemma in index['lemmas']]
+		# one entry is kept as int, only ambiguous forms (いった : 行く, 言う) hold a tuple
+		self.forms = {form:(entries[0] if len(entries) == 1 else tuple(entries)) for form, entries in index['forms'].items()}
+
+	@classmethod
+	def load(cls, path:str):
+		with open(path, 'r', encoding='utf8') as f:
+			return cls(json.load(f))
+
+	def __len__(self):
+		return len(self.forms)
+
+	def __contains__(self, form:str):
+		return form in self.forms
+
+	def deinflect(self, form:str) -> list:
+		"""
+		[(lemma, form name, conjtype), ...] most frequent lemma first, [] if the form is unknown
+		form name : base, nai, nakatta, masu, te, ta, con, imp, vol, pot / desu, adv (i-adj)
+		"""
+		entries = self.forms.get(form)
+		if entries is None:
+			return []
+		if isinstance(entries, int):
+			entries = (entries,)
+		return [(self.lemmas[entry >> 4][0], FORM_NAMES[entry & 15], self.lemmas[entry >> 4][1]) for entry in entries]
+
+
+DEINFLECTION_PATH = os.environ.get('DEINFLECTION_PATH', 'data/deinflection.json')
+
+def load_index(build=False):
+	"""
+	index from DEINFLECTION_PATH. if the file does not exist : built from the dictionaries when build=True
+	(only by warm_up at startup), otherwise None
+	"""
+	if os.path.exists(DEINFLECTION_PATH):
+		return DeinflectionIndex.load(DEINFLECTION_PATH)
+	return DeinflectionIndex(build_index()) if build else None
+
+# DEINFLECTION.get() -> DeinflectionIndex, or None without the file and the warm-up (checked once, at the first get)
+DEINFLECTION = lazy('deinflection', load_index, builder=lambda: load_index(build=True))
+
+def deinflect(form:str) -> list:
+	"""
+	DEINFLECTION.get().deinflect(form), [] if the index is not available
+	"""
+	index = DEINFLECTION.get()
+	if index is None:
+		return []
+	return index.deinflect(form)
+
+
+if __name__ == '__main__':
+	if len(sys.argv) < 3 or sys.argv[1] != 'build':
+		print(__doc__)
+		sys.exit(1)
+	index = build_index()
+	with open(sys.argv[2], 'w', encoding='utf8') as f:
+		json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+	print(len(index['lemmas']), 'lemmas', len(index['forms']), 'forms')
@@ -0,0 +1,159 @@
+"""
+search indexes of the dictionaries jtdic, accent and bccwj_rank : the result columns (already rendered as str)
+and a TextIndex of each searched column
+
+each dictionary is built once into data/store/<name>.index/ and opened read-only with np.load(mmap_mode='r')
+(StringColumn, MappedTextIndex), so opening costs milliseconds and the pages are shared by the gunicorn workers.
+if it has not been built (or is older than its source), the same index is built in the memory of the process
+
+	>>> WORD_DICT = load_dictionary('jtdic')
+	>>> rows = WORD_DICT.rows(['yomi','word','thai'])
+	>>> [rows[i] for i in WORD_DICT.index['word'].exact('猫')]
+
+build (after `python datastore.py build`, reads the store if it is built, otherwise the original files):
+	python dictindex.py build                 # all dictionaries
+	python dictindex.py build accent ...      # some of them
+"""
+import os, re, sys, json
+import numpy as np
+from datastore import DATA_DIR, DATASETS, STORE_DIR, StringColumn, write_strings, load_columns, load_frame
+from textindex import TextIndex, MappedTextIndex
+
+
+##### RENDERING #####
+def accent_to_html(accent:str) -> str:
+	"""
+	convert accent text into html, class names are "accent_high" and "accent_low"
+	'あ\\いは/んす\\る' => <span class="accent_high">あ</span><span class="accent_low">いは</span>...
+	"""
+	accent = re.sub(r'((?<=^)|(?<=\\))(\w+?)((?=/)|(?=$))', r'<span class="accent_low">\2</span>', accent)
+	accent = re.sub(r'((?<=^)|(?<=/))(\w+?)((?=\\)|(?=$))', r'<span class="accent_high">\2</span>', accent)
+	accent = re.sub(r'(?<!<)([/\\])', r'<span class="accent_bar">\1</span>', accent)
+	return accent
+
+def accent_to_line(row:list) -> str:
+	"""
+	render one row ['word','accent','english'] for Linebot, "-" columns are skipped
+	['人形', 'に/んぎょう', '-'] => 'word: 人形\naccent: に/んぎょう'
+	"""
+	word = ' '.join([column for column in (row[0], row[2]) if column != '-'])
+	return f'word: {word}'.strip() + '\naccent: ' + row[1]
+
+# PoS Thai of BCCWJ rank rows (not the same as JpProcessing.tokenization.POS_MAPPING)
+RANK_POS_MAPPING = {'動詞':'กริยา','名詞':'คำนาม','形容詞':'i-adj','助詞':'คำช่วย','助動詞':'คำช่วยที่ผันรูป','副詞':'adv','接頭辞':'prefix','接尾辞':'suffix',
+	'連体詞':'คำขยายคำนาม','記号':'เครื่องหมาย','感動詞':'คำอุทาน','フィラー':'filler','接続詞':'คำเชื่อม','その他':'others'}
+
+
+##### COLUMNS OF EACH DICTIONARY #####
+def jtdic_columns() -> dict:
+	return load_columns('jtdic', ['yomi','word','thai'], na='-') # nan -> "-"
+
+def accent_columns() -> dict:
+	columns = load_columns('accent', ['word','accent','yomi','english'], na='-') # nan -> "-"
+	rows = list(zip(columns['word'], columns['accent'], columns['english']))
+	columns['html'] = [accent_to_html(accent) for _, accent, _ in rows] # FOR WEB API
+	columns['line'] = [accent_to_line(row) for row in rows] # FOR LINEBOT
+	return columns
+
+def bccwj_rank_columns() -> dict:
+	# ['lemma','rank','lForm','pos','core_pmw'] stringified, rows are in order of rank, PoS with Thai
+	df = load_frame('bccwj_rank')
+	columns = {str(column):[str(x) for x in df[column].tolist()] for column in df.columns}
+	columns['pos'] = [f'{pos} {RANK_POS_MAPPING[pos]}' if pos in RANK_POS_MAPPING else pos for pos in columns['pos']]
+	return columns
+
+# name -> (columns, searched columns)
+DICTIONARIES = {
+	'jtdic': (jtdic_columns, ['yomi','word','thai']),
+	'accent': (accent_columns, ['word','yomi','english']),
+	'bccwj_rank': (bccwj_rank_columns, ['lemma','lForm']),
+}
+
+
+class Rows:
+	"""
+	rows[i] -> [value of each column], for textindex.unique_ids() / merge_tiers() without a list of all rows
+	"""
+	def __init__(self, columns:list):
+		self.columns = columns
+
+	def __len__(self):
+		return len(self.columns[0])
+
+	def __getitem__(self, i):
+		return [column[i] for column in self.columns]
+
+
+class Dictionary:
+	"""
+	columns : name -> sequence of str (list, or StringColumn on the memory map)
+	index   : name -> TextIndex, or MappedTextIndex on the memory map
+	"""
+	def __init__(self, columns:dict, index:dict):
+		self.columns = columns
+		self.index = index
+
+	def __len__(self):
+		return len(next(iter(self.columns.values())))
+
+	def rows(self, names:list) -> Rows:
+		return Rows([self.columns[name] for name in names])
+
+	@classmethod
+	def build(cls, name:str):
+		reader, searched = DICTIONARIES[name]
+		columns = reader()
+		return cls(columns, {column:TextIndex(columns[column]) for column in searched})
+
+	def save(self, directory:str, meta:dict):
+		os.makedirs(directory, exist_ok=True)
+		for column, values in self.columns.items():
+			write_strings(directory, column, values)
+		for column, index in self.index.items():
+			index.save(directory, f'{column}.index')
+		meta = dict(meta, length=len(self), columns=list(self.columns), index=list(self.index))
+		with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf8') as f:
+			json.dump(meta, f, ensure_ascii=False, indent=1)
+
+	@classmethod
+	def open(cls, directory:str, meta:dict):
+		load = lambda filename: np.load(os.path.join(directory, filename), mmap_mode='r')
+		columns = {column:StringColumn(load(f'{column}.data.npy'), load(f'{column}.offsets.npy')) for column in meta['columns']}
+		return cls(columns, {column:MappedTextIndex(directory, f'{column}.index') for column in meta['index']})
+
+
+def dictionary_meta(name:str):
+	"""
+	meta of the built dictionary, None if it is not built or older than its source
+	"""
+	path = os.path.join(STORE_DIR, f'{name}.index', 'meta.json')
+	if not os.path.exists(path):
+		return None
+	with open(path, 'r', encoding='utf8') as f:
+		meta = json.load(f)
+	source = os.path.join(DATA_DIR, DATASETS[name])
+	if os.path.exists(source) and os.path.getmtime(source) > meta.get('source_mtime', 0):
+		return None
+	return meta
+
+def load_dictionary(name:str) -> Dictionary:
+	"""
+	Dictionary on the memory map if built, otherwise built in this process
+	"""
+	meta = dictionary_meta(name)
+	if meta is None:
+		return Dictionary.build(name)
+	return Dictionary.open(os.path.join(STORE_DIR, f'{name}.index'), meta)
+
+def build(name:str):
+	meta = {'name':name, 'source_mtime':os.path.getmtime(os.path.join(DATA_DIR, DATASETS[name]))}
+	Dictionary.build(name).save(os.path.join(STORE_DIR, f'{name}.index'), meta)
+
+
+if __name__ == '__main__':
+	if len(sys.argv) < 2 or sys.argv[1] != 'build':
+		print(__doc__)
+		sys.exit(1)
+	for name in sys.argv[2:] or DICTIONARIES:
+		build(name)
+		print('built', name)
@@ -0,0 +1,80 @@
+"""
+worker pool for webhook events
+
+events of the same key (user id) always go to the same worker, so they are processed in order,
+while events of different users run in parallel. each worker has a bounded queue;
+when it is full the event is rejected and the caller can process it by itself
+
+>>> DISPATCHER = EventDispatcher(workers=4, maxsize=100)
+>>> DISPATCHER.submit(user_id, handle_message, event)
+True
+"""
+import queue, threading, time, zlib, logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class EventDispatcher:
+	def __init__(self, workers=4, maxsize=100, name='webhook'):
+		self.queues = [queue.Queue(maxsize=maxsize) for _ in range(workers)]
+		self.threads = []
+		self.name = name
+		self.lock = threading.Lock()
+		self.stats = {'submitted':0, 'processed':0, 'failed':0, 'rejected':0, 'max_waiting':0, 'max_delay':0.0}
+
+	def start(self):
+		with self.lock:
+			if self.threads != []:
+				return
+			for n, tasks in enumerate(self.queues):
+				thread = threading.Thread(target=self.run, args=(tasks,), name=f'{self.name}-{n}', daemon=True)
+				thread.start()
+				self.threads.append(thread)
+
+	def worker_of(self, key) -> queue.Queue:
+		# crc32 instead of hash() : same worker for the same user in every process
+		return self.queues[zlib.crc32(str(key).encode('utf8')) % len(self.queues)]
+
+	def submit(self, key, func, *args) -> bool:
+		"""
+		queue func(*args) on the worker of the key, return False if that worker is full
+		"""
+		if self.threads == []:
+			self.start()
+		tasks = self.worker_of(key)
+		try:
+			tasks.put_nowait((time.monotonic(), func, args))
+		except queue.Full:
+			with self.lock:
+				self.stats['rejected'] += 1
+			return False
+		with self.lock:
+			self.stats['submitted'] += 1
+			self.stats['max_waiting'] = max(self.stats['max_waiting'], tasks.qsize())
+		return True
+
+	def run(self, tasks:queue.Queue):
+		while True:
+			submitted, func, args = tasks.get()
+			delay = time.monotonic() - submitted
+			try:
+				func(*args)
+				key = 'processed'
+			except Exception:
+				LOGGER.exception('error in %s', getattr(func, '__name__', func))
+				key = 'failed'
+			with self.lock:
+				self.stats[key] += 1
+				self.stats['max_delay'] = max(self.stats['max_delay'], delay)
+			tasks.task_done()
+
+	def join(self):
+		"""
+		wait until all queued events are processed
+		"""
+		for tasks in self.queues:
+			tasks.join()
+
+	def info(self) -> dict:
+		with self.lock:
+			return dict(self.stats, workers=len(self.queues), waiting=[tasks.qsize() for tasks in self.queues])
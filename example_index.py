@@ -0,0 +1,252 @@
+"""
+sentence-level example index for get_nhk / get_tweet
+
+documents are split into sentences once at build time, and a character 1-gram & 2-gram
+inverted index maps to sentence ids. everything is stored in one SQLite file,
+so a query is some primary-key lookups instead of LIKE '%query%' over the whole table
+
+build from MySQL (tables nhkweb, tweetjp):
+	python example_index.py build data/example_index.db
+build from text files (one document per line):
+	python example_index.py build data/example_index.db --nhk nhk.txt --tweet tweet.txt
+"""
+import re, os, sys, random, sqlite3, threading
+from array import array
+
+SENTENCE_PATTERN = re.compile(r'[^。\s!\?！？]+[。\s!\?！？]*') # sentence + its final punctuations
+
+def split_sentences(text:str) -> list:
+	"""
+	>>> split_sentences('雨です。明日は？ 晴れ')
+	['雨です。', '明日は？ ', '晴れ']
+	"""
+	return SENTENCE_PATTERN.findall(text)
+
+def is_delimiter(char:str) -> bool:
+	# same characters as [。\s!\?！？]
+	return char in '。!?！？' or char.isspace()
+
+def extract_sentences(text:str, query:str):
+	"""
+	yield each sentence of the text which contains the query, with its final punctuations
+	the query is located by str.find (treated as a literal, no regex is compiled)
+	and expanded to the surrounding sentence boundaries
+
+	>>> list(extract_sentences('雨です。明日は雨？ 晴れ', '雨'))
+	['雨です。', '明日は雨？ ']
+	"""
+	length = len(text)
+	pos = text.find(query)
+	while pos != -1:
+		start = pos
+		while start > 0 and not is_delimiter(text[start-1]):
+			start -= 1
+		end = pos + len(query)
+		while end < length and not is_delimiter(text[end]):
+			end += 1
+		while end < length and is_delimiter(text[end]):
+			end += 1
+		yield text[start:end]
+		pos = text.find(query, max(end, pos+1))
+
+def collect_examples(documents, query:str, limit=100, max_chr=None, min_chr=0) -> list:
+	"""
+	collect up to `limit` distinct example sentences from documents, stop as soon as enough are found
+	max_chr : if the whole document is shorter than this, use the document instead (for tweets)
+	min_chr : exclude sentences shorter than this
+	"""
+	result, seen = [], set()
+	for document in documents:
+		if max_chr != None and len(document) < max_chr:
+			sentences = [document] if query in document else []
+		else:
+			sentences = extract_sentences(document, query)
+		for sentence in sentences:
+			text = sentence.strip()
+			if len(text) < len(query) + 2 or len(sentence) <= min_chr or text in seen:
+				continue
+			seen.add(text)
+			result.append(text)
+			if len(result) >= limit:
+				return result
+	return result
+
+def grams_of(text:str) -> set:
+	"""
+	character 1-grams and 2-grams, same as textindex.TextIndex
+	"""
+	return set(text) | {text[i:i+2] for i in range(len(text)-1)}
+
+def query_grams(query:str) -> list:
+	"""
+	grams needed to find the query: the 1-gram for one character, otherwise all 2-grams
+	"""
+	if len(query) == 1:
+		return [query]
+	return list(dict.fromkeys([query[i:i+2] for i in range(len(query)-1)]))
+
+
+def random_chunks(ids, size:int):
+	"""
+	yield the ids in random order, `size` at a time, by partial Fisher-Yates shuffle
+	only the consumed part is shuffled (in place, no copy), e.g. 1 chunk out of the whole corpus for a one-character query
+	"""
+	n = len(ids)
+	for start in range(0, n, size):
+		end = min(start + size, n)
+		for i in range(start, end):
+			j = random.randrange(i, n)
+			ids[i], ids[j] = ids[j], ids[i]
+		yield ids[start:end]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, source TEXT, text TEXT);
+CREATE TABLE IF NOT EXISTS sentences (id INTEGER PRIMARY KEY, doc_id INTEGER, text TEXT);
+CREATE TABLE IF NOT EXISTS postings (source TEXT, gram TEXT, ids BLOB, PRIMARY KEY (source, gram)) WITHOUT ROWID;
+"""
+
+def build_index(path:str, sources:dict, commit_every=10000):
+	"""
+	sources: {'nhk': iterable of articles, 'tweet': iterable of tweets}
+	postings are kept in memory as array('I') until the end of each source
+	"""
+	if os.path.exists(path):
+		os.remove(path)
+	con = sqlite3.connect(path)
+	con.executescript(SCHEMA)
+	sentence_id = 0
+	for source, documents in sources.items():
+		postings = {}
+		for n, document in enumerate(documents):
+			document = str(document)
+			doc_id = con.execute('INSERT INTO docs (source, text) VALUES (?, ?)', (source, document)).lastrowid
+			rows = []
+			for sentence in split_sentences(document):
+				sentence_id += 1
+				rows.append((sentence_id, doc_id, sentence))
+				for gram in grams_of(sentence.strip()):
+					posting = postings.get(gram)
+					if posting is None:
+						posting = postings[gram] = array('I')
+					posting.append(sentence_id)
+			con.executemany('INSERT INTO sentences (id, doc_id, text) VALUES (?, ?, ?)', rows)
+			if n % commit_every == 0:
+				con.commit()
+		con.executemany('INSERT INTO postings (source, gram, ids) VALUES (?, ?, ?)',
+			((source, gram, posting.tobytes()) for gram, posting in postings.items()))
+		con.commit()
+	con.close()
+
+
+class ExampleIndex:
+	"""
+	read-only access to the file made by build_index()
+
+	>>> index = ExampleIndex('data/example_index.db')
+	>>> index.search('nhk', '発表', limit=5)
+	['政府は新しい計画を発表しました。', ...]
+	"""
+	def __init__(self, path:str):
+		self.path = path
+		self.con = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+		self.lock = threading.Lock()
+
+	@classmethod
+	def open(cls, path:str):
+		"""
+		return None if the index has not been built
+		"""
+		return cls(path) if os.path.exists(path) else None
+
+	def posting(self, source:str, gram:str) -> array:
+		with self.lock:
+			row = self.con.execute('SELECT ids FROM postings WHERE source = ? AND gram = ?', (source, gram)).fetchone()
+		ids = array('I')
+		if row != None:
+			ids.frombytes(row[0])
+		return ids
+
+	def candidate_ids(self, source:str, query:str) -> list:
+		"""
+		sentence ids which contain all grams of the query (not verified yet)
+		"""
+		postings = sorted([self.posting(source, gram) for gram in query_grams(query)], key=len)
+		if len(postings) == 0 or len(postings[0]) == 0:
+			return []
+		if len(postings) == 1: # one character : the posting itself, not copied into a set
+			return postings[0]
+		ids = set(postings[0])
+		for posting in postings[1:]:
+			ids.intersection_update(posting)
+			if len(ids) == 0:
+				break
+		return list(ids)
+
+	def fetch(self, ids:list, max_chr=None) -> list:
+		"""
+		[(sentence, document), ...], document is None unless it is shorter than max_chr
+		(the text of long documents is never read into Python)
+		"""
+		placeholder = ','.join(['?'] * len(ids))
+		with self.lock:
+			return self.con.execute(f"""SELECT s.text, CASE WHEN length(d.text) < ? THEN d.text END FROM sentences s JOIN docs d ON s.doc_id = d.id
+				WHERE s.id IN ({placeholder})""", [-1 if max_chr is None else max_chr] + list(ids)).fetchall()
+
+	def search(self, source:str, query:str, limit=100, max_chr=None, min_chr=0, chunk=200) -> list:
+		"""
+		sample up to `limit` distinct sentences which contain the query, in random order
+		max_chr : if the whole document is shorter than this, return the document instead (for tweets)
+		min_chr : exclude sentences shorter than this
+		return None if no sentence contains the query
+		"""
+		ids = self.candidate_ids(source, query)
+		if len(ids) == 0:
+			return None
+		found, result, seen = False, [], set()
+		for sample in random_chunks(ids, chunk):
+			for sentence, document in self.fetch(sample, max_chr):
+				if query not in sentence:
+					continue
+				found = True
+				text = document if document != None else sentence
+				text = text.strip()
+				if len(text) < len(query) + 2 or len(sentence) <= min_chr or text in seen:
+					continue
+				seen.add(text)
+				result.append(text)
+				if len(result) >= limit:
+					return result
+		return result if found else None
+
+
+##### BUILD FROM COMMAND LINE #####
+def read_lines(path:str):
+	with open(path, encoding='utf8') as f:
+		for line in f:
+			line = line.strip()
+			if line != '':
+				yield line
+
+def read_mysql(table:str, column:str):
+	import mysql.connector
+	from dotenv import load_dotenv
+	load_dotenv()
+	con = mysql.connector.connect(user=os.environ['SQL_USERNAME'], password=os.environ['SQL_PASSWORD'],
+		host=os.environ['SQL_HOSTNAME'], database='nozomibot')
+	cursor = con.cursor()
+	cursor.execute(f'SELECT {column} FROM {table};')
+	for (text,) in cursor:
+		yield text
+	con.close()
+
+if __name__ == '__main__':
+	if len(sys.argv) < 3 or sys.argv[1] != 'build':
+		print(__doc__)
+		sys.exit(1)
+	args = sys.argv[3:]
+	if args == []:
+		sources = {'nhk':read_mysql('nhkweb', 'article'), 'tweet':read_mysql('tweetjp', 'tweet')}
+	else:
+		sources = {args[i][2:]:read_lines(args[i+1]) for i in range(0, len(args), 2)} # --nhk file --tweet file
+	build_index(sys.argv[2], sources)
@@ -0,0 +1,170 @@
+"""
+item bank of the joshi (particle) quiz
+
+every sentence of short_sentence_easy.csv / short_sentence_normal.csv is tokenized once, and each particle
+which can be asked is stored as an item (sentence id, token index) per quiz level and joshi type.
+a question is then one weighted sampling in O(1) by an alias table, no MeCab parse at request time
+
+weight of an item = BALANCE[answer] / number of items in the same sentence
+this is the same distribution as the former joshi_quiz : sentence at random -> particle at random ->
+accepted with probability BALANCE[answer] (e.g. の only 20%), otherwise start again
+
+build (or at startup with DATA_WARMUP=joshi_bank, which builds it in memory if the file does not exist;
+a request never builds it, without the file and the warm-up the quiz is not available):
+	python joshi_bank.py build data/joshi_bank.json
+"""
+import re, os, sys, json, random
+from JpProcessing import max_kanji_level
+from JpProcessing.tokenization import clean, parse_tokens
+from datastore import load_frame, lazy
+
+KAKUJOSHI = ['を','に','が','と','の','より','へ','から','で'] # 助詞-格助詞
+FUKUJOSHI = ['は','か','も','など','や','まで','たり','ぐらい','だけ'] # 助詞-副助詞 / 助詞-係助詞
+JOSHI_TYPES = ['格助詞', '副助詞', 'all']
+
+# probability to keep a question whose answer is the joshi, in order to balance answers
+BALANCE = {'の':0.2, 'が':0.3, 'に':0.3, 'は':0.3, 'を':0.4, 'て':0.4, 'と':0.5, 'で':0.5}
+
+def level_of(source:str, level:float, kanji_level:int):
+	"""
+	quiz level '1' ~ '4' of a sentence, None if it is not used
+	levels 1, 2 use only sentences whose kanji are all 常用漢字
+	"""
+	if source == 'normal':
+		return '4' # ยากมาก
+	if level > 4.3:
+		return '1' if kanji_level <= 1 else None # ง่าย
+	elif level > 3.6:
+		return '2' if kanji_level <= 1 else None # กลาง
+	elif level < 3.6:
+		return '3' # ยาก
+	return None # level == 3.6 is in no level (same as the former filters)
+
+def is_slot(token:list, joshi_type:str) -> bool:
+	"""
+	whether the token can be masked as the answer
+	"""
+	if joshi_type == '格助詞':
+		return re.match(r'助詞-格助詞', token[4]) != None and token[0] in KAKUJOSHI
+	elif joshi_type == '副助詞':
+		return re.match(r'助詞-(副|係)助詞', token[4]) != None and token[0] in FUKUJOSHI
+	elif joshi_type == 'all':
+		return re.match(r'助詞-(格|副|係)助詞', token[4]) != None and token[0] in FUKUJOSHI+KAKUJOSHI
+	return False
+
+def build_bank(sources=None) -> dict:
+	"""
+	sources : {'easy': DataFrame, 'normal': DataFrame} with columns sent, level
+	return {'sentences': [[surface, ...], ...], 'items': {'1|格助詞': [[sentence id, token index, weight], ...], ...}}
+	"""
+	if sources is None:
+		sources = {'easy':load_frame('short_sentence_easy'), 'normal':load_frame('short_sentence_normal')}
+	sentences, items = [], {}
+	for source, df in sources.items():
+		for sent, level in zip(df.sent.astype(str), df.level):
+			quiz_level = level_of(source, level, max_kanji_level(sent))
+			if quiz_level is None:
+				continue
+			tokens = parse_tokens(clean(sent)) # not through TOKEN_CACHE, each sentence is parsed only once
+			sentence_id = len(sentences)
+			sentences.append([token[0] for token in tokens])
+			for joshi_type in JOSHI_TYPES:
+				slots = [i for i, token in enumerate(tokens) if is_slot(token, joshi_type)]
+				for i in slots:
+					weight = BALANCE.get(tokens[i][0], 1.0) / len(slots)
+					items.setdefault(f'{quiz_level}|{joshi_type}', []).append([sentence_id, i, round(weight, 6)])
+	return {'sentences':sentences, 'items':items}
+
+def alias_table(weights:list) -> tuple:
+	"""
+	Vose's alias method : (prob, alias) for one weighted draw in O(1)
+	draw i uniformly, keep it with probability prob[i], otherwise take alias[i]
+	"""
+	n, total = len(weights), sum(weights)
+	scaled = [weight * n / total for weight in weights]
+	prob, alias = [1.0] * n, list(range(n))
+	small = [i for i, p in enumerate(scaled) if p < 1.0]
+	large = [i for i, p in enumerate(scaled) if p >= 1.0]
+	while small and large:
+		i, j = small.pop(), large.pop()
+		prob[i], alias[i] = scaled[i], j # the rest of column i is filled by j
+		scaled[j] -= 1.0 - scaled[i]
+		(small if scaled[j] < 1.0 else large).append(j)
+	return prob, alias # columns left in small / large by rounding keep prob 1.0
+
+
+class JoshiBank:
+	"""
+	>>> bank = JoshiBank.load('data/joshi_bank.json')
+	>>> bank.question('1', '格助詞')
+	('２０日、東京都と市場で働く人たちが会議___開きました。', 'を', ['に', 'が', 'と', 'から'])
+	"""
+	def __init__(self, bank:dict):
+		self.sentences = bank['sentences']
+		self.items = bank['items']
+		self.alias = {key:alias_table([weight for _, _, weight in items]) for key, items in self.items.items()}
+
+	@classmethod
+	def load(cls, path:str):
+		with open(path, 'r', encoding='utf8') as f:
+			return cls(json.load(f))
+
+	def sample(self, level:str, joshi_type:str) -> tuple:
+		"""
+		(sentence id, token index) by the weights, one draw from the alias table
+		"""
+		key = f'{level}|{joshi_type}'
+		prob, alias = self.alias[key]
+		i = random.randrange(len(prob))
+		if random.random() >= prob[i]:
+			i = alias[i]
+		sentence_id, index, _ = self.items[key][i]
+		return sentence_id, index
+
+	def question(self, level='1', joshi_type='格助詞') -> tuple:
+		"""
+		(masked sentence, answer, 4 other choices)
+		"""
+		sentence_id, index = self.sample(level, joshi_type)
+		surfaces = list(self.sentences[sentence_id])
+		answer = surfaces[index] # answer joshi
+		surfaces[index] = '___' # mask answer
+		### make other choices
+		if joshi_type == '格助詞':
+			others = [x for x in KAKUJOSHI if x != answer]
+		elif joshi_type == '副助詞':
+			others = [x for x in FUKUJOSHI if x != answer]
+		elif joshi_type == 'all':
+			others = [x for x in KAKUJOSHI+FUKUJOSHI if x != answer]
+		### remove ambiguous choice
+		if answer in ['は', 'も'] and 'が' in others:
+			others.remove('が')
+		elif answer in ['が', 'も'] and 'は' in others:
+			others.remove('は')
+		random.shuffle(others)
+		return ''.join(surfaces), answer, others[:4] # '私__行きます', 'が', ['を','に','て','から']
+
+
+JOSHI_BANK_PATH = os.environ.get('JOSHI_BANK_PATH', 'data/joshi_bank.json')
+
+def load_bank(build=False):
+	"""
+	bank from JOSHI_BANK_PATH. if the file does not exist : built from the sentence CSVs when build=True
+	(only by warm_up at startup, MeCab over every sentence), otherwise None
+	"""
+	if os.path.exists(JOSHI_BANK_PATH):
+		return JoshiBank.load(JOSHI_BANK_PATH)
+	return JoshiBank(build_bank()) if build else None
+
+# JOSHI_BANK.get() -> JoshiBank, or None if the quiz is not available
+JOSHI_BANK = lazy('joshi_bank', load_bank, builder=lambda: load_bank(build=True))
+
+
+if __name__ == '__main__':
+	if len(sys.argv) < 3 or sys.argv[1] != 'build':
+		print(__doc__)
+		sys.exit(1)
+	bank = build_bank()
+	with open(sys.argv[2], 'w', encoding='utf8') as f:
+		json.dump(bank, f, ensure_ascii=False, separators=(',', ':'))
+	print(len(bank['sentences']), 'sentences', {key:len(items) for key, items in bank['items'].items()})
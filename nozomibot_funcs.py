@@ -1,10 +1,18 @@
-import re, requests, json, os, random, csv, time, urllib.parse, mysql.connector
+import re, requests, json, os, random, csv, time, urllib.parse, mysql.connector, sqlite3, queue, threading, atexit
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
 pd.set_option('mode.chained_assignment', None) # make warning invisible
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta, timezone
 from JpProcessing import *
+from textindex import TextIndex, rank_ids, unique_ids, merge_tiers
+from dictindex import load_dictionary
+from example_index import ExampleIndex, collect_examples
+from wiki import WIKI_CACHE, fetch_page
+from datastore import load_frame, load_columns, load_mapping, lazy, warm_up, datasets_info
+from joshi_bank import JOSHI_BANK
+from deinflection import deinflect
+from postback import PostbackCodec, PostbackError, QuizState, parse_legacy, TYPES, PREFIX as POSTBACK_PREFIX
 
 
 ##### ENVIRONMENT VARIABLES #####
@@ -19,20 +27,309 @@ CHANNEL_SECRET = os.environ["CHANNEL_SECRET"]
 FB_ACCESS_TOKEN = os.environ["FB_ACCESS_TOKEN"]
 FB_VERIFY_TOKEN = os.environ["FB_VERIFY_TOKEN"]
 
-SQL_HOSTNAME = os.environ["SQL_HOSTNAME"]
-SQL_USERNAME = os.environ["SQL_USERNAME"]
-SQL_PASSWORD = os.environ["SQL_PASSWORD"]
+SQL_HOSTNAME = os.environ.get("SQL_HOSTNAME", "")
+SQL_USERNAME = os.environ.get("SQL_USERNAME", "")
+SQL_PASSWORD = os.environ.get("SQL_PASSWORD", "")
+SQL_BACKEND = os.environ.get("SQL_BACKEND", "mysql") # "sqlite" : local stand-in for tests
+SQL_SQLITE_PATH = os.environ.get("SQL_SQLITE_PATH", "data/{database}.sqlite3")
+SQL_POOL_SIZE = int(os.environ.get("SQL_POOL_SIZE", "5"))
+SQL_POOL_TIMEOUT = float(os.environ.get("SQL_POOL_TIMEOUT", "10")) # seconds to wait for a free connection
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", "50")) # rows per INSERT
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", "2")) # seconds
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000")) # rows waiting in memory, more are dropped
+
+WEBHOOK_ASYNC = os.environ.get("WEBHOOK_ASYNC", "0") == "1" # reply 200 at once and process events on workers
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "100")) # events waiting per worker
 
 
 ##### CONNECT SQL FUNCTION #####
+class SQLiteCursor:
+	"""
+	cursor of sqlite3 which accepts the "%s" placeholders of mysql.connector
+	"""
+	def __init__(self, cursor):
+		self.cursor = cursor
+
+	def execute(self, sql:str, params=()):
+		return self.cursor.execute(sql.replace('%s', '?'), params)
+
+	def executemany(self, sql:str, seq_params):
+		return self.cursor.executemany(sql.replace('%s', '?'), seq_params)
+
+	def __iter__(self):
+		return iter(self.cursor)
+
+	def __getattr__(self, name):
+		return getattr(self.cursor, name)
+
+def connect_mysql(database_name:str):
+	return mysql.connector.connect(user=SQL_USERNAME, password=SQL_PASSWORD, host=SQL_HOSTNAME, database=database_name)
+
+def connect_sqlite(database_name:str):
+	return sqlite3.connect(SQL_SQLITE_PATH.format(database=database_name), check_same_thread=False)
+
+def is_alive(con) -> bool:
+	"""
+	health check of an idle connection before it is handed out again
+	"""
+	try:
+		if isinstance(con, sqlite3.Connection):
+			con.execute('SELECT 1')
+		else:
+			con.ping(reconnect=True, attempts=1, delay=0)
+		return True
+	except Exception:
+		return False
+
+
+class SQLPool:
+	"""
+	fixed-size pool of connections to one database, connections are opened lazily and reused
+
+	>>> pool = SQLPool(lambda: connect_mysql('nozomibot'), size=5)
+	>>> with pool.connection() as (con, cursor):
+	... 	cursor.execute("INSERT INTO feedback (date, feedback, name) VALUES (%s, %s, %s);", (date, text, name))
+	... 	con.commit()
+	"""
+	def __init__(self, connect, size=5, timeout=10.0):
+		self.connect = connect
+		self.size = size
+		self.timeout = timeout
+		self.idle = queue.LifoQueue() # most recently used connection first
+		self.slots = threading.BoundedSemaphore(size)
+		self.lock = threading.Lock()
+		self.stats = {'created':0, 'reused':0, 'discarded':0, 'timeouts':0}
+
+	def acquire(self):
+		if not self.slots.acquire(timeout=self.timeout):
+			with self.lock:
+				self.stats['timeouts'] += 1
+			raise TimeoutError(f'no free SQL connection in {self.timeout} seconds')
+		try:
+			while True:
+				try:
+					con = self.idle.get_nowait()
+				except queue.Empty:
+					break
+				if is_alive(con):
+					with self.lock:
+						self.stats['reused'] += 1
+					return con
+				self.discard(con)
+			con = self.connect()
+			with self.lock:
+				self.stats['created'] += 1
+			return con
+		except:
+			self.slots.release()
+			raise
+
+	def release(self, con, broken=False):
+		"""
+		the transaction is always ended before the connection goes back to idle,
+		otherwise the next borrower of a MySQL connection reads the snapshot of the previous one (REPEATABLE READ)
+		"""
+		if not broken:
+			try:
+				con.rollback() # uncommitted changes are not kept, as when the connection was closed
+			except Exception:
+				broken = True
+		if broken:
+			self.discard(con)
+		else:
+			self.idle.put(con)
+		self.slots.release()
+
+	def discard(self, con):
+		with self.lock:
+			self.stats['discarded'] += 1
+		try:
+			con.close()
+		except Exception:
+			pass
+
+	@contextmanager
+	def connection(self):
+		"""
+		yield (connection, cursor), the connection goes back to the pool after the block
+		if the block raises, the transaction is rolled back and the connection is discarded
+		"""
+		con = self.acquire()
+		try:
+			cursor = con.cursor()
+			if isinstance(con, sqlite3.Connection):
+				cursor = SQLiteCursor(cursor)
+			yield con, cursor
+			cursor.close()
+		except:
+			try:
+				con.rollback()
+			except Exception:
+				pass
+			self.release(con, broken=True)
+			raise
+		else:
+			self.release(con)
+
+	def close(self):
+		while True:
+			try:
+				self.idle.get_nowait().close()
+			except queue.Empty:
+				break
+			except Exception:
+				pass
+
+	def info(self) -> dict:
+		with self.lock:
+			return dict(self.stats, size=self.size, idle=self.idle.qsize())
+
+
+SQL_POOLS = {} # database name -> SQLPool
+SQL_POOLS_LOCK = threading.Lock()
+
+def get_pool(database_name:str) -> SQLPool:
+	with SQL_POOLS_LOCK:
+		if database_name not in SQL_POOLS:
+			connect = connect_sqlite if SQL_BACKEND == 'sqlite' else connect_mysql
+			SQL_POOLS[database_name] = SQLPool(lambda: connect(database_name), size=SQL_POOL_SIZE, timeout=SQL_POOL_TIMEOUT)
+		return SQL_POOLS[database_name]
+
 def connect_sql(database_name:str):
-	config = {'user': SQL_USERNAME,
-		'password': SQL_PASSWORD,
-		'host': SQL_HOSTNAME,
-		'database': database_name}
-	con = mysql.connector.connect(**config)
-	cursor = con.cursor()
-	return con, cursor 
+	"""
+	pooled connection as context manager
+	
+	>>> with connect_sql('nozomibot') as (con, cursor):
+	... 	cursor.execute("SELECT ...")
+	"""
+	return get_pool(database_name).connection()
+
+
+##### ASYNCHRONOUS SQL LOG #####
+LOG_COLUMNS = {
+	'log_web': ('date', 'mode', 'text'),
+	'log_line': ('date', 'mode', 'text', 'username', 'userid'),
+	'log_fb': ('date', 'mode', 'text', 'userid'),
+}
+
+class SQLLogger:
+	"""
+	log rows are put into a bounded queue and written by one worker thread,
+	with one multi-row INSERT per table when `batch_size` rows are waiting or every `interval` seconds
+	so that a reply never waits for the database
+
+	>>> SQL_LOGGER.log('log_web', get_time_now(), 'dict', '食べる')
+	"""
+	def __init__(self, database_name:str, batch_size=50, interval=2.0, maxsize=10000):
+		self.database_name = database_name
+		self.batch_size = batch_size
+		self.interval = interval
+		self.queue = queue.Queue(maxsize=maxsize)
+		self.lock = threading.Lock()
+		self.worker = None
+		self.stats = {'logged':0, 'written':0, 'dropped':0, 'failed':0}
+
+	def start(self):
+		with self.lock:
+			if self.worker is None or not self.worker.is_alive():
+				self.worker = threading.Thread(target=self.run, name='sql-logger', daemon=True)
+				self.worker.start()
+
+	def log(self, table:str, *row):
+		"""
+		never blocks : if the queue is full the row is dropped and counted
+		"""
+		if self.worker is None:
+			self.start()
+		try:
+			self.queue.put_nowait((table, row))
+			key = 'logged'
+		except queue.Full:
+			key = 'dropped'
+		with self.lock:
+			self.stats[key] += 1
+
+	def run(self):
+		batch, deadline = [], time.monotonic() + self.interval
+		while True:
+			try:
+				item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+			except queue.Empty:
+				item = ()
+			if item is None: # stop
+				self.write(batch)
+				return
+			if item != ():
+				batch.append(item)
+			if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+				self.write(batch)
+				batch, deadline = [], time.monotonic() + self.interval
+
+	def write(self, batch:list):
+		if batch == []:
+			return
+		tables = {}
+		for table, row in batch:
+			tables.setdefault(table, []).append(row)
+		for table, rows in tables.items():
+			columns = LOG_COLUMNS[table]
+			try:
+				with connect_sql(self.database_name) as (con, cursor):
+					cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s']*len(columns))});", rows)
+					con.commit()
+				key = 'written'
+			except Exception:
+				key = 'failed'
+			with self.lock:
+				self.stats[key] += len(rows)
+
+	def stop(self, timeout=5.0):
+		"""
+		write what is left in the queue, called at exit
+		"""
+		if self.worker is None or not self.worker.is_alive():
+			return
+		try:
+			self.queue.put(None, timeout=timeout)
+		except queue.Full:
+			pass
+		self.worker.join(timeout)
+
+	def info(self) -> dict:
+		with self.lock:
+			return dict(self.stats, waiting=self.queue.qsize())
+
+SQL_LOGGER = SQLLogger('nozomibot', batch_size=LOG_BATCH_SIZE, interval=LOG_FLUSH_INTERVAL, maxsize=LOG_QUEUE_SIZE)
+atexit.register(SQL_LOGGER.stop)
+
+
+class TTLCache:
+	"""
+	small dict with expiry, for results of outbound API calls (e.g. LINE profile)
+	"""
+	def __init__(self, ttl=3600.0, maxsize=10000):
+		self.ttl = ttl
+		self.maxsize = maxsize
+		self.data = {} # key -> (expire time, value)
+		self.lock = threading.Lock()
+
+	def get(self, key, default=None):
+		with self.lock:
+			item = self.data.get(key)
+			if item is None:
+				return default
+			if item[0] < time.monotonic():
+				del self.data[key]
+				return default
+			return item[1]
+
+	def put(self, key, value):
+		with self.lock:
+			if key not in self.data and len(self.data) >= self.maxsize:
+				del self.data[next(iter(self.data))] # oldest inserted
+			self.data.pop(key, None)
+			self.data[key] = (time.monotonic() + self.ttl, value)
 
 
 ##### FUNCTION TO FILL SPACES FOR LINE OUTPUT #####
@@ -191,7 +488,7 @@ def get_reply(text:str):
 
 	elif MODE == '3.CONJ':
 		text = text.split(' ', 1)[1]
-		r = conjugate(text)
+		r = conjugate_word(text)
 		if r == None:
 			reply = 'ผันไม่ได้ครับ ต้องเป็นกริยาหรือ i-adj เท่านั้น'
 		elif len(r) == 10: # verb with
@@ -349,39 +646,32 @@ def get_reply(text:str):
 	return MODE, reply
 
 
-def get_postback(postback:dict): # {action:joshi, type:格助詞, num:5, Q:0, score:0} -> return (text, labels:list, datas:list)
-	if postback['action'] == 'joshi':
-		joshi_type = postback.get('type', '格助詞') 
-		max_num = int(postback.get('num', 10))
-		q_num = int(postback.get('Q', 0))
-		score = int(postback.get('score', 0))
-		kanji_level = postback.get('level', None) # '1', '2', '3'
-		answer_before = postback.get('answer', None)
-		if kanji_level == None: # before start Q1
-			datas = [
-				f'action=joshi&type={joshi_type}&num={max_num}&Q=0&score=0&level=1',
-				f'action=joshi&type={joshi_type}&num={max_num}&Q=0&score=0&level=2',
-				f'action=joshi&type={joshi_type}&num={max_num}&Q=0&score=0&level=3',
-				f'action=joshi&type={joshi_type}&num={max_num}&Q=0&score=0&level=4'
-			]
+POSTBACK_CODEC = PostbackCodec(CHANNEL_SECRET)
+
+def get_postback(state:QuizState): # QuizState(kind='joshi', type='格助詞', num=5, q=0, score=0) -> return (text, labels:list, datas:list)
+	if state.kind == 'joshi':
+		if state.level == None: # before start Q1
+			datas = [POSTBACK_CODEC.encode(state._replace(q=0, score=0, level=level, answer=None)) for level in [1, 2, 3, 4]]
 			return 'เลือก Kanji Level', ['ง่าย','กลาง','ยาก','ยากมาก'], datas
-		elif answer_before == None: # Q1
-			text, answer, others = joshi_quiz(kanji_level, joshi_type) # '秋田県__人が総理大臣になるのは初めてです。', 'の', ['を', 'より', 'で', 'と']
+		if state.q >= state.num: # result
+			if state.score == state.num:
+				return f'Q{state.q} เฉลย: {state.answer}\n\nคะแนนของคุณ: {state.score}/{state.num}\nおめでとうございます！', None, None
+			else:
+				return f'Q{state.q} เฉลย: {state.answer}\n\nคะแนนของคุณ: {state.score}/{state.num}\nまたがんばって下さい！', None, None
+		question = joshi_quiz(str(state.level), state.type) # '秋田県__人が総理大臣になるのは初めてです。', 'の', ['を', 'より', 'で', 'と']
+		if question == None: # item bank is not built (joshi_bank.py)
+			return 'ขอโทษครับ ตอนนี้ยังใช้ควิซไม่ได้', None, None
+		text, answer, others = question
+		if state.answer == None: # Q1
 			text = 'Q1: ' + text
 		else:
-			text, answer, others = joshi_quiz(kanji_level, joshi_type)
-			text = f'Q{q_num} เฉลย: {answer_before}\n\nQ{q_num+1}: ' + text
+			text = f'Q{state.q} เฉลย: {state.answer}\n\nQ{state.q+1}: ' + text
 		insert_i = random.randint(0,4)
 		others.insert(insert_i, answer) # ['を', 'より', 'で', 'と'] -> ['を', 'より', 'で', 'の', 'と']
-		datas = [f'action=joshi&type={joshi_type}&num={max_num}&Q={q_num+1}&score={score}&answer={answer}&level={kanji_level}'] * 5
-		datas[insert_i] = f'action=joshi&type={joshi_type}&num={max_num}&Q={q_num+1}&score={score+1}&answer={answer}&level={kanji_level}' # correct answer
-		if q_num < max_num:
-			return text, others, datas
-		else: # result
-			if score == max_num:
-				return f'Q{q_num} เฉลย: {answer_before}\n\nคะแนนของคุณ: {score}/{max_num}\nおめでとうございます！', None, None
-			else:
-				return f'Q{q_num} เฉลย: {answer_before}\n\nคะแนนของคุณ: {score}/{max_num}\nまたがんばって下さい！', None, None
+		wrong = POSTBACK_CODEC.encode(state._replace(q=state.q+1, answer=answer))
+		correct = POSTBACK_CODEC.encode(state._replace(q=state.q+1, score=state.score+1, answer=answer))
+		datas = [correct if i == insert_i else wrong for i in range(5)]
+		return text, others, datas
 
 
 
@@ -391,145 +681,182 @@ def get_postback(postback:dict): # {action:joshi, type:格助詞, num:5, Q:0, sc
 
 ########## GET RANKING & FREQ ##########
 
-# ['lemma','rank','lForm','pos','core_pmw']
-BCCWJ_RANK = pd.read_csv('data/bccwj_rank.csv') 
-def get_rank(word):
-	yomi = hira2kata(yomikata(word))
-	df = BCCWJ_RANK[(BCCWJ_RANK.lemma.str.contains(word)) | (BCCWJ_RANK.lForm == yomi)]
-	if len(df) >= 2:
-		result = df.iloc[0:3].values.tolist()
+# SEARCH INDEX OF ['lemma','rank','lForm','pos','core_pmw'], rows are in order of rank and stringified with PoS in Thai
+# memory-mapped if built by `python dictindex.py build`, opened at the first search (or DATA_WARMUP=bccwj_rank_index)
+RANK_DICT = lazy('bccwj_rank_index', lambda: load_dictionary('bccwj_rank'))
+RANK_COLUMNS = ['lemma','rank','lForm','pos','core_pmw']
+
+def get_rank(word, analysis=None, substring=False):
+	"""
+	rows whose lemma is the word or whose lForm is the reading of the word, top 3 in order of rank
+	substring=True : lemma contains the word (literal, not regex)
+	"""
+	analysis = analysis or Analysis(word)
+	yomi = hira2kata(analysis.yomi_katakana)
+	rank_dict = RANK_DICT.get()
+	lemma_ids = rank_dict.index['lemma'].like(word) if substring else rank_dict.index['lemma'].exact(word)
+	ids = sorted(set(lemma_ids).union(rank_dict.index['lForm'].exact(yomi)))
+	if len(ids) == 0:
+		return None
+	rows = rank_dict.rows(RANK_COLUMNS)
+	result = [rows[i] for i in ids[:3]]
+	if len(result) >= 2:
 		# if lForm and pos are completely identical, drop
-		if len(result) ==3 and result[2][2:4] == result[0][2:4]:
+		if len(result) == 3 and result[2][2:4] == result[0][2:4]:
 			result = result[:2]
 		if result[1][2:4] == result[0][2:4]:
 			result = [result[0]]
-	elif len(df) == 1:
-		result = [df.iloc[0].tolist()]
-	else:
-		return None
-	# PoS Thai
-	pos_mapping = {'動詞':'กริยา','名詞':'คำนาม','形容詞':'i-adj','助詞':'คำช่วย','助動詞':'คำช่วยที่ผันรูป','副詞':'adv','接頭辞':'prefix','接尾辞':'suffix',
-		'連体詞':'คำขยายคำนาม','記号':'เครื่องหมาย','感動詞':'คำอุทาน','フィラー':'filler','接続詞':'คำเชื่อม','その他':'others'}
-	for r in result:
-		if r[3] in pos_mapping:
-			r[3] += f' {pos_mapping[r[3]]}'
-	return [list(map(str, row)) for row in result] # stringify
+	return [list(row) for row in result]
+
+
+##########  EXAMPLE SENTENCE INDEX  ##########
+# prebuilt by `python example_index.py build data/example_index.db`, if not exists, search MySQL by LIKE
+EXAMPLE_INDEX = ExampleIndex.open('data/example_index.db')
+
+def escape_like(query:str) -> str:
+	# escape wildcards of LIKE by '!', used with ESCAPE '!' (same in MySQL and SQLite, which has no default escape)
+	return query.replace('!', '!!').replace('%', '!%').replace('_', '!_')
 
 
 ##########  EXAMPLE OF TWITTER  ##########
 def get_tweet(query, limit=100, max_chr=35, highlighted=True):
-	con, cursor = connect_sql('nozomibot')
+	if EXAMPLE_INDEX != None:
+		candidates = EXAMPLE_INDEX.search('tweet', query, limit, max_chr=max_chr)
+		if candidates == None:
+			return None
+		return [highlight(cand, query) for cand in candidates] if highlighted else candidates
 	### get tweet at random 
-	cursor.execute(f"SELECT tweet, username FROM tweetjp WHERE tweet LIKE '%{query}%' LIMIT 300;")
-	result = list(cursor) # [[tweet, username],,]
+	with connect_sql('nozomibot') as (con, cursor):
+		cursor.execute("SELECT tweet, username FROM tweetjp WHERE tweet LIKE %s ESCAPE '!' LIMIT 300;", (f'%{escape_like(query)}%',))
+		result = list(cursor) # [[tweet, username],,]
 	if len(result) == 0:
 		return None
-	#sentence_pattern = re.compile(r"""(?<=^)|(?<=[、。\s!\?！？…]) # the initial separator
-	#			(?:[^、。\s!\?！？…]+?[、。\s!\?！？…]+){0,1} # sentence before query
-	#			[^、。\s!\?！？…]*?""" + query + r"""[^、。\s!\?！？…]*?(?:[、。\s!\?！？…]+?|$)
-	#			(?:[^、。\s!\?！？…]+?[、。\s!\?！？…]+){0,1} # sentence after query
-	#			(?:[、。\s!\?！？…]+|$)""", re.X)
-	sentence_pattern = re.compile(r'(?:^|[。\s!\?！？])([^。\s!\?！？]*?{}[^。\s!\?！？]*?(?:[。\s!\?！？]+|$))'.format(query))
-	candidates = set()
-	for tweet, _ in result:
-		if len(tweet) < max_chr:
-			candidates.add(tweet) # if the tweet is shorter max_chr, add whole text
-		else:
-			candidates |= set(re.findall(sentence_pattern, tweet)) # one tweet may contain multiple matched sentences
-	candidates = set([x.strip() for x in candidates if len(x.strip()) >= len(query)+2]) # exclude too short sentences
-	if len(candidates) > limit:
-		candidates = random.sample(list(candidates), limit)
+	random.shuffle(result) # take sentences from random tweets, stop when `limit` sentences are found
+	# if the tweet is shorter max_chr, add whole text, otherwise sentences that contain the query
+	candidates = collect_examples([tweet for tweet, _ in result], query, limit, max_chr=max_chr)
 	if highlighted:
 		candidates = [highlight(cand, query) for cand in candidates]
-	con.close()
 	return candidates
 
 
 ##########  EXAMPLE OF NHK NEWS WEB  ##########
 def get_nhk(query, limit=100, highlighted=True):
-	con, cursor = connect_sql('nozomibot')
-	### get tweet at random 
-	cursor.execute(f"SELECT id, article FROM nhkweb WHERE article LIKE '%{query}%' LIMIT 300;")
-	result = list(cursor) # [[id, article],,]
+	if EXAMPLE_INDEX != None:
+		candidates = EXAMPLE_INDEX.search('nhk', query, limit, min_chr=10)
+		if candidates == None:
+			return None
+		return [highlight(cand, query) for cand in candidates] if highlighted else candidates
+	### get articles at random 
+	with connect_sql('nozomibot') as (con, cursor):
+		cursor.execute("SELECT id, article FROM nhkweb WHERE article LIKE %s ESCAPE '!' LIMIT 300;", (f'%{escape_like(query)}%',))
+		result = list(cursor) # [[id, article],,]
 	if len(result) == 0:
 		return None
-	sentence_pattern = re.compile(r'(?:^|[。\s!\?！？])([^。\s!\?！？]*?{}[^。\s!\?！？]*?(?:[。\s!\?！？]+|$))'.format(query))
-	candidates = set()
-	for _, article in result:
-		candidates |= set(re.findall(sentence_pattern, article))
-	candidates = set([x.strip() for x in candidates if len(x.strip()) >= len(query)+2 and len(x)>10]) # exclude too short sentences
-	if len(candidates) > limit:
-		candidates = random.sample(list(candidates), limit)
+	random.shuffle(result) # take sentences from random articles, stop when `limit` sentences are found
+	candidates = collect_examples([article for _, article in result], query, limit, min_chr=10) # exclude too short sentences
 	if highlighted:
 		candidates = [highlight(cand, query) for cand in candidates]
-	con.close()
 	return candidates
 
 
 ##########  GET WORD FROM DICTIONARY  ##########
 
-# load dictionary [yomi,word,thai]
-WORD_DICT = pd.read_csv('data/jtdic.csv', encoding='utf8').fillna('-') # nan -> "-"
+# SEARCH INDEX OF THE DICTIONARY [yomi,word,thai] : exact / initial / like match without scanning the rows
+# memory-mapped if built by `python dictindex.py build`, opened at the first search (or DATA_WARMUP=jtdic_index)
+WORD_DICT = lazy('jtdic_index', lambda: load_dictionary('jtdic'))
 
-# FUNTION FOR SORT DATAFRAME BY LENGTH 
-def sort_df(df, columns:list):
-	df['length_word'] = df.word.apply(len)
-	df['length_yomi'] = df.yomi.apply(len)
-	return df.sort_values(columns)[['yomi','word','thai']]
+def sort_ids(ids, columns:list):
+	# SORT ROW IDS BY LENGTH OF COLUMNS, e.g. ['word','yomi'] -> by len(word), then len(yomi)
+	lengths = [WORD_DICT.get().index[column].lengths for column in columns]
+	return rank_ids(ids, lambda i: tuple(length[i] for length in lengths))
 
 def get_word_exact(word:str):
 	# SEARCH BY WORD, ONLY EXACT MATCH
-	return WORD_DICT[WORD_DICT.word == word].values.tolist()
-
-def get_word(word:str, format_for_linebot=True):
+	rows = WORD_DICT.get().rows(['yomi','word','thai'])
+	return [rows[i] for i in WORD_DICT.get().index['word'].exact(word)]
+
+def is_entry(word:str) -> bool:
+	# WHETHER THE WORD ITSELF IS A HEADWORD OR A READING (あれ, いえ 家, きた 北), THEN IT IS NOT TAKEN FOR AN INFLECTED FORM
+	index = WORD_DICT.get().index
+	if len(index['word'].exact(word)) > 0:
+		return True
+	return is_only_kana(word) and len(index['yomi'].exact(kata2hira(word)) + index['yomi'].exact(hira2kata(word))) > 0
+
+def inflected_lemmas(word:str) -> list:
+	# LEMMAS OF AN INFLECTED VERB / I-ADJ (食べなかった -> ['食べる'], いった -> ['いう','いく',...]) BY THE REVERSE CONJUGATION INDEX
+	# [] IF THE WORD IS A LEMMA OR AN ENTRY OF THE DICTIONARY
+	hits = deinflect(word)
+	if hits == [] or any([form == 'base' for _, form, _ in hits]) or is_entry(word):
+		return []
+	return list(dict.fromkeys([lemma for lemma, _, _ in hits]))
+
+def get_word(word:str, format_for_linebot=True, analysis=None):
+	analysis = analysis or Analysis(word) # reading of the word is computed only when needed
+	word_dict = WORD_DICT.get()
 	# SEARCH BY THAI WORD => 1.INITIAL MATCH, 2.LIKE MATCH
-	if re.search(r'[ก-๙]+', word):
-		df_initial = WORD_DICT[WORD_DICT.thai.str.startswith(word)] # 1.INITIAL MATCH
-		df_initial['length_thai'] = df_initial.thai.apply(len)
-		df_initial['length_yomi'] = df_initial.yomi.apply(len)
-		df_initial = df_initial.sort_values(['length_thai','length_yomi'])[['yomi','word','thai']]
-		df_like = WORD_DICT[WORD_DICT.thai.str.contains(word)] # 2.LIKE MATCH
-		df_like['length_thai'] = df_like.thai.apply(len)
-		df_like['length_yomi'] = df_like.yomi.apply(len)
-		df_like = df_like.sort_values(['length_thai','length_yomi'])[['yomi','word','thai']]
-		df = pd.concat([df_initial, df_like]).drop_duplicates()
+	if analysis.is_thai:
+		ids_initial = sort_ids(word_dict.index['thai'].initial(word), ['thai','yomi']) # 1.INITIAL MATCH
+		ids_like = sort_ids(word_dict.index['thai'].like(word), ['thai','yomi']) # 2.LIKE MATCH
+		tiers = [ids_initial, ids_like]
 	# SEARCH BY JAPANESE WORD
 	else:
+		lemmas = inflected_lemmas(word)
+		# INFLECTED FORM (NOT AN ENTRY ITSELF) => 1.LEMMA EXACT, 2.KANJI LIKE; NO TOKENIZATION
+		if lemmas != []:
+			ids_lemma = [i for lemma in lemmas for i in word_dict.index['word'].exact(lemma) + word_dict.index['yomi'].exact(lemma)] # most frequent lemma first
+			ids_like = sort_ids(word_dict.index['word'].like(word), ['word','yomi'])
+			tiers = [ids_lemma, ids_like]
 		# IF CONTAINS KANJI => 1.KANJI INITIAL, 2.KANA EXACT, 3.KANJI LIKE; PRIORITY TO 'word'
-		if not is_only_kana(word):
-			yomi_katakana = yomikata(word)
-			yomi_hiragana = kata2hira(yomi_katakana)
-			df_initial = WORD_DICT[WORD_DICT.word.str.startswith(word)] # 1. KANJI INITIAL MATCH
-			df_initial = sort_df(df_initial, ['length_word','length_yomi'])
-			df_yomi = WORD_DICT[WORD_DICT.yomi == yomi_hiragana] # 2. KANA EXACT MATCH
-			df_yomi = sort_df(df_yomi, ['length_word','length_yomi'])
-			df_like = WORD_DICT[WORD_DICT.word.str.contains(word)] # 3. KANJI LIKE MATCH
-			df_like = sort_df(df_like, ['length_word','length_yomi'])
-			df = pd.concat([df_initial, df_yomi, df_like]).drop_duplicates()
+		elif not analysis.is_only_kana:
+			yomi_katakana = analysis.yomi_katakana
+			yomi_hiragana = analysis.yomi_hiragana
+			ids_initial = sort_ids(word_dict.index['word'].initial(word), ['word','yomi']) # 1. KANJI INITIAL MATCH
+			ids_yomi = sort_ids(word_dict.index['yomi'].exact(yomi_hiragana), ['word','yomi']) # 2. KANA EXACT MATCH
+			ids_like = sort_ids(word_dict.index['word'].like(word), ['word','yomi']) # 3. KANJI LIKE MATCH
+			tiers = [ids_initial, ids_yomi, ids_like]
 		# ONLY KANA => 1.EXACT, 2.INITIAL, 3.LIKE; PRIORITY TO 'yomi'
 		else:
 			yomi_katakana = hira2kata(word)
 			yomi_hiragana = kata2hira(word)
-			df_exact = WORD_DICT[WORD_DICT.word == word]
-			df_initial = WORD_DICT[(WORD_DICT.word.str.startswith(word)) | (WORD_DICT.yomi.str.startswith(yomi_katakana)) | (WORD_DICT.yomi.str.startswith(yomi_hiragana))] 
-			df_initial = sort_df(df_initial, ['length_yomi','length_word'])
-			df_like = WORD_DICT[(WORD_DICT.word.str.contains(word)) | (WORD_DICT.yomi.str.contains(yomi_katakana)) | (WORD_DICT.yomi.str.contains(yomi_hiragana))]
-			df_like = sort_df(df_like, ['length_yomi','length_word'])
-			df = pd.concat([df_exact, df_initial, df_like]).drop_duplicates()
-
-	if len(df) == 0:
+			ids_exact = word_dict.index['word'].exact(word)
+			ids_initial = word_dict.index['word'].initial(word) + word_dict.index['yomi'].initial(yomi_katakana) + word_dict.index['yomi'].initial(yomi_hiragana)
+			ids_initial = sort_ids(ids_initial, ['yomi','word'])
+			ids_like = word_dict.index['word'].like(word) + word_dict.index['yomi'].like(yomi_katakana) + word_dict.index['yomi'].like(yomi_hiragana)
+			ids_like = sort_ids(ids_like, ['yomi','word'])
+			tiers = [ids_exact, ids_initial, ids_like]
+
+	result = merge_tiers(tiers, word_dict.rows(['yomi','word','thai']), limit=15) # [[yomi,word,thai],...]
+	if len(result) == 0:
 		return None
 	elif format_for_linebot:
-		return '\n'.join([' '.join(x) for x in df[['word','yomi','thai']].values.tolist()[:15]])
+		return '\n'.join([' '.join([w, y, t]) for y, w, t in result])
 	else:
-		return df.values.tolist()[:15]
+		return result
+
+
+##########  CONJUGATION  ##########
+
+def conjugate_word(word:str, analysis=None):
+	"""
+	same as conjugate(), but an inflected form (行けば, たべなかった) is found by the reverse conjugation index
+	without MeCab; only words in neither verbs.csv nor the index (e.g. 勉強する) are tokenized
+	an entry of the dictionary (あれ, いえ, きた) is left to MeCab, which decides whether it is a verb
+	"""
+	word = word.strip()
+	paradigm = get_paradigm(word)
+	if paradigm != None:
+		return paradigm
+	hits = deinflect(word)
+	if hits != [] and not is_entry(word):
+		lemma, _, conjtype = hits[0] # most frequent lemma
+		return conjugate_lemma(lemma, conjtype)
+	return conjugate(word, analysis=analysis)
 
 
 ##########  KANJI DICT ##########
 
 # load dictionary
-with open('data/kanji.json','r', encoding='utf8') as f:
-	KANJI_DICT = json.load(f)
+KANJI_DICT = load_mapping('kanji') # values are decoded only when looked up
 
 def get_kanji(kanji:str, format_for_linebot=True):
 	"""
@@ -551,19 +878,30 @@ def get_kanji(kanji:str, format_for_linebot=True):
 			return None
 		return [kanji, dic['on'], dic['kun'], '<br>'.join(dic['imi'])]
 
+def get_kanjis(word:str, analysis=None):
+	"""
+	get all kanjis in the word for web [[kanji, on, kun, imi],...]
+	every character which is a key of KANJI_DICT (once), None if there is none
+	"""
+	analysis = analysis or Analysis(word)
+	kanjis = [get_kanji(char, format_for_linebot=False) for char in dict.fromkeys(analysis.raw) if char in KANJI_DICT]
+	kanjis = [kanji for kanji in kanjis if kanji != None]
+	return kanjis if kanjis != [] else None
+
 
 ########## ACCENT ##########
 
-# LOAD CSV
-ACCENT_TABLE = pd.read_csv('data/accent.csv', encoding='utf8').fillna('-') # nan -> "-"
+# SEARCH INDEX & RENDERING OF ['word','accent','yomi','english'] : no per-row string work at request time
+# columns 'html' (FOR WEB API) and 'line' (FOR LINEBOT) are rendered when the index is built
+# memory-mapped if built by `python dictindex.py build`, opened at the first search (or DATA_WARMUP=accent_index)
+ACCENT_DICT = lazy('accent_index', lambda: load_dictionary('accent'))
 
-# FUNTION FOR SORT DATAFRAME BY LENGTH 
-def sort_df_accent(df, columns:list):
-		df['length_word'] = df.word.apply(len)
-		df['length_yomi'] = df.yomi.apply(len)
-		return df.sort_values(columns)[['word','accent','english']]
+def sort_ids_accent(ids, columns:list):
+	# SORT ROW IDS BY LENGTH OF COLUMNS, e.g. ['word','yomi'] -> by len(word), then len(yomi)
+	lengths = [ACCENT_DICT.get().index[column].lengths for column in columns]
+	return rank_ids(ids, lambda i: tuple(length[i] for length in lengths))
 
-def get_accent(word:str, format_for_linebot=True):
+def get_accent(word:str, format_for_linebot=True, analysis=None):
 	"""
 	get accent from table 
 	header = [accent, word, yomi, english]
@@ -573,73 +911,187 @@ def get_accent(word:str, format_for_linebot=True):
 	"""
 	if len(word) == 0:
 		return None if format_for_linebot else []
+	analysis = analysis or Analysis(word)
+	accent_dict = ACCENT_DICT.get()
+	rows = accent_dict.rows(['word','accent','english'])
 	# SEARCH BY THAI WORD
-	if re.search(r'[ก-๙]+', word):
-		df_initial = ACCENT_TABLE[ACCENT_TABLE.english.str.startswith(word)]
-		df_initial['english_length'] = df_initial.english.apply(len)
-		df = df_initial.sort_values('english_length')[['word','accent','english']]
+	if analysis.is_thai:
+		tiers = [sort_ids_accent(accent_dict.index['english'].initial(word), ['english'])]
 	# CONTAINS KANJI => 1.EXACT, 2.INITIAL, 3.EXACT OF KANA, 4.LIKE 
-	elif not is_only_kana(word): 
-		yomi_hiragana = yomikata(word, katakana=False)
+	elif not analysis.is_only_kana: 
+		yomi_hiragana = analysis.yomi_hiragana
 		# 1 2.EXACT & INITIAL MATCH OF THE WORD
-		df_initial = ACCENT_TABLE[ACCENT_TABLE.word.str.startswith(word)] 
-		df_initial = sort_df_accent(df_initial, ['length_word','length_yomi'])
+		ids_initial = sort_ids_accent(accent_dict.index['word'].initial(word), ['word','yomi'])
 		# 3.EXACT MATCH OF THE KANA (NO SORT)
-		df_yomi = ACCENT_TABLE[ACCENT_TABLE.yomi == yomi_hiragana][['word','accent','english']] 
+		ids_yomi = accent_dict.index['yomi'].exact(yomi_hiragana)
 		# 4.LIKE MATCH OF THE WORD
-		df_like = ACCENT_TABLE[ACCENT_TABLE.word.str.contains(word)] 
-		df_like = sort_df_accent(df_like, ['length_word','length_yomi'])
-		df = pd.concat([df_initial, df_yomi, df_like]).drop_duplicates()
+		ids_like = sort_ids_accent(accent_dict.index['word'].like(word), ['word','yomi'])
+		tiers = [ids_initial, ids_yomi, ids_like]
 	# ONLY KANA => 1.EXACT, 2.INITIAL, 3.LIKE
 	else:
 		yomi_hiragana = kata2hira(word)
-		# 1.EXACT MATCH OF THE WORD
-		df_exact = ACCENT_TABLE[(ACCENT_TABLE.word == word) | (ACCENT_TABLE.yomi.str == word)][['word','accent','english']] 
+		# 1.EXACT MATCH OF THE WORD OR THE KANA
+		ids_exact = sorted(set(accent_dict.index['word'].exact(word) + accent_dict.index['yomi'].exact(yomi_hiragana)))
 		# 2.INITIAL MATCH OF (THE WORD OR THE KANA)
-		df_initial = ACCENT_TABLE[(ACCENT_TABLE.word.str.startswith(word)) | (ACCENT_TABLE.yomi.str.startswith(yomi_hiragana))]
-		df_initial = sort_df_accent(df_initial, ['length_yomi','length_word'])
+		ids_initial = accent_dict.index['word'].initial(word) + accent_dict.index['yomi'].initial(yomi_hiragana)
+		ids_initial = sort_ids_accent(ids_initial, ['yomi','word'])
 		# 3.LIKE MATCH OF (THE WORD OR THE KANA)
-		df_like = ACCENT_TABLE[(ACCENT_TABLE.word.str.contains(word)) | (ACCENT_TABLE.english.str.contains(yomi_hiragana))]
-		df_like = sort_df_accent(df_like, ['length_yomi','length_word'])
-		df = pd.concat([df_exact, df_initial, df_like]).drop_duplicates()
-	if len(df) == 0:
-		return None
-	elif format_for_linebot:
-		text = ''
-		for _, row in df.head(5).iterrows(): # ONLY 5 ENTRIES
-			word = 'word: '
-			for column in row[['word','english']]:
-				if column != '-':
-					word += column + ' '
-			text += word.strip() + '\n' + 'accent: ' + row['accent'] + '\n\n'
-		return text.strip()
+		ids_like = accent_dict.index['word'].like(word) + accent_dict.index['yomi'].like(yomi_hiragana)
+		ids_like = sort_ids_accent(ids_like, ['yomi','word'])
+		tiers = [ids_exact, ids_initial, ids_like]
+	if format_for_linebot:
+		ids = unique_ids(tiers, rows, limit=5) # ONLY 5 ENTRIES
+		if len(ids) == 0:
+			return None
+		return '\n\n'.join([accent_dict.columns['line'][i] for i in ids]).strip()
 	else: # FOR WEB API
-		lists = df.values.tolist() # RETURN LIST OF ['word','accent','english']
-		lists = [[l[0]] + [accent_to_html(l[1])] + [l[2]] for l in lists] # CONVERT ACCENT TO HTML FORMAT
-		return lists[:10] # ONLY 10 ENTRIES
+		ids = unique_ids(tiers, rows, limit=10) # ONLY 10 ENTRIES
+		if len(ids) == 0:
+			return None
+		html_rows = accent_dict.rows(['word','html','english'])
+		return [html_rows[i] for i in ids] # RETURN LIST OF ['word','accent(html)','english']
 
-def accent_to_html(accent:str) -> str:
-	"""
-	convert accent text into html, class names are "accent_high" and "accent_low" 
-	'あ\\いは/んす\\る' => <span class="accent_high">あ</span><span class="accent_low">いは</span>...
+
+########## GET PARALLEL CORPUS ##########
+
+PARALLEL_PAGE_SIZE = 50 # articles per page of /nhk, /nhkthai
+
+def strip_ruby(text:str) -> str:
+	# <ruby>神様<rt>かみさま</rt></ruby> -> 神様
+	return re.sub(r'<[^>]+>', '', re.sub(r'<(rt|rp)>.*?</\1>', '', text))
+
+class ParallelCorpus:
 	"""
-	accent = re.sub(r'((?<=^)|(?<=\\))(\w+?)((?=/)|(?=$))', r'<span class="accent_low">\2</span>', accent)
-	accent = re.sub(r'((?<=^)|(?<=/))(\w+?)((?=\\)|(?=$))', r'<span class="accent_high">\2</span>', accent)
-	accent = re.sub(r'(?<!<)([/\\])', r'<span class="accent_bar">\1</span>', accent)
-	return accent
+	search engine of the NHK parallel corpus, built once at the first search
+	rows are sorted by date (newest first), so row ids in ascending order are already the result order
 
+	genre_ids : genre (e.g. "国際_社会") -> row ids
+	easy      : TextIndex over article_easy_ruby without ruby
+	normal    : TextIndex over article
+	"""
+	def __init__(self, df):
+		dates = df.datePublished.tolist()
+		order = sorted(range(len(df)), key=dates.__getitem__, reverse=True) # stable, ties keep the file order
+		df = df.iloc[order]
+		# [id, date "13/04/07", genre, title_easy_ruby, article_easy_ruby, title, article]
+		self.rows = [[r[0], r[1][2:10].replace('-', '/'), r[2].replace('_', '<br><br>')] + r[3:] # "2013-04-07T18:09" -> "13/04/07", if has more than one genre, replace "_" with <br>
+			for r in df[['id','datePublished', 'genre', 'title_easy_ruby','article_easy_ruby','title','article']].values.tolist()]
+		self.genre_ids = {}
+		for i, genre in enumerate(df.genre):
+			self.genre_ids.setdefault(genre, []).append(i)
+		self.easy = TextIndex([strip_ruby(text) for text in df.article_easy_ruby], prefix=False)
+		self.normal = TextIndex(df.article, prefix=False)
+
+	def __len__(self):
+		return len(self.rows)
+
+	def search_ids(self, genre:str, keyword:str) -> list:
+		"""
+		row ids (newest first) whose genre contains `genre` and whose easy or normal article contains `keyword`
+		matching differs from the former str.contains filter on article_easy_ruby / article :
+		the keyword is literal (not a regex), and the easy article is searched without ruby,
+		so a word split by <rt> readings matches, while text inside the ruby tags no longer does
+		"""
+		ids = set()
+		for name, genre_ids in self.genre_ids.items():
+			if genre in name:
+				ids.update(genre_ids)
+		if keyword != '':
+			ids &= set(self.easy.like(keyword)) | set(self.normal.like(keyword))
+		return sorted(ids)
+
+	def search(self, genre:str, keyword:str, offset=0, limit=PARALLEL_PAGE_SIZE) -> tuple:
+		"""
+		(rows of the page with highlighted keyword, number of all results)
+		"""
+		ids = self.search_ids(genre, keyword)
+		# highlight keyword in 'title_easy_ruby', 'article_easy_ruby', 'title', 'article'
+		page = [self.rows[i][:3] + [highlight(x, keyword) for x in self.rows[i][3:]] for i in ids[offset:offset+limit]]
+		return page, len(ids)
+
+NHK_PARALLEL = lazy('nhkparallel', lambda: ParallelCorpus(load_frame('nhkparallel')))
+def get_parallel(genre:str, keyword:str, offset=0, limit=PARALLEL_PAGE_SIZE):
+	return NHK_PARALLEL.get().search(genre, keyword, offset, limit) # ([[id, date, genre, title_easy_ruby, article_easy_ruby, title, article],...], nums)
+
+class NhkThaiCorpus:
+	"""
+	search engine of NHK WORLD Thai articles (/nhkthai), rows keep the file order
 
-########## GET PARALLEL CORPUS ##########
+	year_ids : "2020" -> row ids, partitioned by the first 4 characters of the date
+	headline, article : TextIndex
+	"""
+	def __init__(self, df):
+		self.rows = df[['date','headline','article']].values.tolist()
+		self.dates = [row[0] for row in self.rows]
+		self.year_ids = {}
+		for i, date in enumerate(self.dates):
+			self.year_ids.setdefault(date[:4], []).append(i)
+		self.headline = TextIndex(df.headline, prefix=False)
+		self.article = TextIndex(df.article, prefix=False)
+
+	def __len__(self):
+		return len(self.rows)
+
+	def search_ids(self, year:str, keyword:str) -> list:
+		if year == 'ALL':
+			ids = range(len(self.rows))
+		elif year in self.year_ids:
+			ids = self.year_ids[year]
+		else: # not a year, e.g. "2020-04"
+			ids = [i for i, date in enumerate(self.dates) if year in date]
+		if keyword == '':
+			return list(ids)
+		matched = set(self.headline.like(keyword)) | set(self.article.like(keyword))
+		return [i for i in ids if i in matched]
+
+	def search(self, year:str, keyword:str, offset=0, limit=PARALLEL_PAGE_SIZE) -> tuple:
+		"""
+		([[date, headline, article (highlighted)],...] of the page, number of all results)
+		"""
+		ids = self.search_ids(year, keyword)
+		page = [self.rows[i][:2] + [highlight(self.rows[i][2], keyword)] for i in ids[offset:offset+limit]]
+		return page, len(ids)
+
+##########  ONOMATOPOEIA  ##########
+ONOMATO_TYPES = {'gion':'擬音', 'gitai':'擬態', 'gijou':'擬情'}
+
+def normalize_key(text:str) -> str:
+	# kana-insensitive (katakana -> hiragana) and case-insensitive search key
+	return kata2hira(text).lower()
+
+class OnomatoIndex:
+	"""
+	onomatopoeia of /onomato, built once at load
+	rows are serialized to JSON in advance, a search is a partition lookup and TextIndex probes
 
-NHK_PARALLEL = pd.read_json('data/nhkparallel.json')
-def get_parallel(genre:str, keyword:str):
-	mask = (NHK_PARALLEL.genre.str.contains(genre)) & (NHK_PARALLEL.article_easy_ruby.str.contains(keyword) | NHK_PARALLEL.article.str.contains(keyword))
-	df = NHK_PARALLEL[mask].sort_values('datePublished', ascending=False)
-	df['datePublished'] = df.datePublished.apply(lambda x:x[2:10].replace('-', '/')) # "2013-04-07T18:09" -> "13/04/07"
-	df = df[['id','datePublished', 'genre', 'title_easy_ruby','article_easy_ruby','title','article', ]]
-	# highlight keyword in 'title_easy_ruby', 'article_easy_ruby', 'title', 'article'
-	# if has more than one genre, replace "_" with <br> 
-	return [[r[0], r[1], r[2].replace('_', '<br><br>')] + [highlight(x, keyword) for x in r[3:]] for r in df.values.tolist()]
+	type_ids : 'gion' / 'gitai' / 'gijou' -> row ids
+	keys     : TextIndex over normalized 日本語 / タイ語 / sense
+	"""
+	def __init__(self, df):
+		self.rows = df.fillna('-')[['タイプ','日本語','タイ語','sense']].values.tolist()
+		self.json_rows = [json.dumps(row, ensure_ascii=False) for row in self.rows]
+		self.type_ids = {name:[i for i, row in enumerate(self.rows) if row[0] == onomatotype] for name, onomatotype in ONOMATO_TYPES.items()}
+		self.keys = [TextIndex([normalize_key(row[column]) for row in self.rows], prefix=False) for column in [1, 2, 3]]
+
+	def search_ids(self, onomatotype:str, word:str) -> list:
+		"""
+		onomatotype : 'all', 'gion', 'gitai', 'gijou'
+		word        : literal substring of 日本語, タイ語 or sense (not regex), '' for all
+		"""
+		ids = self.type_ids.get(onomatotype, range(len(self.rows)))
+		if word == '':
+			return list(ids)
+		query = normalize_key(word)
+		matched = set()
+		for index in self.keys:
+			matched.update(index.like(query))
+		return [i for i in ids if i in matched]
+
+	def search_json(self, onomatotype:str, word:str) -> str:
+		"""
+		'{"result": [[タイプ, 日本語, タイ語, sense],...]}'
+		"""
+		return '{"result": [' + ', '.join([self.json_rows[i] for i in self.search_ids(onomatotype, word)]) + ']}'
 
 def highlight(text:str, keyword:str):
 	"""
@@ -651,14 +1103,15 @@ def highlight(text:str, keyword:str):
 	return text.replace(keyword, f'<span class="red">{keyword}</span>')
 
 ##########  GET RANDOM NHK EASY ARTICLE  ##########
-NHKEASY_DATA = data = pd.read_csv('data/nhkeasy.csv')
+NHKEASY_DATA = lazy('nhkeasy')
 def get_nhkeasy():
-	r = random.randint(0, len(NHKEASY_DATA)-1)
-	row = NHKEASY_DATA.iloc[r]
+	data = NHKEASY_DATA.get()
+	r = random.randint(0, len(data)-1)
+	row = data.iloc[r]
 	return row['date'], row['title'], row['article']
 
 ##########  GET THAI MENU ##########
-THAIMENU = pd.read_csv('data/thaimenu.csv')
+THAIMENU = lazy('thaimenu')
 def get_thaimenu(text):
 	try:
 		num = int(text.split(' ')[1]) # the num of ramen stores to recommend
@@ -670,91 +1123,39 @@ def get_thaimenu(text):
 	elif get_time_now().split(' ')[-1][:2] in ['21','22','23','00','01','02'] and random.random() > 0.7:
 		reply = random.choice(["ดึกแล้ว ไม่กินดีกว่า", "กินเวลานี้จะดีเหรอ", "ดึกแล้ว นอนเถอะ"])
 	else:
-		reply = '\n'.join(np.random.choice(THAIMENU['menu'], num))
+		reply = '\n'.join(np.random.choice(THAIMENU.get()['menu'], num))
 	return reply
 
 ##########  WIKI SEARCH  ############
-def remove_tag(text):
-	text = re.sub(r'</?.+?>', '', text)
-	text = re.sub(r'&#91;.+?&#93;', '', text)
-	text = re.sub(r'&#.+?;', '', text)
-	return text.strip()
-
 def get_wiki(word):
-	url = f'https://ja.wikipedia.org/wiki/{word}'
-	response = requests.get(url)
-	if response.status_code != 200:
-		return 'หาไม่เจอในดิกครับ\n(พิมพ์ help จะแสดงวิธีใช้)'
+	if WIKI_CACHE != None:
+		reply = WIKI_CACHE.get(word)
+		if reply != None:
+			return reply
+	try:
+		page = fetch_page(word)
+	except requests.RequestException: # timeout or network error, not cached
+		return 'ขอโทษครับ ตอนนี้เชื่อมต่อ Wikipedia ไม่ได้ ลองใหม่อีกครั้งนะครับ'
+	if page is None:
+		reply = 'หาไม่เจอในดิกครับ\n(พิมพ์ help จะแสดงวิธีใช้)'
+	elif page.entries != None: # content has only entry name 
+		reply = 'もしかして…\n' + '\n'.join(['・' + entry for entry in page.entries]) + '\n\n' + page.url
 	else:
-		html = response.text
-		soup = BeautifulSoup(html, 'html.parser')
-		try:
-			newurl = urllib.parse.unquote(soup.find('link', rel='canonical').get('href'))
-		except:
-			newurl = url
-
-		# get only 1st paragraph <p><b>entry</b> ..... </p>
-		content = re.search(r'<p>([『「]?<b>[\s\S]+?)</p>', html).group(1)
-		content = remove_tag(content)
-		
-		if re.match(r'.{1,12}(\s*[\(（].+[\)）])?$', content): # content has only entry name 
-			entries = soup.select('#bodyContent')
-			entries = re.findall(r'<li><a.+?>(.+?)</li>', str(entries))
-			return 'もしかして…\n' + '\n'.join(['・' + remove_tag(entry) for entry in entries if not re.search(r'(曖昧さ回避|ページの一覧)', entry)]) + '\n\n' + newurl
-		else:
-			content = re.sub(r'[,，]\s*聴く\[ヘルプ/ファイル\]', '', content)
-			content = re.sub(r'\(音声ファイル\)', '', content)
-			return content.strip() + '\n\n' + newurl
+		content = re.sub(r'[,，]\s*聴く\[ヘルプ/ファイル\]', '', page.paragraph)
+		content = re.sub(r'\(音声ファイル\)', '', content)
+		reply = content.strip() + '\n\n' + page.url
+	if WIKI_CACHE != None:
+		WIKI_CACHE.put(word, reply)
+	return reply
 
 
 ##########  JOSHI QUIZ  ##########
-
-SENTS_EASY = pd.read_csv('data/short_sentence_easy.csv') # [[sent, sentruby, level],[],...]
-SENTS_NORMAL = pd.read_csv('data/short_sentence_normal.csv') # [[sent, sentruby, level],[],...]
-KAKUJOSHI = ['を','に','が','と','の','より','へ','から','で'] # 助詞-格助詞
-FUKUJOSHI = ['は','か','も','など','や','まで','たり','ぐらい','だけ'] # 助詞-副助詞 / 助詞-係助詞
 def joshi_quiz(level='1', joshi_type="格助詞"):
-	if level == '1': # ง่าย
-		df = SENTS_EASY[SENTS_EASY.level > 4.3]
-	elif level == '2': # กลาง
-		df = SENTS_EASY[(SENTS_EASY.level <= 4.3) & (SENTS_EASY.level > 3.6)]
-	elif level == '3': # ยาก
-		df = SENTS_EASY[SENTS_EASY.level < 3.6]
-	elif level == '4': # ยากมาก
-		df = SENTS_NORMAL
-	sent = str(df.sample(1)['sent'].values[0])
-	tokens = tokenize(sent)
-	if joshi_type == '格助詞': # make index list of selected joshi
-		joshi_index = [i for i, token in enumerate(tokens) if re.match(r'助詞-格助詞', token[4]) and token[0] in KAKUJOSHI] 
-	elif joshi_type == '副助詞':
-		joshi_index = [i for i, token in enumerate(tokens) if re.match(r'助詞-(副|係)助詞', token[4]) and token[0] in FUKUJOSHI]
-	elif joshi_type == 'all':
-		joshi_index = [i for i, token in enumerate(tokens) if re.match(r'助詞-(格|副|係)助詞', token[4]) and token[0] in FUKUJOSHI+KAKUJOSHI]
-	if joshi_index == []:
-		return joshi_quiz(level, joshi_type) # if not find, recurrsive
-	selected_index = random.choice(joshi_index) # select one joshi at random
-	answer = tokens[selected_index][0] # answer joshi
-	tokens[selected_index][0] = '___' # mask answer
-	### regenerate answer in order to balance
-	if answer == 'の' and random.random() < 0.8:
-		return joshi_quiz(level, joshi_type) # if の skip (80%) recurrsive
-	elif answer in ['が','に','は'] and random.random() < 0.7:
-		return joshi_quiz(level, joshi_type) 
-	elif answer in ['を','て'] and random.random() < 0.6:
-		return joshi_quiz(level, joshi_type)
-	elif answer in ['と','で'] and random.random() < 0.5:
-		return joshi_quiz(level, joshi_type)
-	### make other choices
-	if joshi_type == '格助詞':
-		others = [x for x in KAKUJOSHI if x != answer]
-	elif joshi_type == '副助詞':
-		others = [x for x in FUKUJOSHI if x != answer]
-	elif joshi_type == 'all':
-		others = [x for x in KAKUJOSHI+FUKUJOSHI if x != answer]
-	### remove ambiguous choice
-	if answer in ['は', 'も'] and 'が' in others:
-		others.remove('が')
-	elif answer in ['が', 'も'] and 'は' in others:
-		others.remove('は')
-	random.shuffle(others)
-	return ''.join([token[0] for token in tokens]), answer, others[:4] # '私__行きます', 'が', ['を','に','て','から']
+	"""
+	one question from the prebuilt item bank (see joshi_bank.py), no tokenization here
+	return '私__行きます', 'が', ['を','に','て','から'], or None if the bank is not available
+	"""
+	bank = JOSHI_BANK.get()
+	if bank is None:
+		return None
+	return bank.question(level, joshi_type)
@@ -0,0 +1,91 @@
+"""
+compact signed encoding of quiz state for LINE postback data
+
+	q1.<base64url( struct of 8 bytes + HMAC-SHA256[:8] )>     (25 characters)
+
+instead of "action=joshi&type=格助詞&num=10&Q=3&score=2&answer=が&level=1",
+the state cannot be forged (e.g. score=) without the channel secret
+
+>>> codec = PostbackCodec(CHANNEL_SECRET)
+>>> data = codec.encode(QuizState(kind='joshi', type='格助詞', num=10, q=3, score=2, level=1, answer='が'))
+>>> codec.decode(data).score
+2
+"""
+import base64, hashlib, hmac, struct
+from collections import namedtuple
+
+PREFIX = 'q1.' # version 1
+FORMAT = '>BBBBBBBB' # version, kind, type, num, q, score, level, answer
+VERSION = 1
+SIGNATURE_SIZE = 8
+
+# values are stored as the index in these lists, new kinds / types are appended (never reordered)
+KINDS = ['joshi']
+TYPES = {'joshi': ['格助詞', '副助詞', 'all']}
+ANSWERS = {'joshi': ['を','に','が','と','の','より','へ','から','で','は','か','も','など','や','まで','たり','ぐらい','だけ']}
+NONE = 255 # no level / no answer
+
+QuizState = namedtuple('QuizState', ['kind', 'type', 'num', 'q', 'score', 'level', 'answer'], defaults=[0, 0, None, None])
+QuizState.__doc__ = """
+state of one quiz session
+	kind   : 'joshi'
+	type   : '格助詞', '副助詞', 'all'
+	num    : number of questions
+	q      : number of the question answered
+	score  : number of correct answers
+	level  : 1 ~ 4, None before selecting the level
+	answer : answer of the previous question, None before Q1
+"""
+
+
+class PostbackError(ValueError):
+	"""
+	postback data is broken, of unknown version, or has a wrong signature
+	"""
+
+
+class PostbackCodec:
+	def __init__(self, secret:str):
+		self.key = secret.encode('utf8')
+
+	def sign(self, payload:bytes) -> bytes:
+		return hmac.new(self.key, payload, hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+	def encode(self, state:QuizState) -> str:
+		types, answers = TYPES[state.kind], ANSWERS[state.kind]
+		payload = struct.pack(FORMAT, VERSION, KINDS.index(state.kind), types.index(state.type),
+			state.num, state.q, state.score,
+			NONE if state.level is None else state.level,
+			NONE if state.answer is None else answers.index(state.answer))
+		return PREFIX + base64.urlsafe_b64encode(payload + self.sign(payload)).decode('ascii').rstrip('=')
+
+	def decode(self, data:str) -> QuizState:
+		"""
+		raise PostbackError if the data is not made by encode() with the same secret
+		"""
+		if not data.startswith(PREFIX):
+			raise PostbackError('unknown postback format')
+		try:
+			raw = base64.urlsafe_b64decode(data[len(PREFIX):] + '==')
+		except ValueError:
+			raise PostbackError('broken postback data')
+		size = struct.calcsize(FORMAT)
+		payload, signature = raw[:size], raw[size:]
+		if len(payload) != size or not hmac.compare_digest(signature, self.sign(payload)):
+			raise PostbackError('wrong signature')
+		version, kind, quiz_type, num, q, score, level, answer = struct.unpack(FORMAT, payload)
+		if version != VERSION or kind >= len(KINDS):
+			raise PostbackError('unknown version or kind')
+		kind = KINDS[kind]
+		if quiz_type >= len(TYPES[kind]) or (answer != NONE and answer >= len(ANSWERS[kind])) or score > q or q > num:
+			raise PostbackError('invalid state')
+		return QuizState(kind, TYPES[kind][quiz_type], num, q, score,
+			None if level == NONE else level,
+			None if answer == NONE else ANSWERS[kind][answer])
+
+
+def parse_legacy(data:str) -> dict:
+	"""
+	former format "action=richmenu_help", "action=joshi&type=格助詞&num=5" (rich menu, old quick replies)
+	"""
+	return dict([x.split('=', 1) for x in data.split('&') if '=' in x])
@@ -0,0 +1,171 @@
+"""
+tests of wiki.py against a local stub server (no access to Wikipedia)
+
+	python -m pytest tests/test_wiki.py
+"""
+import os, sys, time, sqlite3, tempfile, threading, unittest
+from unittest import mock
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+TMP_DIR = tempfile.mkdtemp()
+os.environ['WIKI_CACHE_PATH'] = os.path.join(TMP_DIR, 'wiki_cache.db') # never the cache of data/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import wiki
+from wiki import WikiCache, extract_page, fetch_page
+
+HEAD = '<html><head><link rel="canonical" href="https://ja.wikipedia.org/wiki/%E7%8C%AB"></head><body>'
+ARTICLE = HEAD + '<div id="bodyContent"><p><b>ネコ</b>（猫）は、<a href="/wiki/x">食肉目</a>ネコ科の動物である<sup>&#91;1&#93;</sup>。</p>' \
+	+ '<p>二つ目の段落</p>' + '<div>' + 'x' * 200000 + '</div></body></html>'
+DISAMBIGUATION = HEAD + '<p><b>かみ</b></p><div id="bodyContent"><ul>' \
+	+ '<li><a href="/wiki/a">紙</a> - 植物繊維</li><li><a href="/wiki/b">神</a></li>' \
+	+ '<li><a href="/wiki/c">曖昧さ回避のページの一覧</a></li></ul></div></body></html>'
+CHUNK = 8192
+
+
+class StubHandler(BaseHTTPRequestHandler):
+	def log_message(self, *args):
+		pass
+
+	def send_html(self, length:int):
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/html; charset=utf-8')
+		self.send_header('Content-Length', str(length))
+		self.end_headers()
+
+	def do_GET(self):
+		name = self.path.rsplit('/', 1)[-1]
+		if name in ['article', 'disambiguation']:
+			body = (ARTICLE if name == 'article' else DISAMBIGUATION).encode('utf8')
+			self.send_html(len(body))
+			self.wfile.write(body)
+		elif name == 'slow': # nothing before the read timeout
+			time.sleep(1.5)
+			self.send_html(2)
+			self.wfile.write(b'<p')
+		elif name == 'drip': # every chunk in time, but the whole page is too slow (deadline)
+			self.send_html(CHUNK * 20)
+			try:
+				for _ in range(20):
+					self.wfile.write(b' ' * CHUNK)
+					self.wfile.flush()
+					time.sleep(0.2)
+			except (BrokenPipeError, ConnectionResetError):
+				pass
+		else:
+			self.send_response(404)
+			self.send_header('Content-Length', '0')
+			self.end_headers()
+
+
+class FetchPageTest(unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		cls.server = HTTPServer(('127.0.0.1', 0), StubHandler)
+		threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+		patch = mock.patch.object(wiki, 'WIKI_BASE_URL', f'http://127.0.0.1:{cls.server.server_port}/wiki/')
+		patch.start()
+
+	@classmethod
+	def tearDownClass(cls):
+		mock.patch.stopall()
+		cls.server.shutdown()
+		cls.server.server_close()
+
+	def test_article(self):
+		page = fetch_page('article')
+		self.assertEqual(page.paragraph, 'ネコ（猫）は、食肉目ネコ科の動物である。')
+		self.assertEqual(page.url, 'https://ja.wikipedia.org/wiki/猫')
+		self.assertIsNone(page.entries)
+
+	def test_disambiguation(self):
+		page = fetch_page('disambiguation')
+		self.assertEqual(page.paragraph, 'かみ')
+		self.assertEqual(page.entries, ['紙 - 植物繊維', '神'])
+
+	def test_not_found(self):
+		self.assertIsNone(fetch_page('missing'))
+
+	def test_read_timeout(self):
+		with mock.patch.object(wiki, 'WIKI_TIMEOUT', (1, 0.3)):
+			with self.assertRaises(requests.Timeout):
+				fetch_page('slow')
+
+	def test_deadline(self):
+		start = time.monotonic()
+		with mock.patch.object(wiki, 'WIKI_DEADLINE', 0.5):
+			with self.assertRaises(requests.Timeout):
+				fetch_page('drip')
+		self.assertLess(time.monotonic() - start, 2.0) # not the 4 seconds of the whole page
+
+
+class ExtractPageTest(unittest.TestCase):
+	def test_early_stop(self):
+		consumed = []
+		def chunks():
+			for i, chunk in enumerate([HEAD + '<p><b>ネコ</b>は', '食肉目ネコ科の動物である。</p>'] + ['<p>後の段落</p>'] * 100):
+				consumed.append(i)
+				yield chunk
+		page = extract_page(chunks(), 'http://stub/wiki/ネコ')
+		self.assertEqual(page.paragraph, 'ネコは食肉目ネコ科の動物である。')
+		self.assertEqual(len(consumed), 2) # the paragraph is split over 2 chunks, nothing after it is read
+
+	def test_no_paragraph(self):
+		self.assertIsNone(extract_page(iter([HEAD, '<div>本文なし</div></body></html>']), 'http://stub/wiki/x'))
+
+
+class WikiCacheTest(unittest.TestCase):
+	def setUp(self):
+		self.path = os.path.join(TMP_DIR, f'{self.id()}.db')
+		self.cache = WikiCache(self.path, ttl=60, maxsize=2, used_interval=60)
+
+	def tearDown(self):
+		self.cache.con.close()
+		os.remove(self.path)
+
+	def test_hit(self):
+		self.assertIsNone(self.cache.get('猫'))
+		self.cache.put('猫', 'ネコは動物')
+		self.assertEqual(self.cache.get('猫'), 'ネコは動物')
+
+	def test_ttl(self):
+		self.cache.put('猫', 'ネコは動物')
+		with mock.patch.object(wiki.time, 'time', return_value=time.time() + 61):
+			self.assertIsNone(self.cache.get('猫'))
+
+	def test_lru(self):
+		now = time.time()
+		with mock.patch.object(wiki.time, 'time', side_effect=[now-4, now-3, now-2, now-1]):
+			self.cache.put('a', 'A')
+			self.cache.put('b', 'B')
+			self.assertEqual(self.cache.get('a'), 'A') # last use in memory until the next put
+			self.cache.put('c', 'C') # b is the least recently used
+		self.assertIsNone(self.cache.get('b'))
+		self.assertEqual(self.cache.get('a'), 'A')
+		self.assertEqual(self.cache.get('c'), 'C')
+
+	def test_hit_is_not_a_write(self):
+		self.cache.put('猫', 'ネコは動物')
+		self.cache.get('猫')
+		self.assertFalse(self.cache.con.in_transaction)
+		self.assertIn('猫', self.cache.used)
+
+	def test_locked_database(self):
+		self.cache.put('猫', 'ネコは動物')
+		cache = WikiCache(self.path, busy_timeout=0.1)
+		other = sqlite3.connect(self.path)
+		other.execute('BEGIN EXCLUSIVE') # another worker holds the lock
+		try:
+			self.assertIsNone(cache.get('猫')) # miss, not an exception
+			cache.put('犬', 'イヌは動物') # skipped
+		finally:
+			other.rollback()
+			other.close()
+		self.assertIsNone(cache.get('犬'))
+		self.assertEqual(cache.get('猫'), 'ネコは動物')
+		cache.con.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,206 @@
+import os, bisect
+from array import array
+import numpy as np
+from datastore import StringColumn, write_strings
+
+
+class TextIndex:
+	"""
+	prebuilt index over one text column (list of str), built once at load time
+
+	exact   : value -> row ids
+	initial : sorted array of distinct values, prefix range found by bisect
+	like    : character 1-gram & 2-gram inverted index -> candidate row ids,
+	          the shortest posting list is verified with `in`
+	lengths : number of characters of each value (to sort the results)
+
+	>>> index = TextIndex(['食べる', '食べ物', '物'])
+	>>> index.initial('食べ')
+	[0, 1]
+	>>> index.like('物')
+	[1, 2]
+	"""
+	def __init__(self, values:list, prefix=True):
+		self.values = [str(v) for v in values]
+		self.exact_map = {}
+		self.grams = {}
+		for i, value in enumerate(self.values):
+			self.exact_map.setdefault(value, []).append(i)
+			grams = set(value) | {value[j:j+2] for j in range(len(value)-1)}
+			for gram in grams:
+				posting = self.grams.get(gram)
+				if posting is None:
+					posting = self.grams[gram] = array('I')
+				posting.append(i)
+		self.sorted_values = sorted(self.exact_map) if prefix else None
+		self.lengths = [len(value) for value in self.values]
+
+	def __len__(self):
+		return len(self.values)
+
+	def exact(self, query:str) -> list:
+		return list(self.exact_map.get(query, []))
+
+	def initial(self, query:str) -> list:
+		"""
+		row ids whose value starts with query (ascending order)
+		"""
+		if self.sorted_values is None:
+			return [i for i, value in enumerate(self.values) if value.startswith(query)]
+		start = bisect.bisect_left(self.sorted_values, query)
+		end = bisect.bisect_left(self.sorted_values, query + '\U0010ffff')
+		ids = []
+		for value in self.sorted_values[start:end]:
+			ids += self.exact_map[value]
+		return sorted(ids)
+
+	def like(self, query:str) -> list:
+		"""
+		row ids whose value contains query as a literal substring (ascending order)
+		"""
+		if query == '':
+			return list(range(len(self.values)))
+		if len(query) == 1:
+			return list(self.grams.get(query, []))
+		postings = []
+		for j in range(len(query)-1):
+			posting = self.grams.get(query[j:j+2])
+			if posting is None:
+				return []
+			postings.append(posting)
+		candidates = min(postings, key=len)
+		if len(query) == 2:
+			return list(candidates)
+		return [i for i in candidates if query in self.values[i]]
+
+	def save(self, directory:str, name:str):
+		"""
+		write the index into .npy files <name>.*, opened again with MappedTextIndex(directory, name)
+		"""
+		grams = sorted(self.grams)
+		offsets = np.zeros(len(grams)+1, dtype=np.int64)
+		np.cumsum([len(self.grams[gram]) for gram in grams], out=offsets[1:])
+		postings = np.concatenate([np.array(self.grams[gram], dtype=np.uint32) for gram in grams]) if grams else np.zeros(0, dtype=np.uint32)
+		order = sorted(range(len(self.values)), key=self.values.__getitem__) # by value, ties keep the row order
+		write_strings(directory, f'{name}.values', self.values)
+		write_strings(directory, f'{name}.grams', grams)
+		np.save(os.path.join(directory, f'{name}.postings.npy'), postings)
+		np.save(os.path.join(directory, f'{name}.postings_offsets.npy'), offsets)
+		np.save(os.path.join(directory, f'{name}.order.npy'), np.array(order, dtype=np.uint32))
+		np.save(os.path.join(directory, f'{name}.lengths.npy'), np.array(self.lengths, dtype=np.uint32))
+
+
+def bisect_strings(values, query:str, order=None) -> int:
+	"""
+	bisect_left over a sorted sequence of str (StringColumn), or over values[order[k]] if order is given
+	"""
+	low, high = 0, len(values) if order is None else len(order)
+	while low < high:
+		middle = (low + high) // 2
+		if values[middle if order is None else order[middle]] < query:
+			low = middle + 1
+		else:
+			high = middle
+	return low
+
+
+class MappedTextIndex:
+	"""
+	TextIndex saved by TextIndex.save(), searched on the memory map : opening decodes and builds nothing,
+	and the pages are shared by every process which opens the same files
+
+	values, grams : StringColumn (grams sorted, values in row order)
+	order         : row ids sorted by value, exact / initial are bisected over values[order[k]]
+	postings      : row ids of all grams, those of grams[k] are postings[postings_offsets[k]:postings_offsets[k+1]]
+
+	>>> TextIndex(['食べる', '食べ物', '物']).save('data/store/example.index', 'word')
+	>>> MappedTextIndex('data/store/example.index', 'word').like('物')
+	[1, 2]
+	"""
+	def __init__(self, directory:str, name:str):
+		load = lambda filename: np.asarray(np.load(os.path.join(directory, f'{name}.{filename}.npy'), mmap_mode='r')) # same as StringColumn
+		self.values = StringColumn(load('values.data'), load('values.offsets'))
+		self.grams = StringColumn(load('grams.data'), load('grams.offsets'))
+		self.postings = load('postings')
+		self.postings_offsets = load('postings_offsets')
+		self.order = load('order')
+		self.lengths = load('lengths')
+
+	def __len__(self):
+		return len(self.values)
+
+	def value_range(self, low:str, high:str) -> list:
+		# row ids whose value v is low <= v < high, in order of value
+		start = bisect_strings(self.values, low, self.order)
+		end = bisect_strings(self.values, high, self.order)
+		return self.order[start:end].tolist()
+
+	def posting(self, gram:str):
+		k = bisect_strings(self.grams, gram)
+		if k == len(self.grams) or self.grams[k] != gram:
+			return None
+		return self.postings[self.postings_offsets[k]:self.postings_offsets[k+1]]
+
+	def exact(self, query:str) -> list:
+		return self.value_range(query, query + '\x00') # no value is between query and query + '\x00'
+
+	def initial(self, query:str) -> list:
+		"""
+		row ids whose value starts with query (ascending order)
+		"""
+		return sorted(self.value_range(query, query + '\U0010ffff'))
+
+	def like(self, query:str) -> list:
+		"""
+		row ids whose value contains query as a literal substring (ascending order)
+		"""
+		if query == '':
+			return list(range(len(self.values)))
+		if len(query) == 1:
+			posting = self.posting(query)
+			return [] if posting is None else posting.tolist()
+		postings = []
+		for j in range(len(query)-1):
+			posting = self.posting(query[j:j+2])
+			if posting is None:
+				return []
+			postings.append(posting)
+		if len(query) == 2:
+			return postings[0].tolist()
+		# intersect the postings on the arrays first, fewer strings are decoded to be verified
+		candidates = min(postings, key=len)
+		for posting in sorted(postings, key=len)[1:]:
+			candidates = np.intersect1d(candidates, posting, assume_unique=True)
+		return [i for i in candidates.tolist() if query in self.values[i]]
+
+
+def rank_ids(ids, key) -> list:
+	"""
+	sort row ids with the key function, ties keep the original row order
+	"""
+	return sorted(set(ids), key=lambda i: (key(i), i))
+
+
+def unique_ids(tiers, rows:list, limit=None) -> list:
+	"""
+	concatenate tiers of row ids and drop ids of duplicated rows (same as pd.concat(...).drop_duplicates())
+	stop as soon as `limit` ids are collected
+	"""
+	result, seen = [], set()
+	for ids in tiers:
+		for i in ids:
+			row = tuple(rows[i])
+			if row in seen:
+				continue
+			seen.add(row)
+			result.append(i)
+			if limit is not None and len(result) >= limit:
+				return result
+	return result
+
+
+def merge_tiers(tiers, rows:list, limit=None) -> list:
+	"""
+	same as unique_ids(), but return the rows themselves
+	"""
+	return [list(rows[i]) for i in unique_ids(tiers, rows, limit)]
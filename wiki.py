@@ -0,0 +1,193 @@
+"""
+Wikipedia lookup for get_wiki
+
+- one shared requests.Session (connection pool) with connect/read timeouts and a total deadline
+- the page is streamed and parsed with regexes, reading stops after the first paragraph <p><b>...</p>
+  (the rest is read only for disambiguation pages, to list the entries)
+- replies are kept in an on-disk SQLite cache with TTL and LRU size limit, a cache error is only a miss
+
+WIKI_BASE_URL can point to a local stub server, e.g. WIKI_BASE_URL=http://127.0.0.1:8001/wiki/
+(tests/test_wiki.py runs against such a stub : python -m pytest tests/test_wiki.py)
+"""
+import re, os, time, sqlite3, threading, urllib.parse
+import requests
+from requests.adapters import HTTPAdapter
+
+WIKI_BASE_URL = os.environ.get('WIKI_BASE_URL', 'https://ja.wikipedia.org/wiki/')
+WIKI_TIMEOUT = (float(os.environ.get('WIKI_CONNECT_TIMEOUT', '2')), float(os.environ.get('WIKI_READ_TIMEOUT', '3')))
+WIKI_DEADLINE = float(os.environ.get('WIKI_DEADLINE', '5')) # seconds for the whole page
+WIKI_CACHE_PATH = os.environ.get('WIKI_CACHE_PATH', 'data/wiki_cache.db')
+WIKI_CACHE_TTL = float(os.environ.get('WIKI_CACHE_TTL', str(7*24*3600)))
+WIKI_CACHE_SIZE = int(os.environ.get('WIKI_CACHE_SIZE', '5000'))
+WIKI_CACHE_BUSY_TIMEOUT = float(os.environ.get('WIKI_CACHE_BUSY_TIMEOUT', '0.5')) # seconds to wait for a lock of another worker
+WIKI_CACHE_USED_INTERVAL = float(os.environ.get('WIKI_CACHE_USED_INTERVAL', '60')) # seconds between writes of the LRU times
+
+CANONICAL_PATTERN = re.compile(r'<link rel="canonical" href="([^"]+)"|<link href="([^"]+)" rel="canonical"')
+PARAGRAPH_PATTERN = re.compile(r'<p>([『「]?<b>[\s\S]+?)</p>') # 1st paragraph <p><b>entry</b> ..... </p>
+ENTRY_PATTERN = re.compile(r'<li><a.+?>(.+?)</li>')
+ONLY_ENTRY_PATTERN = re.compile(r'.{1,12}(\s*[\(（].+[\)）])?$') # paragraph has only entry name -> disambiguation
+
+
+def remove_tag(text:str) -> str:
+	text = re.sub(r'</?.+?>', '', text)
+	text = re.sub(r'&#91;.+?&#93;', '', text)
+	text = re.sub(r'&#.+?;', '', text)
+	return text.strip()
+
+
+def make_session(pool_size=8) -> requests.Session:
+	session = requests.Session()
+	adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+	session.mount('http://', adapter)
+	session.mount('https://', adapter)
+	session.headers['User-Agent'] = 'nozomibot (https://github.com/nozomiyamada/nozomibot)'
+	return session
+
+SESSION = make_session()
+
+
+class WikiPage:
+	"""
+	what get_wiki needs from a page : canonical url, text of the 1st paragraph, entries of a disambiguation page
+	"""
+	def __init__(self, url:str, paragraph:str, entries=None):
+		self.url = url
+		self.paragraph = paragraph
+		self.entries = entries
+
+
+def extract_page(chunks, url:str, deadline=None):
+	"""
+	read the html chunk by chunk, return WikiPage or None if there is no paragraph
+	"""
+	buffer, canonical, paragraph, start = '', None, None, 0
+	for chunk in chunks:
+		if deadline != None and time.monotonic() > deadline:
+			raise requests.Timeout('wikipedia deadline exceeded')
+		buffer += chunk
+		if canonical is None:
+			match = CANONICAL_PATTERN.search(buffer)
+			if match:
+				canonical = urllib.parse.unquote(match.group(1) or match.group(2))
+			elif '</head>' in buffer:
+				canonical = url
+		if paragraph is None:
+			match = PARAGRAPH_PATTERN.search(buffer, start)
+			if match is None:
+				start = max(start, buffer.rfind('<p>')) # an unmatched paragraph can only complete from its <p>
+				continue
+			paragraph = remove_tag(match.group(1))
+			if not ONLY_ENTRY_PATTERN.match(paragraph):
+				return WikiPage(canonical or url, paragraph)
+	if paragraph is None:
+		return None
+	# disambiguation page : list of entries in the body
+	body = buffer[max(0, buffer.find('id="bodyContent"')):]
+	entries = [remove_tag(entry) for entry in ENTRY_PATTERN.findall(body) if not re.search(r'(曖昧さ回避|ページの一覧)', entry)]
+	return WikiPage(canonical or url, paragraph, entries)
+
+
+def fetch_page(word:str, session=None):
+	"""
+	return WikiPage, or None if the page does not exist
+	raise requests.RequestException on network error or timeout
+	"""
+	url = WIKI_BASE_URL + word
+	deadline = time.monotonic() + WIKI_DEADLINE
+	with (session or SESSION).get(url, timeout=WIKI_TIMEOUT, stream=True) as response:
+		if response.status_code != 200:
+			return None
+		response.encoding = response.encoding or 'utf-8'
+		return extract_page(response.iter_content(chunk_size=8192, decode_unicode=True), url, deadline)
+
+
+class WikiCache:
+	"""
+	word -> reply text in SQLite, entries older than `ttl` seconds are ignored
+	and the least recently used entries are deleted beyond `maxsize`
+
+	the file is shared by all workers, so a hit is not a write : the last use of each word is kept in memory
+	and written at most every `used_interval` seconds (or before the next put)
+	any sqlite3.Error (e.g. database is locked) is a miss for get() and skipped by put()
+	"""
+	def __init__(self, path:str, ttl=WIKI_CACHE_TTL, maxsize=WIKI_CACHE_SIZE, busy_timeout=WIKI_CACHE_BUSY_TIMEOUT,
+		used_interval=WIKI_CACHE_USED_INTERVAL):
+		self.ttl = ttl
+		self.maxsize = maxsize
+		self.used_interval = used_interval
+		self.used = {} # word -> last use, not written yet
+		self.flushed = time.monotonic()
+		self.lock = threading.Lock()
+		self.con = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+		self.con.execute('CREATE TABLE IF NOT EXISTS wiki (word TEXT PRIMARY KEY, reply TEXT, fetched REAL, used REAL)')
+		self.con.execute('CREATE INDEX IF NOT EXISTS wiki_used ON wiki (used)')
+		self.con.commit()
+
+	@classmethod
+	def open(cls, path:str, **kwargs):
+		"""
+		return None if the cache file cannot be opened (caching is skipped)
+		"""
+		try:
+			return cls(path, **kwargs)
+		except sqlite3.Error:
+			return None
+
+	def get(self, word:str):
+		now = time.time()
+		with self.lock:
+			try:
+				row = self.con.execute('SELECT reply, fetched FROM wiki WHERE word = ?', (word,)).fetchone()
+			except sqlite3.Error:
+				return None
+			if row is None or row[1] + self.ttl < now:
+				return None
+			self.used[word] = now
+			if time.monotonic() - self.flushed > self.used_interval:
+				self.flush_used()
+		return row[0]
+
+	def put(self, word:str, reply:str):
+		now = time.time()
+		with self.lock:
+			try:
+				self.flush_used() # LRU times are up to date before the eviction
+				self.con.execute('INSERT OR REPLACE INTO wiki (word, reply, fetched, used) VALUES (?, ?, ?, ?)', (word, reply, now, now))
+				count = self.con.execute('SELECT COUNT(*) FROM wiki').fetchone()[0]
+				if count > self.maxsize:
+					self.con.execute('DELETE FROM wiki WHERE word IN (SELECT word FROM wiki ORDER BY used LIMIT ?)', (count - self.maxsize,))
+				self.con.commit()
+			except sqlite3.Error:
+				self.rollback()
+
+	def flush_used(self):
+		"""
+		write the last uses in one transaction, they are dropped if the database is busy (only the LRU order is affected)
+		called with self.lock held
+		"""
+		used, self.used = self.used, {}
+		self.flushed = time.monotonic()
+		if len(used) == 0:
+			return
+		try:
+			self.con.executemany('UPDATE wiki SET used = ? WHERE word = ?', [(t, word) for word, t in used.items()])
+			self.con.commit()
+		except sqlite3.Error:
+			self.rollback()
+
+	def rollback(self):
+		try:
+			self.con.rollback()
+		except sqlite3.Error:
+			pass
+
+	def clear(self):
+		with self.lock:
+			self.used = {}
+			try:
+				self.con.execute('DELETE FROM wiki')
+				self.con.commit()
+			except sqlite3.Error:
+				self.rollback()
+
+WIKI_CACHE = WikiCache.open(WIKI_CACHE_PATH)